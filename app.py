@@ -8,8 +8,17 @@
 
 import os
 import re
+import json
 import time
+import random
+import asyncio
+import atexit
+import contextlib
 import tempfile
+import sqlite3
+import threading
+import uuid
+import importlib.util
 import httpx
 import ssl
 import base64
@@ -17,17 +26,22 @@ import io
 import gradio as gr
 import importlib
 from pathlib import Path
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from email.utils import parsedate_to_datetime
 from dotenv import load_dotenv
 from PIL import Image
 import qwen3vl
 importlib.reload(qwen3vl)
-from qwen3vl import analyze_video
+from qwen3vl import iter_analyze_video_async, format_metrics, run_sync, run_background
 
 load_dotenv()
 
 # ========== Seedance API 配置 ==========
 SEEDANCE_API_BASE_URL = os.getenv("SEEDANCE_API_BASE_URL", "https://seedanceapi.duckcloud.fun")
 SEEDANCE_AUTH_TOKEN = os.getenv("SEEDANCE_AUTH_TOKEN", "sk-doubao-video-2025")
+# 任务ID未精确匹配时是否按前缀模糊匹配 (仅用于返回ID格式不一致的服务，可能匹配到ID相近的其他视频，默认关闭)
+SEEDANCE_FUZZY_MATCH = os.getenv("SEEDANCE_FUZZY_MATCH", "false").lower() == "true"
 
 # ========== Sora2 API 配置 ==========
 SORA2_API_BASE_URL = os.getenv("SORA2_API_BASE_URL", "https://api.jxincm.cn")
@@ -44,6 +58,39 @@ if not SEEDANCE_AUTH_TOKEN:
 if not SEEDANCE_API_BASE_URL:
     SEEDANCE_API_BASE_URL = os.getenv("API_BASE_URL", "https://seedanceapi.duckcloud.fun")
 
+# ========== HTTP 连接池配置 ==========
+# 每个服务地址复用一个长连接客户端，轮询、上传、创建任务共享连接
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "10"))  # 每个服务地址的最大连接数
+HTTP_MAX_KEEPALIVE = int(os.getenv("HTTP_MAX_KEEPALIVE", "5"))  # 每个服务地址保持的空闲长连接数
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "120"))  # 空闲长连接保留秒数 (大于轮询间隔)
+# 服务端支持时使用 HTTP/2 (需要安装 h2，即 httpx[http2])，不支持时自动使用 HTTP/1.1
+HTTP2_ENABLED = os.getenv("HTTP2_ENABLED", "true").lower() == "true" and importlib.util.find_spec("h2") is not None
+
+# ========== 视频下载配置 ==========
+# 视频流式写入磁盘 (内存中最多保留一个块)，连接中断时用 HTTP Range 从已下载位置续传
+DOWNLOAD_CHUNK_SIZE = int(os.getenv("DOWNLOAD_CHUNK_SIZE", str(1024 * 1024)))  # 每次写入磁盘的块大小 (字节)
+DOWNLOAD_MAX_RESUMES = int(os.getenv("DOWNLOAD_MAX_RESUMES", "5"))  # 连接中断后最多续传次数
+DOWNLOAD_READ_TIMEOUT = float(os.getenv("DOWNLOAD_READ_TIMEOUT", "60"))  # 两次收到数据之间的最长等待 (秒)
+
+# ========== 轮询调度配置 ==========
+# 各提供者查询任务状态的节奏 (秒):
+#   initial_delay: 提交后首次查询前的等待 (渲染不会在这之前完成)
+#   interval / backoff / max_interval: 之后的查询间隔从 interval 开始按 backoff 倍数增长，最长 max_interval
+#   min_interval: 根据进度估计即将完成时可缩短到的最短间隔
+#   jitter: 随机抖动比例，避免多个任务同时查询
+POLL_PROFILES = {
+    "seedance": {"initial_delay": 20, "interval": 5, "backoff": 1.3, "max_interval": 15, "min_interval": 3,
+                 "jitter": 0.2},
+    "sora2": {"initial_delay": 30, "interval": 8, "backoff": 1.3, "max_interval": 30, "min_interval": 3,
+              "jitter": 0.2},
+}
+RETRY_AFTER_MAX_WAIT = 60  # 单次请求重试时最多按 Retry-After 等待的秒数
+
+# ========== 后台任务配置 ==========
+JOB_REFRESH_SECONDS = float(os.getenv("JOB_REFRESH_SECONDS", "3"))  # 界面刷新任务状态的间隔
+# 任务持久化数据库，服务重启后恢复未完成的任务 (docker-compose 已将 /tmp 挂载到宿主机，默认位置重启后保留)
+JOB_DB_PATH = os.getenv("JOB_DB_PATH", os.path.join(tempfile.gettempdir(), "ai_video_jobs.db"))
+
 
 def get_seedance_auth_headers() -> dict:
     """获取 Seedance 包含鉴权信息的请求头"""
@@ -77,53 +124,173 @@ def _get_content_type(suffix: str) -> str:
     return content_types.get(suffix.lower(), "application/octet-stream")
 
 
-def request_with_retry(method, url, max_retries=3, timeout=60.0, **kwargs):
-    """带重试机制的请求函数，专门处理 SSL、协议错误和重定向"""
+# ========== HTTP 连接池 ==========
+# 按 (服务地址, 是否校验证书, 事件循环) 缓存 httpx.AsyncClient，避免每次请求重新进行 DNS 解析和 TCP/TLS 握手；
+# Gradio 异步回调运行在 Gradio 的事件循环上，同步接口运行在 qwen3vl 的共享后台事件循环上，各自复用一组连接
+_http_clients = {}
+_http_clients_lock = threading.Lock()
+_http1_origins = set()  # HTTP/2 出现协议错误、已回退到 HTTP/1.1 的服务地址
+_insecure_origins = set()  # 证书校验失败、需要关闭校验才能访问的服务地址
+_retry_after_until = {}  # 服务地址 -> 服务端 Retry-After 要求的最早下次请求时间
+
+
+def _url_origin(url: str) -> str:
+    """提取 URL 的 scheme://host:port 部分，作为连接池的键"""
+    parsed = httpx.URL(url)
+    return f"{parsed.scheme}://{parsed.host}:{parsed.port or ''}"
+
+
+def _parse_retry_after(value: str) -> float:
+    """解析 Retry-After 响应头 (秒数或 HTTP 日期)，返回需要等待的秒数，无法解析时返回 0"""
+    if not value:
+        return 0.0
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def retry_after_delay(url: str) -> float:
+    """服务端通过 Retry-After 要求该服务地址还需等待的秒数，没有要求时返回 0"""
+    return max(0.0, _retry_after_until.get(_url_origin(url), 0) - time.time())
+
+
+def get_http_client(url: str, verify: bool = True) -> httpx.AsyncClient:
+    """
+    获取指定服务地址共享的 httpx 异步客户端 (需在事件循环中调用，线程安全)
+
+    Args:
+        url: 请求地址，按其 scheme://host:port 复用客户端
+        verify: 是否校验 SSL 证书
+
+    Returns:
+        带连接池和长连接的 httpx.AsyncClient，超时时间由每次请求单独指定
+    """
+    origin = _url_origin(url)
+    http2 = HTTP2_ENABLED and origin not in _http1_origins
+    loop = asyncio.get_running_loop()
+    key = (origin, verify, http2, id(loop))
+    with _http_clients_lock:
+        # 客户端的连接绑定在创建它的事件循环上，循环关闭后不能再复用，移除并尽量关闭
+        for stale in [k for k, entry in _http_clients.items() if entry["loop"].is_closed()]:
+            loop.create_task(_aclose_quietly(_http_clients.pop(stale)["client"]))
+
+        entry = _http_clients.get(key)
+        if entry is None:
+            client = httpx.AsyncClient(
+                http2=http2,
+                verify=verify,
+                follow_redirects=True,
+                limits=httpx.Limits(
+                    max_connections=HTTP_MAX_CONNECTIONS,
+                    max_keepalive_connections=HTTP_MAX_KEEPALIVE,
+                    keepalive_expiry=HTTP_KEEPALIVE_EXPIRY
+                )
+            )
+            entry = _http_clients[key] = {"client": client, "loop": loop}
+            print(f"[API] 🔗 新建连接池: {origin} (HTTP/2: {'开启' if http2 else '关闭'}，"
+                  f"证书校验: {'开启' if verify else '关闭'})")
+    return entry["client"]
+
+
+async def _aclose_quietly(client: httpx.AsyncClient) -> None:
+    """关闭客户端，忽略连接所在事件循环已关闭等错误"""
+    with contextlib.suppress(Exception):
+        await client.aclose()
+
+
+def close_http_clients(timeout: float = 5.0) -> None:
+    """
+    关闭所有共享的 httpx 客户端 (进程退出时自动调用，不能在客户端所在的事件循环线程中调用)
+
+    每个客户端在创建它的事件循环上关闭：循环仍在运行 (如 qwen3vl 的共享后台循环) 时提交到该循环执行，
+    已停止时直接在当前线程运行，已关闭时跳过。
+    """
+    with _http_clients_lock:
+        entries = list(_http_clients.values())
+        _http_clients.clear()
+    for entry in entries:
+        loop = entry["loop"]
+        try:
+            if loop.is_running():
+                asyncio.run_coroutine_threadsafe(_aclose_quietly(entry["client"]), loop).result(timeout)
+            elif not loop.is_closed():
+                loop.run_until_complete(_aclose_quietly(entry["client"]))
+        except Exception as e:
+            print(f"[API] ⚠️ 关闭连接池失败: {e}")
+
+
+atexit.register(close_http_clients)
+
+
+def _fallback_to_http1(url: str, error: Exception) -> bool:
+    """HTTP/2 请求出现协议错误时，该服务地址改用 HTTP/1.1；返回是否发生了回退"""
+    origin = _url_origin(url)
+    if not HTTP2_ENABLED or origin in _http1_origins or not isinstance(error, httpx.RemoteProtocolError):
+        return False
+    _http1_origins.add(origin)
+    print(f"[API] HTTP/2 协议错误，{origin} 改用 HTTP/1.1: {str(error)}")
+    return True
+
+
+async def request_with_retry_async(method, url, max_retries=3, timeout=60.0, **kwargs):
+    """带重试机制的异步请求函数，专门处理 SSL、协议错误和重定向 (使用按服务地址共享的连接池)"""
     last_error = None
     
-    # 尝试多种配置组合
-    configs = [
-        {"http2": False, "verify": True},  # 标准配置
-        {"http2": False, "verify": False}, # 禁用验证 (应对证书问题)
-    ]
-    
     # 规范化 URL，确保没有重复的斜杠
     if "://" in url:
         parts = url.split("://", 1)
         url = f"{parts[0]}://{parts[1].replace('//', '/')}"
 
-    for config in configs:
+    # 先校验证书，失败时关闭校验重试 (应对证书问题)；关闭校验成功过的地址直接跳过校验
+    origin = _url_origin(url)
+    verify_options = [False] if origin in _insecure_origins else [True, False]
+
+    for verify in verify_options:
         for attempt in range(max_retries):
             try:
-                with httpx.Client(
-                    timeout=timeout,
-                    http2=config["http2"],
-                    verify=config["verify"],
-                    follow_redirects=True
-                ) as client:
-                    response = client.request(method, url, **kwargs)
-                    
-                    # 检查重定向 (httpx follow_redirects=True 会自动处理，但 POST 可能变 GET)
-                    # 如果返回 302 且我们想要 POST，我们需要确认是否变成了 GET
-                    if response.status_code == 302 and method == "POST":
-                        print(f"[API] POST 请求被重定向 (302)，请检查 API 地址是否正确: {url}")
-                    
-                    # 如果响应状态码不是 2xx，记录更多信息
-                    if response.status_code >= 400:
-                        error_text = response.text[:500]
-                        print(f"[API] 请求失败: HTTP {response.status_code} - {error_text}")
-                        # 抛出包含更多信息的自定义异常，或者在 raise_for_status 之前抛出
-                        raise Exception(f"{response.status_code} {response.reason_phrase}: {error_text}")
-                        
-                    try:
-                        return response.json()
-                    except Exception as json_err:
-                        print(f"[API] 解析 JSON 失败: {str(json_err)}")
-                        return {"success": True, "message": "请求成功但解析 JSON 失败", "text": response.text}
+                client = get_http_client(url, verify=verify)
+                response = await client.request(method, url, timeout=timeout, **kwargs)
+
+                # 记录服务端要求的等待时间 (限流 429 / 维护 503 等)，重试和任务轮询都会遵守
+                retry_after = _parse_retry_after(response.headers.get("Retry-After"))
+                if retry_after:
+                    _retry_after_until[origin] = time.time() + retry_after
+                    print(f"[API] ⏳ {origin} 要求 {retry_after:.0f}秒 后再请求 (Retry-After)")
+
+                # 检查重定向 (httpx follow_redirects=True 会自动处理，但 POST 可能变 GET)
+                # 如果返回 302 且我们想要 POST，我们需要确认是否变成了 GET
+                if response.status_code == 302 and method == "POST":
+                    print(f"[API] POST 请求被重定向 (302)，请检查 API 地址是否正确: {url}")
+
+                # 如果响应状态码不是 2xx，记录更多信息
+                if response.status_code >= 400:
+                    error_text = response.text[:500]
+                    print(f"[API] 请求失败: HTTP {response.status_code} - {error_text}")
+                    # 抛出包含更多信息的自定义异常，或者在 raise_for_status 之前抛出
+                    raise Exception(f"{response.status_code} {response.reason_phrase}: {error_text}")
+
+                if not verify and origin not in _insecure_origins:
+                    _insecure_origins.add(origin)
+                    print(f"[API] ⚠️ {origin} 证书校验失败，后续请求将关闭证书校验")
+
+                try:
+                    return response.json()
+                except Exception as json_err:
+                    print(f"[API] 解析 JSON 失败: {str(json_err)}")
+                    return {"success": True, "message": "请求成功但解析 JSON 失败", "text": response.text}
             except (httpx.HTTPError, ssl.SSLError, Exception) as e:
                 last_error = e
+                # HTTP/2 协议错误时，下一次尝试改用 HTTP/1.1 客户端，无需等待
+                if _fallback_to_http1(url, e):
+                    continue
+
                 # 如果是 SSL 错误且当前验证为 True，则跳出重试循环，尝试下一个配置
-                if isinstance(e, (ssl.SSLError, httpx.ConnectError)) and config["verify"]:
+                if isinstance(e, (ssl.SSLError, httpx.ConnectError)) and verify:
                     print(f"[API] SSL/连接错误，将尝试备选配置: {str(e)}")
                     break
                 
@@ -132,9 +299,9 @@ def request_with_retry(method, url, max_retries=3, timeout=60.0, **kwargs):
                     print(f"[API] 捕获到 302 重定向错误: {e.response.headers.get('Location')}")
                 
                 if attempt < max_retries - 1:
-                    wait_time = (attempt + 1) * 2
-                    print(f"[API] 请求失败 ({type(e).__name__}: {str(e)})，正在进行第 {attempt + 2} 次重试 (等待 {wait_time}s)...")
-                    time.sleep(wait_time)
+                    wait_time = max((attempt + 1) * 2, min(retry_after_delay(url), RETRY_AFTER_MAX_WAIT))
+                    print(f"[API] 请求失败 ({type(e).__name__}: {str(e)})，正在进行第 {attempt + 2} 次重试 (等待 {wait_time:.0f}s)...")
+                    await asyncio.sleep(wait_time)
                 else:
                     print(f"[API] 第 {attempt + 1} 次尝试失败，已达到最大重试次数")
                     
@@ -142,6 +309,125 @@ def request_with_retry(method, url, max_retries=3, timeout=60.0, **kwargs):
     raise last_error
 
 
+def request_with_retry(method, url, max_retries=3, timeout=60.0, **kwargs):
+    """带重试机制的请求函数（同步版本，参数和返回值与 request_with_retry_async 相同）"""
+    return run_sync(request_with_retry_async(method, url, max_retries=max_retries, timeout=timeout, **kwargs))
+
+
+# ========== 轮询调度 ==========
+
+def _parse_timestamp(value) -> float:
+    """解析接口返回的时间 (秒/毫秒时间戳或 ISO 8601 字符串)，返回 Unix 时间戳，无法解析时返回 None"""
+    if value in (None, ""):
+        return None
+    if isinstance(value, (int, float)) or (isinstance(value, str) and value.replace(".", "", 1).isdigit()):
+        value = float(value)
+        return value / 1000 if value > 1e11 else value
+    try:
+        return datetime.fromisoformat(str(value).replace("Z", "+00:00")).timestamp()
+    except ValueError:
+        return None
+
+
+def _parse_progress(value) -> float:
+    """解析任务进度 (数字或 "45%" 形式的字符串)，返回 0~100，无法解析时返回 None"""
+    try:
+        return min(100.0, max(0.0, float(str(value).rstrip("%"))))
+    except (TypeError, ValueError):
+        return None
+
+
+# 接口返回的任务完成时间字段 (按优先级)
+COMPLETED_TIME_KEYS = ["completed_at", "completedAt", "finished_at", "finishedAt", "updated_at", "updatedAt"]
+
+
+class PollSchedule:
+    """
+    单个任务的轮询节奏
+
+    按 POLL_PROFILES 中提供者的配置：提交后先等待 initial_delay，之后间隔按倍数退避并加随机抖动；
+    有进度信息时根据进度增长速度估计剩余时间，即将完成时缩短间隔；服务端返回 Retry-After 时不早于其要求。
+    同时统计轮询次数，以及视频完成到被检测到的延迟。
+    Seedance 任务共用 SeedancePoller 的查询节奏，只使用 first_poll_time 和统计功能，不调用 next_delay。
+    """
+
+    def __init__(self, provider: str, start_time: float = None, url: str = None):
+        """
+        Args:
+            provider: 提供者名称 (POLL_PROFILES 的键)
+            start_time: 任务提交时间，默认为当前时间
+            url: 查询接口地址，用于读取该服务的 Retry-After，为空时不检查
+        """
+        self.provider = provider
+        self.profile = POLL_PROFILES[provider]
+        self.start_time = start_time or time.time()
+        self.url = url
+        self.polls = 0
+        self.last_poll = None  # 最近一次查询时间
+        self.previous_poll = None  # 上一次查询时间 (用于估计检测延迟上限)
+        self._interval = self.profile["interval"]
+        self._progress = []  # [(时间, 进度), ...]
+
+    def first_poll_time(self) -> float:
+        """首次查询的最早时间 (提交时间 + initial_delay，恢复的任务可能已经过了这个时间)"""
+        return self.start_time + self.profile["initial_delay"]
+
+    def next_delay(self) -> float:
+        """距离下一次查询需要等待的秒数"""
+        profile = self.profile
+        now = time.time()
+        if not self.polls:
+            delay = max(0.0, self.first_poll_time() - now)
+        else:
+            delay = self._interval
+            self._interval = min(self._interval * profile["backoff"], profile["max_interval"])
+            remaining = self._estimate_remaining(now)
+            if remaining is not None:
+                delay = min(delay, max(profile["min_interval"], remaining))
+            delay *= random.uniform(1 - profile["jitter"], 1 + profile["jitter"])
+        if self.url:
+            delay = max(delay, retry_after_delay(self.url))
+        return delay
+
+    def _estimate_remaining(self, now: float) -> float:
+        """按最近两次进度的增长速度估计剩余秒数，进度信息不足时返回 None"""
+        if not self._progress:
+            return None
+        last_time, last_progress = self._progress[-1]
+        if last_progress >= 100:
+            return 0.0
+        for sample_time, sample_progress in reversed(self._progress[:-1]):
+            if sample_progress < last_progress:
+                rate = (last_progress - sample_progress) / (last_time - sample_time)
+                return max(0.0, (100 - last_progress) / rate - (now - last_time))
+        return None
+
+    def record_poll(self, progress=None) -> None:
+        """记录一次查询结果 (progress 为接口返回的进度，可为空)"""
+        self.polls += 1
+        self.previous_poll, self.last_poll = self.last_poll, time.time()
+        progress = _parse_progress(progress)
+        if progress is not None:
+            self._progress.append((self.last_poll, progress))
+
+    def summary(self, video: dict = None) -> str:
+        """
+        轮询统计文本：查询次数和完成到检测的延迟
+
+        Args:
+            video: 最后一次查询返回的任务信息，带完成时间时计算实际延迟，否则以上一次查询时间估计延迟上限
+        """
+        video = video or {}
+        completed = _parse_timestamp(next((video[key] for key in COMPLETED_TIME_KEYS if video.get(key)), None))
+        if completed is not None and completed <= self.last_poll:
+            lag = f"{self.last_poll - completed:.0f}秒"
+        elif self.previous_poll is not None:
+            lag = f"≤{self.last_poll - self.previous_poll:.0f}秒"
+        else:
+            lag = "未知"
+        return f"🔁 轮询 {self.polls} 次，完成后 {lag} 检测到"
+
+
 # ========== 模型提供者选项 ==========
 PROVIDER_OPTIONS = ["seedance", "sora2", "sora2free"]
 
@@ -187,7 +473,7 @@ SORA2FREE_MODEL_OPTIONS = [
 ]
 
 
-def upload_image(file_path: str) -> dict:
+async def upload_image_async(file_path: str) -> dict:
     """
     上传图片到 Seedance 远程API服务
     """
@@ -197,8 +483,7 @@ def upload_image(file_path: str) -> dict:
 
     try:
         # 读取文件内容到内存，避免重试时文件指针问题
-        with open(path, "rb") as f:
-            file_content = f.read()
+        file_content = await asyncio.to_thread(path.read_bytes)
 
         # 获取正确的 MIME 类型
         content_type = _get_content_type(path.suffix)
@@ -206,7 +491,7 @@ def upload_image(file_path: str) -> dict:
         # 使用元组格式：(文件名, 文件内容, MIME类型)
         files = {"file": (path.name, file_content, content_type)}
 
-        return request_with_retry(
+        return await request_with_retry_async(
             "POST",
             f"{SEEDANCE_API_BASE_URL}/api/upload",
             files=files,
@@ -217,7 +502,12 @@ def upload_image(file_path: str) -> dict:
         return {"success": False, "message": f"上传失败: {str(e)}"}
 
 
-def create_seedance_video(prompt: str, model: str, duration: int, ratio: str, image_url: str = None) -> dict:
+def upload_image(file_path: str) -> dict:
+    """上传图片到 Seedance 远程API服务（同步版本）"""
+    return run_sync(upload_image_async(file_path))
+
+
+async def create_seedance_video_async(prompt: str, model: str, duration: int, ratio: str, image_url: str = None) -> dict:
     """
     创建 Seedance 视频任务
     """
@@ -231,7 +521,7 @@ def create_seedance_video(prompt: str, model: str, duration: int, ratio: str, im
         payload["image"] = image_url
 
     try:
-        return request_with_retry(
+        return await request_with_retry_async(
             "POST",
             f"{SEEDANCE_API_BASE_URL}/api/video/create",
             json=payload,
@@ -242,12 +532,17 @@ def create_seedance_video(prompt: str, model: str, duration: int, ratio: str, im
         return {"success": False, "message": f"创建视频失败: {str(e)}"}
 
 
-def get_seedance_videos() -> list:
+def create_seedance_video(*args, **kwargs) -> dict:
+    """创建 Seedance 视频任务（同步版本，参数和返回值与 create_seedance_video_async 相同）"""
+    return run_sync(create_seedance_video_async(*args, **kwargs))
+
+
+async def get_seedance_videos_async() -> list:
     """
     获取 Seedance 视频列表
     """
     try:
-        result = request_with_retry(
+        result = await request_with_retry_async(
             "GET",
             f"{SEEDANCE_API_BASE_URL}/api/videos",
             headers=get_seedance_auth_headers(),
@@ -261,37 +556,161 @@ def get_seedance_videos() -> list:
         return []
 
 
-def find_seedance_video_by_task_id(task_id: str) -> dict:
+def get_seedance_videos() -> list:
+    """获取 Seedance 视频列表（同步版本）"""
+    return run_sync(get_seedance_videos_async())
+
+
+def build_seedance_video_index(videos: list) -> dict:
+    """
+    将 Seedance 视频列表建成 {任务ID: 视频} 索引
+
+    以 taskId / task_id / id 原值为键，再以去掉 ::model 后缀的核心ID为键；
+    原值优先于核心ID，同一个键对应多个视频时保留列表中靠前的一个。
+    """
+    index = {}
+    for video in videos:
+        for key in (video.get("taskId"), video.get("task_id"), video.get("id")):
+            if key not in (None, ""):
+                index.setdefault(str(key), video)
+    for video in videos:
+        for key in (video.get("taskId"), video.get("task_id"), video.get("id")):
+            if key not in (None, ""):
+                index.setdefault(str(key).split("::")[0], video)
+    return index
+
+
+def _match_seedance_video(videos: list, task_id: str, index: dict = None) -> dict:
+    """
+    在 Seedance 视频列表中查找 task_id 对应的视频
+
+    Args:
+        videos: 视频列表
+        task_id: 任务ID (可带 ::model 后缀)
+        index: build_seedance_video_index 建好的索引，同一列表查找多个任务时传入以复用
+
+    Returns:
+        视频信息字典，未找到返回 None
+    """
+    if index is None:
+        index = build_seedance_video_index(videos)
+
+    # 精确匹配，再用核心task_id（去掉 ::model 后缀）匹配
+    core_task_id = task_id.split("::")[0]
+    video = index.get(task_id) or index.get(core_task_id)
+    if video or not SEEDANCE_FUZZY_MATCH or not core_task_id:
+        return video
+
+    # 前缀匹配 (需开启 SEEDANCE_FUZZY_MATCH，列表中的ID以核心task_id开头，可能匹配到ID相近的其他视频)
+    for video in videos:
+        vid_task_id = str(video.get("taskId") or video.get("task_id") or "")
+        if vid_task_id.startswith(core_task_id):
+            print(f"[Seedance] ⚠️ 任务ID {task_id} 未精确匹配，按前缀匹配使用 {vid_task_id}")
+            return video
+
+    return None
+
+
+async def find_seedance_video_by_task_id_async(task_id: str) -> dict:
     """
     根据task_id从 Seedance 视频列表中查找视频
     参考 client.py 中的 find_video_by_task_id 方法
     """
-    videos = get_seedance_videos()
+    videos = await get_seedance_videos_async()
     if not videos:
         return None
+    return _match_seedance_video(videos, task_id)
 
-    # 提取核心task_id（去掉 ::model 后缀）
-    core_task_id = task_id.split("::")[0] if "::" in task_id else task_id
 
-    for video in videos:
-        vid_task_id = video.get("taskId") or video.get("task_id") or ""
-        vid_id = str(video.get("id", ""))
+def find_seedance_video_by_task_id(task_id: str) -> dict:
+    """根据task_id从 Seedance 视频列表中查找视频（同步版本）"""
+    return run_sync(find_seedance_video_by_task_id_async(task_id))
 
-        # 精确匹配
-        if task_id == vid_task_id or task_id == vid_id:
-            return video
 
-        # 核心ID匹配
-        if core_task_id == vid_task_id or core_task_id == vid_id:
-            return video
+class SeedancePoller:
+    """
+    Seedance 任务共享轮询器
 
-        # 部分匹配
-        if vid_task_id and core_task_id in vid_task_id:
-            return video
-        if core_task_id and vid_task_id and vid_task_id in core_task_id:
-            return video
+    Seedance 只提供整个视频列表的查询接口，各任务单独轮询时 N 个任务每个间隔会重复下载 N 次列表。
+    查询节奏由轮询器统一掌握 (POLL_PROFILES["seedance"] 的退避与抖动，轮询器启动时从 interval 开始)，
+    每次请求一次 /api/videos 并分发给所有等待者；新任务登记首次查询的最早时间 (提交后 initial_delay)，
+    从那之后的第一次共享查询开始获得结果。没有等待中的任务时轮询协程自动退出，有新任务登记时再重新启动。
+    """
 
-    return None
+    def __init__(self, profile: dict = POLL_PROFILES["seedance"]):
+        self.profile = profile
+        self._waiters = []  # [(最早查询时间, task_id, Future), ...]
+        self._task = None
+        self._wake = None  # 有新等待者登记时唤醒轮询协程，重新计算下次查询时间
+        self._interval = profile["interval"]
+        self._next_fetch = 0.0  # 共享节奏的下次查询时间
+
+    async def next_status(self, task_id: str, not_before: float = 0) -> dict:
+        """
+        等待下一次共享列表查询中 task_id 对应的视频
+
+        Args:
+            task_id: 任务ID
+            not_before: 最早查询时间 (Unix 时间戳)，新任务传入提交后 initial_delay 的时间，0 表示下一次查询
+
+        Returns:
+            视频信息字典，列表中未找到 (或查询失败) 时返回 None
+        """
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.append((not_before, task_id, future))
+        if self._task is None or self._task.done():
+            self._task = asyncio.ensure_future(self._run())
+        elif self._wake and not self._wake.done():
+            self._wake.set_result(None)
+        return await future
+
+    def _schedule_next_fetch(self) -> None:
+        """按共享节奏计算下次查询时间：间隔加随机抖动，之后按倍数退避"""
+        profile = self.profile
+        delay = self._interval * random.uniform(1 - profile["jitter"], 1 + profile["jitter"])
+        self._interval = min(self._interval * profile["backoff"], profile["max_interval"])
+        self._next_fetch = time.time() + delay
+
+    async def _run(self):
+        print("[Seedance] ▶️ 共享轮询已启动")
+        self._interval = self.profile["interval"]
+        self._next_fetch = 0.0
+        ready = []
+        try:
+            while self._waiters:
+                # 只有首次查询时间都未到时才等到最早的那个，否则按共享节奏查询
+                fetch_at = max(self._next_fetch, min(not_before for not_before, _, _ in self._waiters))
+                wait = max(fetch_at - time.time(), retry_after_delay(SEEDANCE_API_BASE_URL))
+                if wait > 0:
+                    self._wake = asyncio.get_running_loop().create_future()
+                    await asyncio.wait({self._wake}, timeout=wait)
+                    continue
+
+                # 首次查询时间在 min_interval 内即将到达的新任务也一起分发 (同时提交的任务不必再等一个间隔)
+                cutoff = time.time() + self.profile["min_interval"]
+                ready = [waiter for waiter in self._waiters if waiter[0] <= cutoff]
+                self._waiters = [waiter for waiter in self._waiters if waiter[0] > cutoff]
+                videos = await get_seedance_videos_async()
+                index = build_seedance_video_index(videos)
+                for _, task_id, future in ready:
+                    if not future.done():
+                        future.set_result(_match_seedance_video(videos, task_id, index) if videos else None)
+                print(f"[Seedance] 🔄 共享轮询: 1 次列表请求，分发给 {len(ready)} 个任务")
+                ready = []
+                self._schedule_next_fetch()
+                # 让收到结果的等待者先登记下一次查询，再判断是否还有等待中的任务
+                await asyncio.sleep(0)
+        except BaseException as e:
+            # 轮询异常退出时唤醒所有等待者，避免任务一直挂起
+            for _, _, future in ready + self._waiters:
+                if not future.done():
+                    future.set_exception(e if isinstance(e, Exception) else RuntimeError("Seedance 轮询已停止"))
+            self._waiters = []
+            raise
+        print("[Seedance] ⏹️ 没有等待中的任务，共享轮询已停止")
+
+
+seedance_poller = SeedancePoller()
 
 
 # ========== Sora2 API 函数 ==========
@@ -387,7 +806,8 @@ def upload_image_to_url(file_path: str, compress: bool = True, max_size: int = 1
         return None
 
 
-def create_sora2_video(prompt: str, model: str, duration: int, orientation: str, image_urls: list = None) -> dict:
+async def create_sora2_video_async(prompt: str, model: str, duration: int, orientation: str,
+                                   image_urls: list = None) -> dict:
     """
     创建 Sora2 视频任务
 
@@ -416,7 +836,7 @@ def create_sora2_video(prompt: str, model: str, duration: int, orientation: str,
         print(f"[Sora2] 发送请求: {SORA2_API_BASE_URL}/v1/video/create")
         print(f"[Sora2] 参数: model={model}, duration={duration}, orientation={orientation}")
 
-        result = request_with_retry(
+        result = await request_with_retry_async(
             "POST",
             f"{SORA2_API_BASE_URL}/v1/video/create",
             json=payload,
@@ -442,7 +862,12 @@ def create_sora2_video(prompt: str, model: str, duration: int, orientation: str,
         return {"success": False, "message": f"创建Sora2视频失败: {str(e)}"}
 
 
-def query_sora2_video(task_id: str) -> dict:
+def create_sora2_video(*args, **kwargs) -> dict:
+    """创建 Sora2 视频任务（同步版本，参数和返回值与 create_sora2_video_async 相同）"""
+    return run_sync(create_sora2_video_async(*args, **kwargs))
+
+
+async def query_sora2_video_async(task_id: str) -> dict:
     """
     查询 Sora2 视频任务状态
 
@@ -453,7 +878,7 @@ def query_sora2_video(task_id: str) -> dict:
         任务状态字典
     """
     try:
-        result = request_with_retry(
+        result = await request_with_retry_async(
             "GET",
             f"{SORA2_API_BASE_URL}/v1/video/query?id={task_id}",
             headers=get_sora2_auth_headers(),
@@ -465,6 +890,11 @@ def query_sora2_video(task_id: str) -> dict:
         return None
 
 
+def query_sora2_video(task_id: str) -> dict:
+    """查询 Sora2 视频任务状态（同步版本）"""
+    return run_sync(query_sora2_video_async(task_id))
+
+
 # ========== Sora2免费 API 函数 ==========
 
 def get_sora2free_auth_headers() -> dict:
@@ -476,7 +906,27 @@ def get_sora2free_auth_headers() -> dict:
     return headers
 
 
-def create_sora2free_video(prompt: str, model: str, image_urls: list = None) -> dict:
+async def iter_sse_json(response: httpx.Response):
+    """
+    逐行读取流式响应，产出 (原始行, 数据) 元组 (异步生成器)
+
+    兼容标准 SSE 的 "data: {...}" 行和直接返回的 JSON 行 (图生视频可能直接返回 JSON)；
+    空行跳过，[DONE] 和无法解析为 JSON 的行的数据为 None。
+    """
+    async for line in response.aiter_lines():
+        if not line:
+            continue
+        payload = line[6:] if line.startswith('data: ') else line
+        data = None
+        if payload != '[DONE]':
+            try:
+                data = json.loads(payload)
+            except json.JSONDecodeError:
+                pass
+        yield line, data
+
+
+async def create_sora2free_video_async(prompt: str, model: str, image_urls: list = None) -> dict:
     """
     创建 Sora2免费 视频任务
     支持文生视频(SSE流式响应)和图生视频(直接JSON响应)两种模式
@@ -493,9 +943,6 @@ def create_sora2free_video(prompt: str, model: str, image_urls: list = None) ->
         return {"success": False, "message": "Sora2免费 API Key 未配置"}
 
     try:
-        import re
-        import json as json_module
-
         # 判断是否为图生视频模式
         is_image_to_video = image_urls and len(image_urls) > 0
 
@@ -542,138 +989,101 @@ def create_sora2free_video(prompt: str, model: str, image_urls: list = None) ->
         timeout_seconds = 600.0 if is_image_to_video else 300.0
         print(f"[Sora2免费] 超时时间: {timeout_seconds}秒")
 
-        # 发送请求
-        with httpx.Client(timeout=timeout_seconds) as client:
-            with client.stream(
-                "POST",
-                url,
-                json=payload,
-                headers=get_sora2free_auth_headers()
-            ) as response:
-                if response.status_code != 200:
-                    error_text = ""
-                    try:
-                        for chunk in response.iter_bytes():
-                            error_text += chunk.decode('utf-8', errors='ignore')
-                            if len(error_text) > 500:
-                                break
-                    except:
-                        pass
-                    return {"success": False, "message": f"请求失败: HTTP {response.status_code}\n{error_text[:500]}"}
-
-                # 收集完整响应内容
-                video_url = None
-                full_content = ""
-                result_urls = []
-                raw_response = ""
-                error_message = None  # 用于捕获错误信息
-
-                for line in response.iter_lines():
-                    if line:
-                        line = line.decode('utf-8') if isinstance(line, bytes) else line
-                        raw_response += line + "\n"
-                        print(f"[Sora2免费] 收到数据: {line[:200]}...")  # 调试日志
-
-                        # 尝试解析 SSE 格式: data: {...}
-                        if line.startswith('data: '):
-                            data = line[6:]  # 去掉 'data: '
-                            if data == '[DONE]':
-                                continue
-                            try:
-                                chunk = json_module.loads(data)
-
-                                # 🔴 优先检查错误响应
-                                if chunk.get('error'):
-                                    error_obj = chunk.get('error', {})
-                                    error_message = error_obj.get('message', str(error_obj))
-                                    print(f"[Sora2免费] ❌ API返回错误: {error_message[:200]}")
-                                    # 不立即返回，继续读取流直到结束
-                                    continue
-
-                                # 检查是否是最终结果格式 (包含 result_urls)
-                                if chunk.get('result_urls'):
-                                    result_urls = chunk.get('result_urls', [])
-                                    if result_urls:
-                                        video_url = result_urls[0]
-                                        print(f"[Sora2免费] ✅ 从 SSE result_urls 提取到视频URL: {video_url}")
-                                        break
-
-                                # 检查 SSE delta 格式
-                                delta = chunk.get('choices', [{}])[0].get('delta', {})
-                                content_text = delta.get('content', '')
-                                if content_text:
-                                    full_content += content_text
-                                    # 从 HTML 格式提取视频URL
-                                    video_match = re.search(r"src='(https?://[^']+)'", content_text)
-                                    if video_match:
-                                        video_url = video_match.group(1)
-                                        print(f"[Sora2免费] ✅ 从 HTML 提取到视频URL: {video_url}")
-                            except json_module.JSONDecodeError:
-                                pass
-                        else:
-                            # 尝试直接解析为 JSON（图生视频可能返回直接 JSON）
-                            try:
-                                result = json_module.loads(line)
-                                # 🔴 检查错误响应
-                                if result.get('error'):
-                                    error_obj = result.get('error', {})
-                                    error_message = error_obj.get('message', str(error_obj))
-                                    print(f"[Sora2免费] ❌ API返回错误: {error_message[:200]}")
-                                    continue
-
-                                # 检查是否包含 result_urls
-                                if result.get('result_urls'):
-                                    result_urls = result.get('result_urls', [])
-                                    if result_urls:
-                                        video_url = result_urls[0]
-                                        print(f"[Sora2免费] ✅ 从 JSON result_urls 提取到视频URL: {video_url}")
-                                        break
-                                # 检查 status 字段
-                                if result.get('status') == 'success' and result.get('result_urls'):
-                                    result_urls = result.get('result_urls', [])
-                                    if result_urls:
-                                        video_url = result_urls[0]
-                                        print(f"[Sora2免费] ✅ 从成功响应提取到视频URL: {video_url}")
-                                        break
-                            except json_module.JSONDecodeError:
-                                pass
-
-                # 🔴 如果有错误信息，优先返回错误
-                if error_message and not video_url:
-                    return {"success": False, "message": f"API错误: {error_message}"}
-
-                # 如果还没找到，尝试从完整响应中解析
-                if not video_url and raw_response:
-                    # 尝试找到 JSON 对象
-                    try:
-                        # 查找包含 result_urls 的 JSON
-                        json_match = re.search(r'\{[^{}]*"result_urls"[^{}]*\[.*?\][^{}]*\}', raw_response, re.DOTALL)
-                        if json_match:
-                            result = json_module.loads(json_match.group())
-                            result_urls = result.get('result_urls', [])
-                            if result_urls:
-                                video_url = result_urls[0]
-                                print(f"[Sora2免费] ✅ 从原始响应正则匹配提取到视频URL: {video_url}")
-                    except:
-                        pass
-
-                    # 尝试解析整个响应
-                    if not video_url:
-                        try:
-                            result = json_module.loads(raw_response.strip())
-                            if result.get('result_urls'):
-                                result_urls = result.get('result_urls', [])
-                                if result_urls:
-                                    video_url = result_urls[0]
-                                    print(f"[Sora2免费] ✅ 从完整响应解析提取到视频URL: {video_url}")
-                        except:
-                            pass
-
-                if video_url:
-                    return {"success": True, "video_url": video_url, "raw_content": full_content, "result_urls": result_urls}
-                else:
-                    print(f"[Sora2免费] ❌ 未找到视频URL，原始响应: {raw_response[:1000]}")
-                    return {"success": False, "message": "未在响应中提取到视频URL", "raw_content": raw_response[:2000]}
+        # 发送请求 (复用 Sora2免费 服务的连接池)
+        client = get_http_client(url)
+        async with client.stream(
+            "POST",
+            url,
+            json=payload,
+            headers=get_sora2free_auth_headers(),
+            timeout=timeout_seconds
+        ) as response:
+            if response.status_code != 200:
+                error_text = ""
+                try:
+                    async for chunk in response.aiter_bytes():
+                        error_text += chunk.decode('utf-8', errors='ignore')
+                        if len(error_text) > 500:
+                            break
+                except:
+                    pass
+                return {"success": False, "message": f"请求失败: HTTP {response.status_code}\n{error_text[:500]}"}
+
+            # 收集完整响应内容
+            video_url = None
+            full_content = ""
+            result_urls = []
+            raw_response = ""
+            error_message = None  # 用于捕获错误信息
+
+            async for line, chunk in iter_sse_json(response):
+                raw_response += line + "\n"
+                print(f"[Sora2免费] 收到数据: {line[:200]}...")  # 调试日志
+                if not isinstance(chunk, dict):
+                    continue
+
+                # 🔴 优先检查错误响应
+                if chunk.get('error'):
+                    error_obj = chunk.get('error', {})
+                    error_message = error_obj.get('message', str(error_obj)) if isinstance(error_obj, dict) else str(error_obj)
+                    print(f"[Sora2免费] ❌ API返回错误: {error_message[:200]}")
+                    # 不立即返回，继续读取流直到结束
+                    continue
+
+                # 检查是否是最终结果格式 (包含 result_urls)
+                if chunk.get('result_urls'):
+                    result_urls = chunk.get('result_urls', [])
+                    video_url = result_urls[0]
+                    print(f"[Sora2免费] ✅ 从 result_urls 提取到视频URL: {video_url}")
+                    break
+
+                # 检查 SSE delta 格式
+                delta = (chunk.get('choices') or [{}])[0].get('delta', {})
+                content_text = delta.get('content', '')
+                if content_text:
+                    full_content += content_text
+                    # 从 HTML 格式提取视频URL
+                    video_match = re.search(r"src='(https?://[^']+)'", content_text)
+                    if video_match:
+                        video_url = video_match.group(1)
+                        print(f"[Sora2免费] ✅ 从 HTML 提取到视频URL: {video_url}")
+
+        # 🔴 如果有错误信息，优先返回错误
+        if error_message and not video_url:
+            return {"success": False, "message": f"API错误: {error_message}"}
+
+        # 如果还没找到，尝试从完整响应中解析
+        if not video_url and raw_response:
+            # 尝试找到 JSON 对象
+            try:
+                # 查找包含 result_urls 的 JSON
+                json_match = re.search(r'\{[^{}]*"result_urls"[^{}]*\[.*?\][^{}]*\}', raw_response, re.DOTALL)
+                if json_match:
+                    result = json.loads(json_match.group())
+                    result_urls = result.get('result_urls', [])
+                    if result_urls:
+                        video_url = result_urls[0]
+                        print(f"[Sora2免费] ✅ 从原始响应正则匹配提取到视频URL: {video_url}")
+            except:
+                pass
+
+            # 尝试解析整个响应
+            if not video_url:
+                try:
+                    result = json.loads(raw_response.strip())
+                    if result.get('result_urls'):
+                        result_urls = result.get('result_urls', [])
+                        if result_urls:
+                            video_url = result_urls[0]
+                            print(f"[Sora2免费] ✅ 从完整响应解析提取到视频URL: {video_url}")
+                except:
+                    pass
+
+        if video_url:
+            return {"success": True, "video_url": video_url, "raw_content": full_content, "result_urls": result_urls}
+        else:
+            print(f"[Sora2免费] ❌ 未找到视频URL，原始响应: {raw_response[:1000]}")
+            return {"success": False, "message": "未在响应中提取到视频URL", "raw_content": raw_response[:2000]}
 
     except httpx.TimeoutException:
         return {"success": False, "message": "请求超时"}
@@ -681,8 +1091,23 @@ def create_sora2free_video(prompt: str, model: str, image_urls: list = None) ->
         return {"success": False, "message": f"请求失败: {str(e)}"}
 
 
-def generate_sora2free_video(prompt: str, model: str, images=None):
-    """生成 Sora2免费 视频 (支持文生视频和图生视频)"""
+def create_sora2free_video(*args, **kwargs) -> dict:
+    """创建 Sora2免费 视频任务（同步版本，参数和返回值与 create_sora2free_video_async 相同）"""
+    return run_sync(create_sora2free_video_async(*args, **kwargs))
+
+
+def _report_status(on_status, message: str) -> None:
+    """向调用方报告生成进度 (如后台任务管理器)，未设置回调时忽略"""
+    if on_status:
+        on_status(message)
+
+
+async def generate_sora2free_video_async(prompt: str, model: str, images=None, on_status=None):
+    """
+    生成 Sora2免费 视频 (支持文生视频和图生视频)
+
+    on_status: 进度回调，参数为状态文本 (各 generate_*_async 函数相同)
+    """
     if not prompt or not prompt.strip():
         return None, "❌ 请输入视频描述提示词"
 
@@ -707,8 +1132,8 @@ def generate_sora2free_video(prompt: str, model: str, images=None):
             print(f"[Sora2免费] 📤 正在处理 {len(image_list)} 张图片...")
             for img_path in image_list:
                 if img_path:
-                    # 使用已有的 upload_image_to_url 函数转换为 base64 data URL
-                    image_url = upload_image_to_url(img_path)
+                    # 使用已有的 upload_image_to_url 函数转换为 base64 data URL (压缩和编码在线程中进行)
+                    image_url = await asyncio.to_thread(upload_image_to_url, img_path)
                     if image_url:
                         image_urls.append(image_url)
                         # 统计图片来源
@@ -734,8 +1159,9 @@ def generate_sora2free_video(prompt: str, model: str, images=None):
             mode = "文生视频"
 
         print(f"[Sora2免费] 🎬 正在提交{mode}任务...")
+        _report_status(on_status, f"🎬 正在生成{mode}，完成后一次性返回结果...")
 
-        create_result = create_sora2free_video(prompt, model, image_urls if image_urls else None)
+        create_result = await create_sora2free_video_async(prompt, model, image_urls if image_urls else None)
 
         if not create_result.get("success"):
             return None, f"❌ {create_result.get('message', '未知错误')}"
@@ -743,8 +1169,9 @@ def generate_sora2free_video(prompt: str, model: str, images=None):
         video_url = create_result.get("video_url")
         if video_url:
             print(f"[Sora2免费] 📎 视频URL: {video_url}")
+            _report_status(on_status, "📥 视频已生成，正在下载到本地...")
             # 下载视频到本地
-            local_path = download_video_to_local(video_url, use_seedance_proxy=False)
+            local_path = await download_video_to_local_async(video_url, use_seedance_proxy=False)
             if local_path:
                 return local_path, f"✅ Sora2免费视频生成成功! ({mode})\n📎 视频URL: {video_url}\n💡 已下载到本地"
             else:
@@ -756,7 +1183,95 @@ def generate_sora2free_video(prompt: str, model: str, images=None):
         return None, f"❌ 发生错误: {str(e)}"
 
 
-def download_video_to_local(video_url: str, use_seedance_proxy: bool = True) -> str:
+def generate_sora2free_video(prompt: str, model: str, images=None, on_status=None):
+    """生成 Sora2免费 视频（同步版本）"""
+    return run_sync(generate_sora2free_video_async(prompt, model, images, on_status))
+
+
+def _video_suffix(content_type: str, video_url: str) -> str:
+    """根据响应类型和 URL 确定视频文件扩展名"""
+    if "mp4" in content_type or video_url.endswith(".mp4"):
+        return ".mp4"
+    if "webm" in content_type or video_url.endswith(".webm"):
+        return ".webm"
+    return ".mp4"  # 默认mp4
+
+
+def _content_total(response: httpx.Response, offset: int) -> int:
+    """从响应头获取文件总大小 (206 响应取 Content-Range，否则为 偏移 + Content-Length)，未知时返回 None"""
+    content_range = response.headers.get("content-range", "")
+    if response.status_code == 206 and "/" in content_range:
+        total = content_range.rsplit("/", 1)[1].strip()
+        return int(total) if total.isdigit() else None
+    length = response.headers.get("content-length")
+    return offset + int(length) if length and length.isdigit() else None
+
+
+async def _stream_download_async(client: httpx.AsyncClient, download_url: str, video_url: str) -> tuple:
+    """
+    流式下载视频到临时文件，连接中断时用 Range 请求从已下载位置续传
+
+    数据先按 DOWNLOAD_CHUNK_SIZE 分块写入 <临时文件>.part，下载完整后原子重命名为临时文件，
+    因此返回的路径总是完整的视频；服务端不支持 Range (续传时返回 200) 时从头重新下载。
+    请求 Accept-Encoding: identity 并按原始字节写盘，已下载字节数与 Content-Length / Range 偏移始终对应。
+
+    Returns:
+        (本地文件路径, 文件字节数)
+    """
+    temp_path = part_path = None
+    downloaded = 0
+    resumes = 0
+    timeout = httpx.Timeout(DOWNLOAD_READ_TIMEOUT, connect=30.0)
+
+    try:
+        while True:
+            headers = {"Accept-Encoding": "identity"}
+            if downloaded:
+                headers["Range"] = f"bytes={downloaded}-"
+            try:
+                async with client.stream("GET", download_url, headers=headers, timeout=timeout) as response:
+                    response.raise_for_status()
+                    if downloaded and response.status_code != 206:
+                        print(f"[Gradio] ⚠️ 服务端不支持断点续传，重新下载")
+                        downloaded = 0
+                    if temp_path is None:
+                        fd, temp_path = tempfile.mkstemp(
+                            suffix=_video_suffix(response.headers.get("content-type", ""), video_url)
+                        )
+                        os.close(fd)
+                        part_path = f"{temp_path}.part"
+                    total = _content_total(response, downloaded)
+
+                    f = await asyncio.to_thread(open, part_path, "ab" if downloaded else "wb")
+                    try:
+                        async for chunk in response.aiter_raw(DOWNLOAD_CHUNK_SIZE):
+                            await asyncio.to_thread(f.write, chunk)
+                            downloaded += len(chunk)
+                    finally:
+                        await asyncio.to_thread(f.close)
+
+                if total is not None and downloaded < total:
+                    raise httpx.RemoteProtocolError(f"连接提前关闭 ({downloaded}/{total} 字节)")
+                break
+            except httpx.TransportError as e:
+                # 尚未开始接收数据 (连接或证书错误) 时交给调用方处理；已开始接收时续传
+                if temp_path is None or resumes >= DOWNLOAD_MAX_RESUMES:
+                    raise
+                resumes += 1
+                print(f"[Gradio] ⚠️ 下载中断 ({type(e).__name__})，已下载 {downloaded / (1024 * 1024):.2f} MB，"
+                      f"第 {resumes} 次续传...")
+                await asyncio.sleep(min(2 ** resumes, 10))
+
+        os.replace(part_path, temp_path)
+        return temp_path, downloaded
+    except BaseException:
+        for path in (part_path, temp_path):
+            if path and os.path.exists(path):
+                os.remove(path)
+        raise
+
+
+async def download_video_to_local_async(video_url: str, use_seedance_proxy: bool = True) -> str:
     """
     下载视频到本地临时文件
     参考 client.py 中的 download_video 方法
@@ -788,55 +1303,22 @@ def download_video_to_local(video_url: str, use_seedance_proxy: bool = True) ->
         else:
             download_url = video_url
 
-        # 使用较长的超时时间，视频文件可能较大
         try:
-            # 同样尝试多种配置
-            configs = [
-                {"http2": False, "verify": True},
-                {"http2": False, "verify": False},
-            ]
-            
-            response = None
-            last_err = None
-            
-            for config in configs:
+            # 同样先校验证书，失败时关闭校验重试 (复用下载地址的连接池)
+            verify_options = [False] if _url_origin(download_url) in _insecure_origins else [True, False]
+
+            for verify in verify_options:
                 try:
-                    with httpx.Client(
-                        timeout=300.0, 
-                        follow_redirects=True,
-                        http2=config["http2"],
-                        verify=config["verify"]
-                    ) as client:
-                        response = client.get(download_url)
-                        response.raise_for_status()
-                        break
+                    temp_path, size = await _stream_download_async(
+                        get_http_client(download_url, verify=verify), download_url, video_url
+                    )
+                    break
                 except Exception as e:
-                    last_err = e
-                    if config["verify"]: continue
+                    if verify: continue
                     else: raise e
 
-            if response and response.status_code == 200:
-                # 获取文件扩展名
-                content_type = response.headers.get("content-type", "")
-                if "mp4" in content_type or video_url.endswith(".mp4"):
-                    suffix = ".mp4"
-                elif "webm" in content_type or video_url.endswith(".webm"):
-                    suffix = ".webm"
-                else:
-                    suffix = ".mp4"  # 默认mp4
-
-                # 创建临时文件
-                fd, temp_path = tempfile.mkstemp(suffix=suffix)
-                with os.fdopen(fd, 'wb') as f:
-                    f.write(response.content)
-
-                file_size = len(response.content) / (1024 * 1024)  # MB
-                print(f"[Gradio] ✅ 视频下载完成: {temp_path} ({file_size:.2f} MB)")
-                return temp_path
-            else:
-                print(f"[Gradio] ❌ 视频下载失败: HTTP {response.status_code}")
-                return None
-
+            print(f"[Gradio] ✅ 视频下载完成: {temp_path} ({size / (1024 * 1024):.2f} MB)")
+            return temp_path
         except httpx.TimeoutException:
             print(f"[Gradio] ❌ 视频下载超时")
             return None
@@ -849,8 +1331,18 @@ def download_video_to_local(video_url: str, use_seedance_proxy: bool = True) ->
         return None
 
 
-def generate_seedance_video(prompt: str, model: str, duration: int, ratio: str, image=None):
-    """生成 Seedance 视频 - 包含轮询等待逻辑"""
+def download_video_to_local(video_url: str, use_seedance_proxy: bool = True) -> str:
+    """下载视频到本地临时文件（同步版本）"""
+    return run_sync(download_video_to_local_async(video_url, use_seedance_proxy))
+
+
+async def generate_seedance_video_async(prompt: str, model: str, duration: int, ratio: str, image=None,
+                                        on_status=None, on_task=None):
+    """
+    生成 Seedance 视频 - 包含轮询等待逻辑
+
+    on_task: 任务创建成功后以任务ID回调 (用于持久化，服务重启后可继续等待)
+    """
     if not prompt or not prompt.strip():
         return None, "❌ 请输入视频描述提示词"
 
@@ -861,16 +1353,13 @@ def generate_seedance_video(prompt: str, model: str, duration: int, ratio: str,
     # 追加当前 UI 选择的参数到提示词末尾
     prompt = f"{prompt.strip()} -duration={duration} -ratio={ratio}"
 
-    max_wait_seconds = 600  # 最大等待10分钟
-    poll_interval = 10  # 每10秒轮询一次
-
     try:
         # 如果有图片，先上传
         image_url = None
         image_source = ""
         if image is not None:
             print("[Seedance] 📤 正在上传图片...")
-            upload_result = upload_image(image)
+            upload_result = await upload_image_async(image)
             if not upload_result.get("success"):
                 return None, f"❌ 图片上传失败: {upload_result.get('message', '未知错误')}"
             image_url = upload_result.get("url")
@@ -887,7 +1376,7 @@ def generate_seedance_video(prompt: str, model: str, duration: int, ratio: str,
         mode = f"图生视频({image_source})" if image_url else "文生视频"
         print(f"[Seedance] 🎬 正在提交{mode}任务到远程服务器...")
 
-        create_result = create_seedance_video(prompt, model, duration, ratio, image_url)
+        create_result = await create_seedance_video_async(prompt, model, duration, ratio, image_url)
 
         if not create_result.get("success"):
             return None, f"❌ 创建任务失败: {create_result.get('message', '未知错误')}"
@@ -901,15 +1390,45 @@ def generate_seedance_video(prompt: str, model: str, duration: int, ratio: str,
             return None, f"⚠️ 任务已提交({mode})，但无法获取任务ID，请稍后手动查询"
 
         print(f"[Seedance] ✅ 任务创建成功! 任务ID: {task_id}")
+        _report_status(on_status, f"✅ 任务已创建 ({mode})，任务ID: {task_id}")
+
+        if on_task:
+            on_task(task_id)
+        return await wait_seedance_video_async(task_id, mode, on_status)
+
+    except httpx.ConnectError:
+        return None, f"❌ 无法连接到远程API服务器: {SEEDANCE_API_BASE_URL}\n请检查网络连接和服务器状态"
+    except Exception as e:
+        return None, f"❌ 发生错误: {str(e)}"
+
+
+async def wait_seedance_video_async(task_id: str, mode: str = "文生视频", on_status=None, start_time: float = None):
+    """
+    轮询等待 Seedance 任务完成并下载视频到本地
 
+    Args:
+        task_id: 任务ID
+        mode: 生成模式说明，用于结果文本
+        on_status: 进度回调，参数为状态文本
+        start_time: 任务提交时间 (恢复服务重启前的任务时传入，超时和耗时从提交时算起)，默认为当前时间
+
+    Returns:
+        (本地视频路径或 None, 结果说明文本)
+    """
+    max_wait_seconds = 600  # 最大等待10分钟
+    schedule = PollSchedule("seedance", start_time)  # 只用于统计，查询节奏由共享轮询器统一掌握
+
+    try:
         # 轮询等待视频生成完成
-        start_time = time.time()
-        elapsed = 0
+        start_time = schedule.start_time
+        elapsed = 0  # 恢复的任务即使已超过等待时间也至少查询一次
         progress_chars = ["⠋", "⠙", "⠹", "⠸", "⠼", "⠴", "⠦", "⠧", "⠇", "⠏"]
 
         while elapsed < max_wait_seconds:
-            # 查找视频
-            video = find_seedance_video_by_task_id(task_id)
+            # 按轮询节奏等待共享轮询器的下一次列表查询结果
+            video = await seedance_poller.next_status(task_id, 0 if schedule.polls else schedule.first_poll_time())
+            schedule.record_poll(video.get("progress") if video else None)
+            elapsed = time.time() - start_time
 
             if video:
                 status = (video.get("status") or "").lower()
@@ -917,13 +1436,14 @@ def generate_seedance_video(prompt: str, model: str, duration: int, ratio: str,
 
                 # 检查完成状态
                 if status in ["completed", "success", "done", "finished", "succeeded"]:
-                    print(f"[Seedance] 🎉 视频生成完成!")
+                    print(f"[Seedance] 🎉 视频生成完成! {schedule.summary(video)}")
+                    _report_status(on_status, "📥 视频生成完成，正在下载到本地...")
                     if video_url:
                         print(f"[Seedance] 📎 视频远程地址: {video_url}")
                         # 下载视频到本地，避免Gradio直接访问外网URL导致DNS解析失败
-                        local_path = download_video_to_local(video_url, use_seedance_proxy=True)
+                        local_path = await download_video_to_local_async(video_url, use_seedance_proxy=True)
                         if local_path:
-                            return local_path, f"✅ 视频生成成功! ({mode})\n⏱️ 耗时: {int(elapsed)}秒\n🔗 远程服务: {SEEDANCE_API_BASE_URL}\n📎 视频URL: {video_url}\n💡 已通过代理下载到本地"
+                            return local_path, f"✅ 视频生成成功! ({mode})\n⏱️ 耗时: {int(elapsed)}秒\n{schedule.summary(video)}\n🔗 远程服务: {SEEDANCE_API_BASE_URL}\n📎 视频URL: {video_url}\n💡 已通过代理下载到本地"
                         else:
                             # 下载失败时返回代理URL供用户手动下载
                             proxy_url = f"{SEEDANCE_API_BASE_URL}/proxy/{video_url}"
@@ -938,11 +1458,9 @@ def generate_seedance_video(prompt: str, model: str, duration: int, ratio: str,
 
             # 更新进度
             elapsed = time.time() - start_time
-            idx = int(elapsed / poll_interval) % len(progress_chars)
+            idx = schedule.polls % len(progress_chars)
             print(f"[Seedance] {progress_chars[idx]} 视频生成中... 已等待 {int(elapsed)}秒")
-
-            # 等待下次轮询
-            time.sleep(poll_interval)
+            _report_status(on_status, f"{progress_chars[idx]} 视频生成中... 已等待 {int(elapsed)}秒，任务ID: {task_id}")
 
         # 超时
         return None, f"⏰ 等待超时({max_wait_seconds}秒)，任务ID: {task_id}\n请稍后使用任务ID查询结果"
@@ -953,14 +1471,21 @@ def generate_seedance_video(prompt: str, model: str, duration: int, ratio: str,
         return None, f"❌ 发生错误: {str(e)}"
 
 
-def generate_sora2_video_task(prompt: str, model: str, duration: int, orientation: str, images=None):
-    """生成 Sora2 视频 - 包含轮询等待逻辑"""
+def generate_seedance_video(*args, **kwargs):
+    """生成 Seedance 视频（同步版本，参数和返回值与 generate_seedance_video_async 相同）"""
+    return run_sync(generate_seedance_video_async(*args, **kwargs))
+
+
+async def generate_sora2_video_task_async(prompt: str, model: str, duration: int, orientation: str, images=None,
+                                          on_status=None, on_task=None):
+    """
+    生成 Sora2 视频 - 包含轮询等待逻辑
+
+    on_task: 任务创建成功后以任务ID回调 (用于持久化，服务重启后可继续等待)
+    """
     if not prompt or not prompt.strip():
         return None, "❌ 请输入视频描述提示词"
 
-    max_wait_seconds = 900  # Sora2 可能需要更长时间，最大等待15分钟
-    poll_interval = 15  # 每15秒轮询一次
-
     try:
         # 如果有图片，转换为URL
         image_urls = []
@@ -979,7 +1504,7 @@ def generate_sora2_video_task(prompt: str, model: str, duration: int, orientatio
             print(f"[Sora2] 📤 正在处理 {len(image_list)} 张图片...")
             for img_path in image_list:
                 if img_path:
-                    image_url = upload_image_to_url(img_path)
+                    image_url = await asyncio.to_thread(upload_image_to_url, img_path)
                     if image_url:
                         image_urls.append(image_url)
                         # 统计图片来源
@@ -1004,7 +1529,7 @@ def generate_sora2_video_task(prompt: str, model: str, duration: int, orientatio
             mode = "文生视频"
         print(f"[Sora2] 🎬 正在提交{mode}任务到远程服务器...")
 
-        create_result = create_sora2_video(prompt, model, duration, orientation, image_urls)
+        create_result = await create_sora2_video_async(prompt, model, duration, orientation, image_urls)
 
         if not create_result.get("success"):
             return None, f"❌ 创建任务失败: {create_result.get('message', '未知错误')}"
@@ -1018,30 +1543,63 @@ def generate_sora2_video_task(prompt: str, model: str, duration: int, orientatio
             return None, f"⚠️ 任务已提交({mode})，但无法获取任务ID，请稍后手动查询"
 
         print(f"[Sora2] ✅ 任务创建成功! 任务ID: {task_id}")
+        _report_status(on_status, f"✅ 任务已创建 ({mode})，任务ID: {task_id}")
 
+        if on_task:
+            on_task(task_id)
+        return await wait_sora2_video_async(task_id, mode, on_status)
+
+    except httpx.ConnectError:
+        return None, f"❌ 无法连接到远程API服务器: {SORA2_API_BASE_URL}\n请检查网络连接和服务器状态"
+    except Exception as e:
+        return None, f"❌ 发生错误: {str(e)}"
+
+
+async def wait_sora2_video_async(task_id: str, mode: str = "文生视频", on_status=None, start_time: float = None):
+    """
+    轮询等待 Sora2 任务完成并下载视频到本地
+
+    Args:
+        task_id: 任务ID
+        mode: 生成模式说明，用于结果文本
+        on_status: 进度回调，参数为状态文本
+        start_time: 任务提交时间 (恢复服务重启前的任务时传入，超时和耗时从提交时算起)，默认为当前时间
+
+    Returns:
+        (本地视频路径或 None, 结果说明文本)
+    """
+    max_wait_seconds = 900  # Sora2 可能需要更长时间，最大等待15分钟
+    # 查询节奏见 POLL_PROFILES，进度接近 100% 时缩短间隔
+    schedule = PollSchedule("sora2", start_time, url=SORA2_API_BASE_URL)
+
+    try:
         # 轮询等待视频生成完成
-        start_time = time.time()
-        elapsed = 0
+        start_time = schedule.start_time
+        elapsed = 0  # 恢复的任务即使已超过等待时间也至少查询一次
         progress_chars = ["⠋", "⠙", "⠹", "⠸", "⠼", "⠴", "⠦", "⠧", "⠇", "⠏"]
 
         while elapsed < max_wait_seconds:
-            # 查询任务状态
-            video = query_sora2_video(task_id)
+            # 等待下次轮询 (不占用线程)，再查询任务状态
+            await asyncio.sleep(schedule.next_delay())
+            video = await query_sora2_video_async(task_id)
+            schedule.record_poll(video.get("progress") if video else None)
+            elapsed = time.time() - start_time
 
             if video:
                 status = (video.get("status") or "").lower()
                 video_url = video.get("video_url") or video.get("videoUrl") or video.get("url")
-                progress = video.get("progress", 0)
+                progress = _parse_progress(video.get("progress")) or 0  # 可能是数字或 "45%" 形式的字符串
 
                 # 检查完成状态
                 if status in ["completed", "success", "done", "finished", "succeeded"]:
-                    print(f"[Sora2] 🎉 视频生成完成!")
+                    print(f"[Sora2] 🎉 视频生成完成! {schedule.summary(video)}")
+                    _report_status(on_status, "📥 视频生成完成，正在下载到本地...")
                     if video_url:
                         print(f"[Sora2] 📎 视频远程地址: {video_url}")
                         # Sora2 视频不需要代理
-                        local_path = download_video_to_local(video_url, use_seedance_proxy=False)
+                        local_path = await download_video_to_local_async(video_url, use_seedance_proxy=False)
                         if local_path:
-                            return local_path, f"✅ 视频生成成功! ({mode})\n⏱️ 耗时: {int(elapsed)}秒\n🔗 远程服务: {SORA2_API_BASE_URL}\n📎 视频URL: {video_url}\n💡 已下载到本地"
+                            return local_path, f"✅ 视频生成成功! ({mode})\n⏱️ 耗时: {int(elapsed)}秒\n{schedule.summary(video)}\n🔗 远程服务: {SORA2_API_BASE_URL}\n📎 视频URL: {video_url}\n💡 已下载到本地"
                         else:
                             return None, f"⚠️ 视频生成完成但下载失败\n📎 视频URL: {video_url}\n请复制链接手动下载"
                     else:
@@ -1054,15 +1612,14 @@ def generate_sora2_video_task(prompt: str, model: str, duration: int, orientatio
 
                 # 显示进度
                 if progress > 0:
-                    print(f"[Sora2] 📊 进度: {progress}%")
+                    print(f"[Sora2] 📊 进度: {progress:g}%")
 
             # 更新进度
             elapsed = time.time() - start_time
-            idx = int(elapsed / poll_interval) % len(progress_chars)
+            idx = schedule.polls % len(progress_chars)
             print(f"[Sora2] {progress_chars[idx]} 视频生成中... 已等待 {int(elapsed)}秒")
-
-            # 等待下次轮询
-            time.sleep(poll_interval)
+            progress_text = f"，进度 {progress:g}%" if video and progress else ""
+            _report_status(on_status, f"{progress_chars[idx]} 视频生成中... 已等待 {int(elapsed)}秒{progress_text}，任务ID: {task_id}")
 
         # 超时
         return None, f"⏰ 等待超时({max_wait_seconds}秒)，任务ID: {task_id}\n请稍后使用任务ID查询结果"
@@ -1073,15 +1630,277 @@ def generate_sora2_video_task(prompt: str, model: str, duration: int, orientatio
         return None, f"❌ 发生错误: {str(e)}"
 
 
-def generate_video(provider: str, prompt: str, model: str, duration: int, ratio: str, image=None):
-    """统一的视频生成入口函数"""
+def generate_sora2_video_task(*args, **kwargs):
+    """生成 Sora2 视频（同步版本，参数和返回值与 generate_sora2_video_task_async 相同）"""
+    return run_sync(generate_sora2_video_task_async(*args, **kwargs))
+
+
+async def generate_video_async(provider: str, prompt: str, model: str, duration: int, ratio: str, image=None,
+                               on_status=None, on_task=None):
+    """
+    统一的视频生成入口函数 (异步版本)
+
+    轮询等待期间只占用事件循环中的一个协程，不占用线程，
+    同一进程可以同时等待大量生成任务。
+    on_status 接收进度文本；on_task 接收提供者任务ID (Sora2免费 为单次流式请求，没有任务ID)。
+
+    Returns:
+        (本地视频路径或 None, 结果说明文本)
+    """
     if provider == "sora2":
-        return generate_sora2_video_task(prompt, model, duration, ratio, image)
+        return await generate_sora2_video_task_async(prompt, model, duration, ratio, image, on_status, on_task)
     elif provider == "sora2free":
         # Sora2免费 支持文生视频和图生视频
-        return generate_sora2free_video(prompt, model, image)
+        return await generate_sora2free_video_async(prompt, model, image, on_status)
     else:
-        return generate_seedance_video(prompt, model, duration, ratio, image)
+        return await generate_seedance_video_async(prompt, model, duration, ratio, image, on_status, on_task)
+
+
+def generate_video(*args, **kwargs):
+    """统一的视频生成入口函数（同步版本，参数和返回值与 generate_video_async 相同）"""
+    return run_sync(generate_video_async(*args, **kwargs))
+
+
+# ========== 后台任务管理 ==========
+JOB_STATUS_TEXT = {
+    "queued": "⏳ 排队中",
+    "running": "🎬 生成中",
+    "succeeded": "✅ 已完成",
+    "failed": "❌ 失败"
+}
+
+
+class JobStore:
+    """
+    视频生成任务的 SQLite 持久化存储
+
+    保存提供者、提供者任务ID、生成参数、状态、时间、结果路径和提交任务的浏览器标识，服务重启后据此恢复未完成的任务。
+    """
+
+    COLUMNS = ["id", "provider", "model", "params", "task_id", "status", "message", "video_path",
+               "created_at", "updated_at", "owner"]
+
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    provider TEXT NOT NULL,
+                    model TEXT,
+                    params TEXT NOT NULL,
+                    task_id TEXT,
+                    status TEXT NOT NULL,
+                    message TEXT,
+                    video_path TEXT,
+                    created_at REAL NOT NULL,
+                    updated_at REAL NOT NULL,
+                    owner TEXT
+                )
+            """)
+            # 旧版本创建的数据库没有 owner 列
+            columns = [row[1] for row in self._conn.execute("PRAGMA table_info(jobs)")]
+            if "owner" not in columns:
+                self._conn.execute("ALTER TABLE jobs ADD COLUMN owner TEXT")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status)")
+
+    def save(self, job: dict) -> None:
+        """写入 (或覆盖) 一条任务记录"""
+        with self._lock, self._conn:
+            self._conn.execute(
+                f"INSERT OR REPLACE INTO jobs ({', '.join(self.COLUMNS)}) VALUES ({', '.join('?' * len(self.COLUMNS))})",
+                [json.dumps(job[key], ensure_ascii=False) if key == "params" else job.get(key)
+                 for key in self.COLUMNS]
+            )
+
+    def load_unfinished(self) -> list:
+        """读取所有未完成 (排队中或生成中) 的任务，按提交时间排序"""
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT {', '.join(self.COLUMNS)} FROM jobs WHERE status IN ('queued', 'running') ORDER BY created_at"
+            ).fetchall()
+        jobs = [dict(zip(self.COLUMNS, row)) for row in rows]
+        for job in jobs:
+            job["params"] = json.loads(job["params"])
+        return jobs
+
+
+class JobManager:
+    """
+    视频生成后台任务管理器
+
+    submit 立即返回任务ID，创建任务、轮询和下载在 qwen3vl 的共享后台事件循环中以协程运行，
+    不占用 Gradio 工作线程；界面通过 get / list_jobs 定时查询任务状态。
+    传入 store 时状态、提供者任务ID或结果变化后写入数据库 (由单个写入线程按顺序执行，不阻塞事件循环)，
+    服务重启后可用 resume 恢复未完成的任务。
+    任务记录提交者的浏览器标识 (owner)，界面只显示当前浏览器提交的任务。
+    """
+
+    def __init__(self, store: JobStore = None):
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self._store = store
+        # 单个写入线程保证同一任务的记录按更新顺序落盘；解释器退出时会等待剩余写入完成
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="job-store") if store else None
+
+    def submit(self, provider: str, prompt: str, model: str, duration: int, ratio: str, image=None,
+               owner: str = None) -> str:
+        """
+        提交视频生成任务
+
+        Args:
+            provider / prompt / model / duration / ratio / image: 同 generate_video_async
+            owner: 提交任务的浏览器标识，用于只向该浏览器显示任务
+
+        Returns:
+            任务ID
+        """
+        job_id = uuid.uuid4().hex[:8]
+        now = time.time()
+        job = {
+            "id": job_id,
+            "provider": provider,
+            "model": model,
+            "params": {"prompt": prompt, "duration": duration, "ratio": ratio, "image": image},
+            "task_id": None,  # 提供者任务ID，创建成功后写入
+            "status": "queued",
+            "message": "⏳ 已提交，等待开始...",
+            "video_path": None,
+            "created_at": now,
+            "updated_at": now,
+            "owner": owner
+        }
+        with self._lock:
+            self._jobs[job_id] = job
+        self._save(job)
+        print(f"[任务] 📋 已提交任务 {job_id} ({provider} / {model})")
+        run_background(self._run(job_id, provider, prompt, model, duration, ratio, image))
+        return job_id
+
+    def _save(self, job: dict) -> None:
+        """把任务快照交给写入线程保存，立即返回"""
+        if self._store:
+            self._writer.submit(self._write, job)
+
+    def _write(self, job: dict) -> None:
+        try:
+            self._store.save(job)
+        except sqlite3.Error as e:
+            print(f"[任务] ⚠️ 保存任务 {job['id']} 状态失败: {e}")
+
+    def _update(self, job_id: str, **fields) -> None:
+        """
+        更新任务字段
+
+        进度文字 (message) 每次轮询都会变化，只更新内存；状态、提供者任务ID或结果路径变化时才写入数据库
+        (连同当时的进度文字)。服务重启恢复任务时会重写进度文字，不需要保存中间进度。
+        """
+        with self._lock:
+            job = self._jobs[job_id]
+            changed = {key for key, value in fields.items() if job.get(key) != value}
+            if not changed:
+                return
+            job.update(fields, updated_at=time.time())
+            job = dict(job)
+        if changed - {"message"}:
+            self._save(job)
+
+    async def _run(self, job_id: str, provider: str, prompt: str, model: str, duration: int, ratio: str, image):
+        self._update(job_id, status="running", message="🎬 正在提交任务...")
+        await self._finish(job_id, generate_video_async(
+            provider, prompt, model, duration, ratio, image,
+            on_status=lambda text: self._update(job_id, message=text),
+            on_task=lambda task_id: self._update(job_id, task_id=task_id)
+        ))
+
+    async def _resume_job(self, job_id: str):
+        job = self.get(job_id)
+        wait = wait_sora2_video_async if job["provider"] == "sora2" else wait_seedance_video_async
+        self._update(job_id, status="running", message="🔄 服务已重启，继续等待任务结果...")
+        await self._finish(job_id, wait(
+            job["task_id"], "服务重启后恢复",
+            on_status=lambda text: self._update(job_id, message=text),
+            start_time=job["created_at"]
+        ))
+
+    async def _finish(self, job_id: str, generation) -> None:
+        """等待生成协程结束并记录结果"""
+        try:
+            video_path, message = await generation
+        except Exception as e:
+            video_path, message = None, f"❌ 发生错误: {str(e)}"
+        status = "succeeded" if video_path else "failed"
+        self._update(job_id, status=status, message=message, video_path=video_path)
+        print(f"[任务] {JOB_STATUS_TEXT[status]} 任务 {job_id}")
+
+    def resume(self) -> list:
+        """
+        恢复服务重启前未完成的任务 (启动时调用一次)
+
+        已拿到提供者任务ID的 Seedance / Sora2 任务继续轮询，已生成完成的直接下载，不会重新提交；
+        尚未拿到任务ID的任务 (包括 Sora2免费 的单次流式请求) 无法确认是否已提交，标记为失败。
+
+        Returns:
+            恢复的任务ID列表
+        """
+        if not self._store:
+            return []
+        resumed = []
+        for job in self._store.load_unfinished():
+            with self._lock:
+                self._jobs[job["id"]] = job
+            if job["task_id"] and job["provider"] in ("seedance", "sora2"):
+                print(f"[任务] 🔄 恢复任务 {job['id']} ({job['provider']} 任务ID: {job['task_id']})")
+                run_background(self._resume_job(job["id"]))
+            elif job["provider"] == "sora2free":
+                self._update(job["id"], status="failed", message="⚠️ Sora2免费 任务无法在服务重启后恢复，请重新提交")
+            else:
+                self._update(job["id"], status="failed", message="⚠️ 服务重启前任务未创建完成，请重新提交")
+            resumed.append(job["id"])
+        return resumed
+
+    def get(self, job_id: str) -> dict:
+        """获取任务状态的副本，不存在时返回 None"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job else None
+
+    def list_jobs(self, job_ids: list = None) -> list:
+        """列出任务状态的副本 (可按任务ID过滤)，最新提交的在前"""
+        with self._lock:
+            jobs = [dict(job) for job in self._jobs.values() if job_ids is None or job["id"] in job_ids]
+        return sorted(jobs, key=lambda job: job["created_at"], reverse=True)
+
+    def job_ids_for_owner(self, owner: str) -> list:
+        """列出某个浏览器提交的任务ID (包括服务重启后恢复的任务)，按提交时间排序"""
+        if not owner:
+            return []
+        with self._lock:
+            jobs = sorted((job for job in self._jobs.values() if job.get("owner") == owner),
+                          key=lambda job: job["created_at"])
+        return [job["id"] for job in jobs]
+
+
+job_manager = JobManager(JobStore(JOB_DB_PATH))
+
+
+def format_jobs_table(jobs: list) -> str:
+    """把任务列表格式化为 Markdown 表格"""
+    if not jobs:
+        return "*暂无任务*"
+    lines = [
+        "| 任务ID | 提供者 | 模型 | 状态 | 进度 | 用时 |",
+        "| --- | --- | --- | --- | --- | --- |"
+    ]
+    for job in jobs:
+        end_time = job["updated_at"] if job["status"] in ("succeeded", "failed") else time.time()
+        message = (job["message"] or "").splitlines()[0].replace("|", "/")
+        lines.append(f"| `{job['id']}` | {job['provider']} | {job['model']} | {JOB_STATUS_TEXT[job['status']]} | "
+                     f"{message} | {int(end_time - job['created_at'])}秒 |")
+    return "\n".join(lines)
 
 
 # ========== 样例视频配置 ==========
@@ -1098,27 +1917,64 @@ def load_sample_video():
         return None
 
 
-def extract_prompt_from_video(video_path):
-    """从视频中提取提示词和关键帧"""
+def extract_sora2_prompt(result, fallback_zh=True):
+    """从分析结果中提取完整的 SORA2 英文提示词 (代码块未闭合时返回空字符串)"""
+    en_match = re.search(r'## SORA2 Prompt \(English\)\s*```\s*(.*?)\s*```', result, re.DOTALL)
+    en_prompt = en_match.group(1).strip() if en_match else ""
+
+    # 如果没提取到英文，尝试提取中文
+    if not en_prompt and fallback_zh:
+        zh_match = re.search(r'## SORA2 提示词 \(中文\)\s*```\s*(.*?)\s*```', result, re.DOTALL)
+        en_prompt = zh_match.group(1).strip() if zh_match else ""
+    return en_prompt
+
+
+async def extract_prompt_from_video(video_path):
+    """
+    从视频中提取提示词和关键帧 (异步生成器，逐步更新界面)
+
+    分析直接在 Gradio 的事件循环上运行 (qwen3vl 按事件循环复用模型客户端)，等待模型输出时不占用工作线程。
+    关键帧一提取出来就显示在画廊中，模型输出逐段写入提取结果，
+    英文提示词代码块一闭合就填入提示词输入框。
+    输出顺序: 提取结果, 提示词, 关键帧画廊, 关键帧状态
+    """
     if not video_path:
-        return "❌ 请先上传视频", "", [], []
+        yield "❌ 请先上传视频", "", [], []
+        return
     try:
         print(f"[Gradio] 🔍 正在分析视频提取提示词: {video_path}")
-        result, frames = analyze_video(video_path, sora2_mode=True, stream=False, keep_frames=True)
-        
-        # 提取英文提示词用于生成
-        en_match = re.search(r'## SORA2 Prompt \(English\)\s*```\s*(.*?)\s*```', result, re.DOTALL)
-        en_prompt = en_match.group(1).strip() if en_match else ""
-        
-        # 如果没提取到英文，尝试提取中文
-        if not en_prompt:
-            zh_match = re.search(r'## SORA2 提示词 \(中文\)\s*```\s*(.*?)\s*```', result, re.DOTALL)
-            en_prompt = zh_match.group(1).strip() if zh_match else ""
-            
-        # 返回两次 frames，分别用于 Gallery 显示和 State 存储
-        return result, en_prompt, frames, frames
+        yield "⏳ 正在提取关键帧...", gr.update(), [], []
+
+        result = ""
+        en_prompt = ""
+        preview = []
+        frames = []
+        async for event in iter_analyze_video_async(video_path, sora2_mode=True, stream=True, keep_frames=True):
+            if event['type'] == 'frame':
+                # 逐帧预览 (此时帧还在内存中，尚未写入文件)
+                preview.append(Image.open(io.BytesIO(event['frame']['data'])))
+                yield f"⏳ 已提取 {event['count']} 帧...", gr.update(), preview, gr.update()
+            elif event['type'] == 'frames':
+                # 去重后实际发送给模型的帧；返回两次，分别用于 Gallery 显示和 State 存储
+                frames = event['paths']
+                yield "⏳ 关键帧已就绪，正在生成 SORA2 提示词...", gr.update(), frames, frames
+            elif event['type'] == 'token':
+                result += event['text']
+                if not en_prompt:
+                    en_prompt = extract_sora2_prompt(result, fallback_zh=False)
+                    if en_prompt:
+                        print(f"[Gradio] ✅ 英文提示词已生成 ({len(en_prompt)} 字符)")
+                        yield result, en_prompt, gr.update(), gr.update()
+                        continue
+                yield result, gr.update(), gr.update(), gr.update()
+            elif event['type'] == 'result':
+                # 最终结果 (命中缓存时没有 token 事件)
+                result = event['result']
+                frames = event['paths'] or frames
+                print(f"[Gradio] ⏱️ {format_metrics(event['timings'])}")
+                yield result, extract_sora2_prompt(result), frames, frames
     except Exception as e:
-        return f"❌ 提示词提取失败: {str(e)}", "", [], []
+        yield f"❌ 提示词提取失败: {str(e)}", "", [], []
 
 
 # 构建Gradio界面
@@ -1258,6 +2114,21 @@ def create_ui():
                     interactive=False,
                     lines=6
                 )
+                gr.Markdown("### 📋 生成任务")
+                jobs_table = gr.Markdown("*暂无任务*")
+
+        # 浏览器标识 (保存在 localStorage，刷新页面或服务重启后不变)、当前浏览器提交的任务ID，以及视频区域正在显示的任务
+        client_id_state = gr.BrowserState("", storage_key="ai_video_client_id")
+        job_ids_state = gr.State([])
+        shown_job_state = gr.State(None)
+        job_timer = gr.Timer(JOB_REFRESH_SECONDS)
+
+        def load_client_jobs(client_id):
+            """打开页面时生成浏览器标识，并显示该浏览器之前提交的任务 (包括服务重启后恢复的任务)"""
+            client_id = client_id or uuid.uuid4().hex
+            return client_id, job_manager.job_ids_for_owner(client_id)
+
+        demo.load(fn=load_client_jobs, inputs=client_id_state, outputs=[client_id_state, job_ids_state])
 
         # 事件绑定 - 模型提供者切换
         def update_options_for_provider(provider_value):
@@ -1321,7 +2192,8 @@ def create_ui():
             fn=extract_prompt_from_video,
             inputs=[source_video],
             outputs=[extraction_result, prompt, extracted_frames_gallery, extracted_frames_state],
-            show_progress=True
+            # 流式更新提取结果，只显示轻量进度，避免遮挡逐字输出
+            show_progress="minimal"
         )
 
         # 加载样例视频
@@ -1354,7 +2226,8 @@ def create_ui():
         btn_15s.click(fn=lambda: "15", outputs=duration)
 
         # 生成视频
-        def process_generate(provider_val, prompt_text, model_text, duration_val, ratio_text, extracted_frames):
+        def process_generate(provider_val, prompt_text, model_text, duration_val, ratio_text, extracted_frames, job_ids,
+                             client_id):
             # 准备图片列表
             images_to_process = None
 
@@ -1405,13 +2278,41 @@ def create_ui():
                     images_to_process = None
                     print("[Gradio] 📝 Seedance 无关键帧，使用纯文生视频模式")
 
-            return generate_video(provider_val, prompt_text, model_value, int(duration_val) if duration_val else 5, ratio_value, images_to_process)
+            if not prompt_text or not prompt_text.strip():
+                return "❌ 请输入视频描述提示词", job_ids
+
+            # 提交到后台任务管理器后立即返回，生成进度由定时器刷新
+            job_id = job_manager.submit(provider_val, prompt_text, model_value, int(duration_val) if duration_val else 5, ratio_value, images_to_process,
+                                        owner=client_id)
+            job_ids = (job_ids or []) + [job_id]
+            return f"📋 任务已提交，任务ID: {job_id}\n💡 可继续提交其他任务，进度见下方任务列表", job_ids
 
         generate_btn.click(
             fn=process_generate,
-            inputs=[provider, prompt, model, duration, ratio, extracted_frames_state],
-            outputs=[video_output, status_output],
-            show_progress=True
+            inputs=[provider, prompt, model, duration, ratio, extracted_frames_state, job_ids_state, client_id_state],
+            outputs=[status_output, job_ids_state]
+        )
+
+        # 定时刷新本会话的任务状态，最新的任务完成后显示视频
+        def refresh_jobs(job_ids, shown_job):
+            if not job_ids:
+                return gr.update(), gr.update(), gr.update(), shown_job
+            jobs = job_manager.list_jobs(job_ids)
+            table = format_jobs_table(jobs)
+            latest = jobs[0]
+            if latest["status"] not in ("succeeded", "failed"):
+                return table, gr.update(), f"[{latest['id']}] {latest['message']}", shown_job
+            if latest["id"] == shown_job:
+                # 结果已显示过，不再覆盖状态信息
+                return table, gr.update(), gr.update(), shown_job
+            video = latest["video_path"] if latest["status"] == "succeeded" else gr.update()
+            return table, video, f"[{latest['id']}] {latest['message']}", latest["id"]
+
+        job_timer.tick(
+            fn=refresh_jobs,
+            inputs=[job_ids_state, shown_job_state],
+            outputs=[jobs_table, video_output, status_output, shown_job_state],
+            show_progress="hidden"
         )
 
     return demo
@@ -1426,6 +2327,10 @@ if __name__ == "__main__":
     print(f"[Gradio] 🔑 Sora2 鉴权: {'已配置' if SORA2_API_KEY else '未配置'}, 启用: {SORA2_ENABLED}")
     print(f"[Gradio] 🔑 Sora2免费 鉴权: {'已配置' if SORA2FREE_API_KEY else '未配置'}")
 
+    resumed = job_manager.resume()
+    if resumed:
+        print(f"[Gradio] 🔄 已恢复 {len(resumed)} 个重启前未完成的生成任务 ({JOB_DB_PATH})")
+
     demo = create_ui()
     port = int(os.getenv("GRADIO_PORT", "7860"))
     demo.launch(
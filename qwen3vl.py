@@ -8,14 +8,32 @@
 """
 
 import os
+import io
 import sys
 import base64
+import re
+import json
+import math
+import time
+import asyncio
+import atexit
+import shutil
+import hashlib
 import argparse
+import functools
+import statistics
+import contextvars
 import tempfile
+import threading
+import queue
+import contextlib
 import subprocess
 from pathlib import Path
-from openai import OpenAI
+from concurrent.futures import ThreadPoolExecutor, Future
+import httpx
+from openai import AsyncOpenAI, DefaultAsyncHttpxClient
 from dotenv import load_dotenv
+from PIL import Image
 
 # 加载环境变量
 load_dotenv()
@@ -24,10 +42,59 @@ load_dotenv()
 API_BASE_URL = os.getenv('QWEN_API_BASE_URL', 'https://api-inference.modelscope.cn/v1')
 API_KEY = os.getenv('QWEN_API_KEY', 'aaa')
 MODEL_ID = os.getenv('QWEN_MODEL_ID', 'Qwen/Qwen3-VL-8B-Instruct')
+# 流式请求时要求服务端在末尾返回 token 用量 (stream_options.include_usage)，服务端不支持时设为 false
+STREAM_USAGE = os.getenv('QWEN_STREAM_USAGE', 'true').lower() == 'true'
 
 # 帧提取配置
 MAX_FRAMES = 8  # 最多提取的帧数
 FRAME_QUALITY = 85  # JPEG 质量
+# 帧长边上限 (像素)，由 ffmpeg 缩放，0 表示保持原始分辨率
+FRAME_MAX_EDGE = int(os.getenv('QWEN_FRAME_MAX_EDGE', '1280'))
+# 单次请求中全部帧 base64 的总字节上限，超出时逐步降低 JPEG 质量，0 表示不限制
+PAYLOAD_MAX_BYTES = int(os.getenv('QWEN_PAYLOAD_MAX_BYTES', str(6 * 1024 * 1024)))
+PAYLOAD_MIN_QUALITY = 30  # 压缩负载时允许的最低 JPEG 质量
+# 帧提取模式: single 单次 ffmpeg 调用提取全部帧 / seek 逐个时间点调用 ffmpeg /
+# auto 短视频用 single，长视频 (>= LONG_VIDEO_SECONDS) 用 seek，避免解码整段视频
+FRAME_EXTRACT_MODE = os.getenv('QWEN_FRAME_EXTRACT_MODE', 'auto')
+LONG_VIDEO_SECONDS = float(os.getenv('QWEN_LONG_VIDEO_SECONDS', '120'))
+# seek 模式并行提取的最大进程数，默认串行；0 表示使用 CPU 核数
+# (并行的收益取决于 CPU 核数和磁盘，先用 test/bench_extract_frames.py --workers 对比后再调大)
+FRAME_EXTRACT_WORKERS = int(os.getenv('QWEN_FRAME_EXTRACT_WORKERS', '1'))
+
+# 帧采样配置: uniform 按时长均匀采样 / scene 按镜头切换点采样
+SAMPLING_MODE = os.getenv('QWEN_SAMPLING_MODE', 'uniform')
+SCENE_THRESHOLD = float(os.getenv('QWEN_SCENE_THRESHOLD', '0.3'))  # ffmpeg scene 分数阈值 (0-1)
+MIN_SHOT_SECONDS = 0.5  # 短于该时长的镜头视为转场/闪帧，不单独取帧
+
+# 帧去重配置: 感知哈希 (dHash, 64 位) 汉明距离不超过该值视为重复帧，负数表示关闭去重
+DEDUP_DISTANCE = int(os.getenv('QWEN_DEDUP_DISTANCE', '5'))
+
+# 缓存配置
+CACHE_DIR = os.getenv('QWEN_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'qwen3vl_cache'))
+CACHE_ENABLED = os.getenv('QWEN_CACHE_ENABLED', 'true').lower() == 'true'
+RESULT_CACHE_MAX_MB = float(os.getenv('QWEN_RESULT_CACHE_MAX_MB', '50'))  # 分析结果缓存上限
+RESULT_CACHE_MAX_AGE_DAYS = float(os.getenv('QWEN_RESULT_CACHE_MAX_AGE_DAYS', '30'))  # 分析结果最长保留天数
+FRAME_CACHE_MAX_MB = float(os.getenv('QWEN_FRAME_CACHE_MAX_MB', '500'))  # 帧缓存上限
+FRAME_CACHE_MAX_AGE_DAYS = float(os.getenv('QWEN_FRAME_CACHE_MAX_AGE_DAYS', '7'))  # 帧缓存最长保留天数
+PROBE_CACHE_MAX_ENTRIES = 5000  # 媒体信息缓存最多保存的文件数
+
+# 批量分析配置
+BATCH_WORKERS = int(os.getenv('QWEN_BATCH_WORKERS', '2'))  # 并发分析的视频数
+BATCH_RPM = float(os.getenv('QWEN_BATCH_RPM', '10'))  # 每分钟最多发起的分析数，0 表示不限制
+
+# 长视频分段分析 (map-reduce): 按时间段并发分析各段，再合并生成一个 SORA2 提示词
+SEGMENT_SECONDS = float(os.getenv('QWEN_SEGMENT_SECONDS', '60'))  # 每段时长
+SEGMENT_FRAMES = int(os.getenv('QWEN_SEGMENT_FRAMES', '6'))  # 每段提取的帧数
+SEGMENT_CONCURRENCY = int(os.getenv('QWEN_SEGMENT_CONCURRENCY', '4'))  # 同时分析的段数
+MAX_SEGMENTS = 20  # 段数上限，超出时自动加长每段时长
+
+# 同时进行中的模型请求上限 (所有分析共享)，0 表示不限制
+MAX_INFLIGHT_REQUESTS = int(os.getenv('QWEN_MAX_INFLIGHT', '0'))
+
+# 模型 API 连接池配置 (客户端在进程内复用，保持长连接)
+HTTP_MAX_CONNECTIONS = int(os.getenv('QWEN_HTTP_MAX_CONNECTIONS', '20'))  # 连接池最大连接数
+HTTP_MAX_KEEPALIVE = int(os.getenv('QWEN_HTTP_MAX_KEEPALIVE', '10'))  # 最多保持的空闲长连接数
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv('QWEN_HTTP_KEEPALIVE_EXPIRY', '60'))  # 空闲长连接保留秒数
 
 
 # SORA2 视频提示词专家系统提示词 - 基于复刻SORA2视频提示词专家模板
@@ -116,6 +183,169 @@ SORA2_USER_PROMPT_TEMPLATE = """这是从一个视频中提取的 {num_frames} 
 ## 输出格式
 中英文各一个完整的 SORA2 提示词"""
 
+DEFAULT_USER_PROMPT_TEMPLATE = """这是从一个视频中提取的 {num_frames} 帧关键画面。
+请根据这些画面，详细描述这个视频的内容，包括：
+1. 视频中出现的人物或物体
+2. 发生的事件或动作
+3. 场景环境
+4. 视频的主题或表达的意思
+5. 视频的整体叙事或故事线"""
+
+# 分段分析: 单段画面摘要提示词
+SEGMENT_USER_PROMPT_TEMPLATE = """这是一个视频第 {index}/{total} 段（{start} - {end}）中按时间顺序提取的 {num_frames} 帧画面，对应时间点: {stamps}。
+
+请简要记录这一段的内容，供之后与其他片段合并为完整视频的 SORA2 提示词：
+1. 主体与场景：人物/物体特征、环境、材质
+2. 动作与事件：按时间顺序描述，标注视频中的实际时间点（如 1:05s）
+3. 镜头：景别、摄像机运动、镜头切换点
+4. 光线、色彩与整体风格
+
+只输出描述，不要生成提示词，300 字以内。"""
+
+# 分段分析: 合并各段摘要生成 SORA2 提示词
+SEGMENT_MERGE_PROMPT_TEMPLATE = """以下是一个时长 {duration:.1f} 秒的视频按时间顺序分为 {total} 段后，各段画面的分析摘要：
+
+{summaries}
+
+请作为 SORA2 视频复刻提示词专家，把这些片段整合为一个完整的 SORA2 文生视频提示词。
+
+## 生成要求
+- 使用五大支柱框架组织提示词
+- 采用三段式结构：Style → Cinematography → Scene Breakdown
+- 统一全片的主体、风格和色调描述，去除各段之间的重复
+- Scene Breakdown 按片段时间线组织，每个场景使用视频中的实际时间戳（如 0:00s - 0:05s）
+- 动作描述使用精确动词（press, pour, rotate, drift）
+- 包含材质、物理效果、感官细节
+- 英文提示词约 200-400 词
+
+## 输出格式
+中英文各一个完整的 SORA2 提示词"""
+
+
+# 批量/并发分析时关闭单个任务的过程输出，避免多个任务的日志和流式 token 交错
+_quiet = contextvars.ContextVar('qwen3vl_quiet', default=False)
+
+
+def _log(*args, **kwargs):
+    """输出分析过程日志 (verbose=False 的任务中不输出)"""
+    if not _quiet.get():
+        print(*args, **kwargs)
+
+
+def _with_verbosity(func):
+    """为异步分析函数增加 verbose 参数，verbose=False 时屏蔽该调用内的过程输出"""
+    @functools.wraps(func)
+    async def wrapper(*args, verbose: bool = True, **kwargs):
+        token = _quiet.set(not verbose)
+        try:
+            return await func(*args, **kwargs)
+        finally:
+            _quiet.reset(token)
+    return wrapper
+
+
+def _with_metrics(func):
+    """
+    为异步分析函数增加 on_metrics 参数: 分析结束 (成功或失败) 时以 timings 指标字典回调一次
+
+    失败时指标中额外包含 error；未传入 timings 时自动创建。
+    """
+    @functools.wraps(func)
+    async def wrapper(*args, on_metrics=None, **kwargs):
+        if on_metrics is None:
+            return await func(*args, **kwargs)
+        timings = kwargs.get('timings')
+        if timings is None:
+            timings = kwargs['timings'] = {}
+        start_time = time.time()
+        try:
+            return await func(*args, **kwargs)
+        except Exception as e:
+            timings['error'] = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            timings.setdefault('total', time.time() - start_time)
+            on_metrics(timings)
+    return wrapper
+
+
+# ========== 异步运行环境 ==========
+# 同步接口统一提交到同一个后台事件循环执行，多个分析共享一个事件循环，
+# 等待 ffmpeg 和模型响应时不占用调用方之外的线程
+_loop = None
+_loop_thread = None
+_loop_lock = threading.Lock()
+_inflight_semaphores = {}  # id(事件循环) -> (事件循环, 信号量)
+_inflight_lock = threading.Lock()
+
+
+def _get_loop() -> asyncio.AbstractEventLoop:
+    """获取（首次调用时启动）后台事件循环"""
+    global _loop, _loop_thread
+    with _loop_lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            _loop_thread = threading.Thread(target=_loop.run_forever, name='qwen3vl-loop', daemon=True)
+            _loop_thread.start()
+    return _loop
+
+
+def run_sync(coro):
+    """在共享后台事件循环中执行协程并阻塞等待结果（供同步代码调用）"""
+    if threading.current_thread() is _loop_thread:
+        coro.close()
+        raise RuntimeError("不能在 qwen3vl 事件循环内调用同步接口，请直接 await 对应的 *_async 函数")
+    return asyncio.run_coroutine_threadsafe(coro, _get_loop()).result()
+
+
+def run_background(coro) -> Future:
+    """把协程提交到共享后台事件循环执行，立即返回 concurrent.futures.Future (不等待结果)"""
+    return asyncio.run_coroutine_threadsafe(coro, _get_loop())
+
+
+def _get_inflight_semaphore():
+    """
+    当前事件循环的模型请求并发限制 (MAX_INFLIGHT_REQUESTS 为 0 时不限制，需在事件循环中调用)
+
+    asyncio.Semaphore 绑定在首次等待它的事件循环上，因此与客户端注册表一样按事件循环分别创建；
+    同步接口都在共享后台事件循环中执行，共用同一个信号量。
+    """
+    if MAX_INFLIGHT_REQUESTS <= 0:
+        return None
+    loop = asyncio.get_running_loop()
+    with _inflight_lock:
+        for stale in [k for k, (stale_loop, _) in _inflight_semaphores.items() if stale_loop.is_closed()]:
+            del _inflight_semaphores[stale]
+        entry = _inflight_semaphores.get(id(loop))
+        if entry is None or entry[0] is not loop:
+            entry = _inflight_semaphores[id(loop)] = (loop, asyncio.Semaphore(MAX_INFLIGHT_REQUESTS))
+    return entry[1]
+
+
+async def _run_command(args: list, text: bool = False) -> subprocess.CompletedProcess:
+    """
+    以 asyncio 子进程执行命令并收集输出
+
+    行为与 subprocess.run(args, capture_output=True, check=True) 一致：
+    退出码非 0 时抛出 subprocess.CalledProcessError；任务被取消时结束子进程。
+    """
+    process = await asyncio.create_subprocess_exec(
+        *args, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE
+    )
+    try:
+        stdout, stderr = await process.communicate()
+    except asyncio.CancelledError:
+        with contextlib.suppress(ProcessLookupError):
+            process.kill()
+        raise
+
+    if text:
+        stdout = stdout.decode('utf-8', errors='replace')
+        stderr = stderr.decode('utf-8', errors='replace')
+    if process.returncode != 0:
+        raise subprocess.CalledProcessError(process.returncode, args, stdout, stderr)
+    return subprocess.CompletedProcess(args, process.returncode, stdout, stderr)
+
 
 def get_video_files(directory: str = None) -> list:
     """
@@ -148,87 +378,1210 @@ def get_video_files(directory: str = None) -> list:
     return video_files
 
 
-def get_video_duration(video_path: str) -> float:
-    """获取视频时长（秒）"""
+# 媒体信息缓存: 以 路径+大小+修改时间 为键，内存中常驻并持久化到 CACHE_DIR/probe.json
+_probe_cache = None
+_probe_cache_lock = threading.Lock()
+_probe_cache_dirty = False
+_probe_cache_saved_at = 0.0
+
+
+def _parse_rate(rate: str) -> float:
+    """解析 ffprobe 的帧率字符串 (如 30000/1001)"""
     try:
-        result = subprocess.run(
+        num, _, den = (rate or '').partition('/')
+        return float(num) / float(den or 1)
+    except (ValueError, ZeroDivisionError):
+        return 0.0
+
+
+def _parse_probe_output(data: dict) -> dict:
+    """从 ffprobe JSON 输出中整理出常用的媒体信息"""
+    stream = (data.get('streams') or [{}])[0]
+    fmt = data.get('format') or {}
+
+    duration = float(fmt.get('duration') or stream.get('duration') or 0)
+
+    rotation = 0
+    for side_data in stream.get('side_data_list') or []:
+        if 'rotation' in side_data:
+            rotation = int(float(side_data['rotation']))
+    if not rotation and (stream.get('tags') or {}).get('rotate'):
+        rotation = int(float(stream['tags']['rotate']))
+
+    # 关键帧间隔: 取读取区间内相邻关键帧时间差的平均值
+    keyframe_times = [
+        float(packet['pts_time']) for packet in data.get('packets') or []
+        if 'K' in packet.get('flags', '') and packet.get('pts_time') not in (None, 'N/A')
+    ]
+    keyframe_interval = None
+    if len(keyframe_times) >= 2:
+        keyframe_interval = (keyframe_times[-1] - keyframe_times[0]) / (len(keyframe_times) - 1)
+
+    return {
+        'duration': duration,
+        'width': int(stream.get('width') or 0),
+        'height': int(stream.get('height') or 0),
+        'fps': _parse_rate(stream.get('avg_frame_rate')) or _parse_rate(stream.get('r_frame_rate')),
+        'codec': stream.get('codec_name', ''),
+        'rotation': rotation,
+        'keyframe_interval': keyframe_interval,
+        'size': int(fmt.get('size') or 0),
+        'bit_rate': int(fmt.get('bit_rate') or 0),
+    }
+
+
+def _load_probe_cache() -> dict:
+    """首次使用时从磁盘加载媒体信息缓存（需持有 _probe_cache_lock）"""
+    global _probe_cache
+    if _probe_cache is None:
+        try:
+            with open(os.path.join(CACHE_DIR, 'probe.json'), 'r', encoding='utf-8') as f:
+                _probe_cache = json.load(f)
+        except Exception:
+            _probe_cache = {}
+    return _probe_cache
+
+
+def _save_probe_cache(force: bool = False) -> None:
+    """将媒体信息缓存写回磁盘；批量探测时最多每秒写一次，退出时强制写入"""
+    global _probe_cache_dirty, _probe_cache_saved_at
+    with _probe_cache_lock:
+        if not _probe_cache_dirty or (not force and time.time() - _probe_cache_saved_at < 1):
+            return
+        entries = sorted(_probe_cache.items(), key=lambda item: item[1].get('probed_at', 0))
+        data = dict(entries[-PROBE_CACHE_MAX_ENTRIES:])
+        try:
+            os.makedirs(CACHE_DIR, exist_ok=True)
+            path = os.path.join(CACHE_DIR, 'probe.json')
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            _log(f"警告: 媒体信息缓存写入失败: {e}")
+        _probe_cache_dirty = False
+        _probe_cache_saved_at = time.time()
+
+
+atexit.register(_save_probe_cache, True)
+
+
+async def probe_video_async(video_path: str) -> dict:
+    """
+    获取视频媒体信息（一次 ffprobe 调用，结果按 路径+大小+修改时间 缓存）
+
+    Args:
+        video_path: 视频文件路径
+
+    Returns:
+        媒体信息字典: duration(秒), width, height, fps, codec, rotation(度),
+        keyframe_interval(秒，无法判断时为 None), size, bit_rate；
+        探测失败时返回 {'duration': 0}
+    """
+    global _probe_cache_dirty
+    try:
+        stat = os.stat(video_path)
+    except OSError:
+        return {'duration': 0}
+
+    cache_key = f"{os.path.abspath(video_path)}|{stat.st_size}|{stat.st_mtime_ns}"
+    with _probe_cache_lock:
+        cached = _load_probe_cache().get(cache_key)
+    if cached:
+        # probed_at 只用于缓存淘汰，返回与新探测结果相同的字段
+        return {key: value for key, value in cached.items() if key != 'probed_at'}
+
+    try:
+        result = await _run_command(
             [
                 'ffprobe', '-v', 'error',
-                '-show_entries', 'format=duration',
-                '-of', 'default=noprint_wrappers=1:nokey=1',
+                '-select_streams', 'v:0',
+                '-show_format', '-show_streams',
+                # 只读取前 30 秒的视频包来估算关键帧间隔
+                '-show_entries', 'packet=pts_time,flags',
+                '-read_intervals', '%+30',
+                '-of', 'json',
                 video_path
             ],
-            capture_output=True,
             text=True
         )
-        return float(result.stdout.strip())
+        info = _parse_probe_output(json.loads(result.stdout))
     except Exception:
-        return 0
+        return {'duration': 0}
 
+    with _probe_cache_lock:
+        _load_probe_cache()[cache_key] = {**info, 'probed_at': time.time()}
+        _probe_cache_dirty = True
+    await asyncio.to_thread(_save_probe_cache)
+    return info
 
-def extract_frames(video_path: str, num_frames: int = MAX_FRAMES) -> list:
+
+def probe_video(video_path: str) -> dict:
+    """获取视频媒体信息（probe_video_async 的同步版本）"""
+    return run_sync(probe_video_async(video_path))
+
+
+async def get_video_duration_async(video_path: str) -> float:
+    """获取视频时长（秒）"""
+    return (await probe_video_async(video_path)).get('duration', 0)
+
+
+def get_video_duration(video_path: str) -> float:
+    """获取视频时长（秒）"""
+    return probe_video(video_path).get('duration', 0)
+
+
+def _frame_timestamps(duration: float, num_frames: int) -> list:
+    """按时长均匀计算取帧时间点（秒）"""
+    interval = duration / (num_frames + 1)
+    return [interval * (i + 1) for i in range(num_frames)]
+
+
+async def detect_scene_changes_async(video_path: str, threshold: float = SCENE_THRESHOLD) -> list:
     """
-    从视频中提取关键帧
+    使用 ffmpeg scene 分数检测镜头切换点
+
+    先缩小画面再计算 scene 分数，只做解码不做编码，耗时远小于逐帧分析。
 
     Args:
         video_path: 视频文件路径
-        num_frames: 要提取的帧数
+        threshold: scene 分数阈值，越小越敏感
 
     Returns:
-        帧图片路径列表
+        镜头切换时间点列表（秒，升序）
+    """
+    try:
+        result = await _run_command(
+            [
+                'ffmpeg', '-hide_banner', '-nostats',
+                '-i', video_path,
+                '-an', '-sn',
+                '-vf', f"scale=160:-2,select='gt(scene,{threshold})',showinfo",
+                '-f', 'null', '-'
+            ],
+            text=True
+        )
+    except subprocess.CalledProcessError as e:
+        _log(f"  镜头检测失败: {e}")
+        return []
+
+    return [float(t) for t in re.findall(r'pts_time:([\d.]+)', result.stderr)]
+
+
+def detect_scene_changes(video_path: str, threshold: float = SCENE_THRESHOLD) -> list:
+    """使用 ffmpeg scene 分数检测镜头切换点（detect_scene_changes_async 的同步版本）"""
+    return run_sync(detect_scene_changes_async(video_path, threshold))
+
+
+def _scene_timestamps(duration: float, boundaries: list, num_frames: int) -> list:
+    """
+    根据镜头切换点选取代表帧时间点
+
+    每个镜头取中点一帧；帧预算有剩余时，为最长的镜头追加第二帧
+    (取镜头 1/3 和 2/3 处)；镜头数超过预算时只保留最长的镜头。
+
+    Args:
+        duration: 视频时长（秒）
+        boundaries: 镜头切换时间点列表
+        num_frames: 帧预算（最多帧数）
+
+    Returns:
+        取帧时间点列表（升序）
+    """
+    edges = [0.0]
+    for boundary in sorted(boundaries):
+        if boundary - edges[-1] >= MIN_SHOT_SECONDS and duration - boundary >= MIN_SHOT_SECONDS:
+            edges.append(boundary)
+    edges.append(duration)
+
+    shots = [(edges[i], edges[i + 1]) for i in range(len(edges) - 1)]
+    by_length = sorted(shots, key=lambda shot: shot[1] - shot[0], reverse=True)
+
+    if len(shots) >= num_frames:
+        chosen = by_length[:num_frames]
+        return sorted((start + end) / 2 for start, end in chosen)
+
+    # 剩余预算分配给最长的镜头，每个镜头最多两帧
+    doubled = set(by_length[:num_frames - len(shots)])
+    timestamps = []
+    for start, end in shots:
+        length = end - start
+        if (start, end) in doubled and length >= 2 * MIN_SHOT_SECONDS:
+            timestamps.extend([start + length / 3, start + length * 2 / 3])
+        else:
+            timestamps.append((start + end) / 2)
+    return timestamps
+
+
+def _frame_qscale() -> str:
+    """将 JPEG 质量 (1-100) 换算为 ffmpeg 的 -q:v 参数"""
+    return str(int((100 - FRAME_QUALITY) / 10) + 1)
+
+
+def _scale_filter(max_edge: int) -> str:
+    """生成把长边缩小到 max_edge 以内的 scale 滤镜 (不放大、保持宽高比、宽高取偶数)，0 表示不缩放"""
+    if not max_edge or max_edge <= 0:
+        return ''
+    return (f"scale='min(iw,{max_edge})':'min(ih,{max_edge})'"
+            f":force_original_aspect_ratio=decrease:force_divisible_by=2")
+
+
+def _pop_jpeg_frames(buffer: bytes) -> tuple:
+    """
+    从 image2pipe 输出的 JPEG 字节流中按 SOI/EOI 标记切出完整的帧
+
+    Returns:
+        (完整帧列表, 剩余的不完整数据)
+    """
+    images = []
+    start = buffer.find(b'\xff\xd8')
+    while start != -1:
+        end = buffer.find(b'\xff\xd9', start + 2)
+        if end == -1:
+            return images, buffer[start:]
+        images.append(buffer[start:end + 2])
+        start = buffer.find(b'\xff\xd8', end + 2)
+    # 管道读取可能正好把下一帧的 SOI 标记切开，保留末尾的 \xff 与下次读到的数据拼接
+    return images, buffer[-1:] if buffer.endswith(b'\xff') else b''
+
+
+def _split_jpeg_stream(data: bytes) -> list:
+    """将 image2pipe 输出的连续 JPEG 字节流按 SOI/EOI 标记切分为单帧"""
+    return _pop_jpeg_frames(data)[0]
+
+
+async def _extract_frame_at(video_path: str, timestamp: float, single_thread: bool = False,
+                            max_edge: int = 0) -> bytes:
+    """调用一次 ffmpeg 提取指定时间点的一帧，返回 JPEG 字节"""
+    scale = _scale_filter(max_edge)
+    result = await _run_command(
+        [
+            'ffmpeg', '-y',
+            '-ss', str(timestamp),
+            # 并行提取时每个进程单线程解码，避免线程数超出 CPU 核数
+            *(['-threads', '1'] if single_thread else []),
+            '-i', video_path,
+            '-vframes', '1',
+            *(['-vf', scale] if scale else []),
+            '-q:v', _frame_qscale(),
+            '-f', 'image2pipe', '-vcodec', 'mjpeg',
+            'pipe:1'
+        ]
+    )
+    images = _split_jpeg_stream(result.stdout)
+    return images[0] if images else None
+
+
+async def _iter_frames_seek(video_path: str, timestamps: list, workers: int = 1,
+                            max_edge: int = 0, start_index: int = 0):
+    """
+    逐个时间点调用 ffmpeg 提取帧（每帧一个进程），JPEG 直接写入管道
+
+    所有时间点同时提交，最多 workers 个进程并行，按时间点顺序逐帧产出。
+
+    Args:
+        video_path: 视频文件路径
+        timestamps: 取帧时间点列表
+        workers: 并行进程数，1 表示串行
+        max_edge: 帧长边上限，0 表示不缩放
+        start_index: 第一帧的序号
+
+    Yields:
+        帧记录，提取失败的帧会被跳过
+    """
+    num_frames = start_index + len(timestamps)
+    workers = max(1, min(workers, len(timestamps)))
+    limit = asyncio.Semaphore(workers)
+
+    async def extract(timestamp):
+        async with limit:
+            try:
+                return await _extract_frame_at(video_path, timestamp, single_thread=workers > 1,
+                                               max_edge=max_edge), None
+            except subprocess.CalledProcessError as e:
+                return None, e
+
+    if workers > 1:
+        _log(f"  使用 {workers} 个进程并行提取")
+    tasks = [asyncio.ensure_future(extract(timestamp)) for timestamp in timestamps]
+    try:
+        for i, (timestamp, task) in enumerate(zip(timestamps, tasks), start=start_index):
+            image, error = await task
+            if error:
+                _log(f"  帧 {i+1} 提取失败: {error}")
+            elif image:
+                _log(f"  提取帧 {i+1}/{num_frames} @ {timestamp:.1f}s")
+                yield {'index': i, 'timestamp': timestamp, 'data': image}
+    finally:
+        # 调用方提前结束时取消尚未完成的提取
+        for task in tasks:
+            task.cancel()
+
+
+async def _iter_frames_single_pass(video_path: str, timestamps: list, max_edge: int = 0):
     """
-    duration = get_video_duration(video_path)
+    单次调用 ffmpeg 提取全部时间点的帧
+
+    通过 select 滤镜选出每个时间点之后的第一帧，只需启动一个进程、解析一次容器，
+    JPEG 通过 image2pipe 写入标准输出，每解析出一帧立即产出。
+    showinfo 滤镜在标准错误中输出每个选中帧的实际时间 (pts_time)，据此把帧对应到时间点：
+    多个时间点落在同一帧间隔内时 select 只输出一帧，该帧就是这些时间点各自对应的帧，按时间点分别产出。
+
+    Yields:
+        帧记录 (按时间点顺序)；ffmpeg 出错或提前结束时只产出前面的一部分时间点
+    """
+    # 某帧满足 "当前帧时间 >= ts 且上一帧时间 < ts" 即为 ts 对应的帧
+    select_expr = '+'.join(
+        f'gte(t\\,{ts:.3f})*lt(prev_pts*TB\\,{ts:.3f})' for ts in timestamps
+    )
+    # 先选帧再缩放，只缩放被选中的帧
+    video_filter = ','.join(filter(None, [f'select={select_expr}', 'showinfo', _scale_filter(max_edge)]))
+
+    process = await asyncio.create_subprocess_exec(
+        # showinfo 以 info 级别输出，关闭版本信息和进度统计
+        'ffmpeg', '-y', '-hide_banner', '-nostats', '-v', 'info',
+        # 最后一个时间点之后的内容无需解码
+        '-to', str(timestamps[-1] + 1),
+        '-i', video_path,
+        '-an', '-sn',
+        '-vf', video_filter,
+        '-vsync', 'vfr',
+        '-q:v', _frame_qscale(),
+        '-f', 'image2pipe', '-vcodec', 'mjpeg',
+        'pipe:1',
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE
+    )
+
+    frame_times = []  # 选中帧的实际时间，按输出顺序
+    frame_times_updated = asyncio.Event()
+
+    async def read_frame_times():
+        async for line in process.stderr:
+            match = re.search(rb'Parsed_showinfo.*\bpts_time:\s*([-\d.]+)', line)
+            if match:
+                frame_times.append(float(match.group(1)))
+                frame_times_updated.set()
+        frame_times_updated.set()
+
+    async def frame_time(i: int) -> float:
+        """第 i 个输出帧的实际时间，未能解析时返回 None"""
+        while len(frame_times) <= i and not reader.done():
+            frame_times_updated.clear()
+            await frame_times_updated.wait()
+        return frame_times[i] if i < len(frame_times) else None
+
+    reader = asyncio.ensure_future(read_frame_times())
+    count = 0  # 已产出的时间点数
+    received = 0  # 已收到的输出帧数
+    buffer = b''
+    try:
+        while count < len(timestamps):
+            chunk = await process.stdout.read(1024 * 1024)
+            if not chunk:
+                break
+            images, buffer = _pop_jpeg_frames(buffer + chunk)
+            for image in images:
+                pts = await frame_time(received)
+                received += 1
+                # 该帧对应所有 (select 表达式中按 3 位小数比较) 不晚于其时间的剩余时间点，至少一个
+                covered = 1
+                if pts is not None:
+                    while (count + covered < len(timestamps)
+                           and round(timestamps[count + covered], 3) <= pts + 1e-6):
+                        covered += 1
+                if covered > 1:
+                    _log(f"  {covered} 个时间点落在同一帧间隔内，均使用 {pts:.3f}s 的帧")
+                for _ in range(min(covered, len(timestamps) - count)):
+                    _log(f"  提取帧 {count+1}/{len(timestamps)} @ {timestamps[count]:.1f}s")
+                    yield {'index': count, 'timestamp': timestamps[count], 'data': image}
+                    count += 1
+                if count >= len(timestamps):
+                    break
+        await process.wait()
+    finally:
+        if process.returncode is None:
+            with contextlib.suppress(ProcessLookupError):
+                process.kill()
+            await process.wait()
+        reader.cancel()
+
+    if process.returncode not in (0, None) and count < len(timestamps):
+        _log(f"  单次提取失败: ffmpeg 退出码 {process.returncode}")
+
+
+async def iter_frame_data_async(video_path: str, num_frames: int = MAX_FRAMES, mode: str = None,
+                                sampling: str = None, use_cache: bool = None, duration: float = None,
+                                workers: int = None, max_edge: int = None, window: tuple = None):
+    """
+    从视频中逐帧提取关键帧到内存（异步生成器，ffmpeg 每输出一帧立即产出）
+
+    参数同 extract_frame_data_async。单次提取按帧的实际时间对应时间点，ffmpeg 提前结束时末尾剩余的时间点改为逐帧提取；
+    全部帧提取完成后写入帧缓存。
+
+    Yields:
+        帧记录 {'index': 序号, 'timestamp': 时间点(秒), 'data': JPEG 字节}，
+        命中帧缓存时还包含缓存文件路径 'path'
+    """
+    mode = mode or FRAME_EXTRACT_MODE
+    sampling = sampling or SAMPLING_MODE
+    use_cache = CACHE_ENABLED if use_cache is None else use_cache
+    max_edge = FRAME_MAX_EDGE if max_edge is None else max_edge
+
+    if duration is None:
+        duration = await get_video_duration_async(video_path)
     if duration <= 0:
-        print("警告: 无法获取视频时长，使用默认间隔")
+        _log("警告: 无法获取视频时长，使用默认间隔")
         duration = 60  # 默认假设60秒
 
-    # 计算时间间隔
-    interval = duration / (num_frames + 1)
+    if window:
+        sampling = 'uniform'
+        uniform_timestamps = [window[0] + t for t in _frame_timestamps(window[1] - window[0], num_frames)]
+    else:
+        uniform_timestamps = _frame_timestamps(duration, num_frames)
+
+    cache_key = None
+    if use_cache:
+        # scene 采样的时间点要解码整个视频才能得到，因此以采样参数代替时间点作为键
+        if sampling == 'scene':
+            sampling_key = {'sampling': 'scene', 'threshold': SCENE_THRESHOLD, 'budget': num_frames}
+        else:
+            sampling_key = {'sampling': 'uniform',
+                            'timestamps': [round(t, 3) for t in uniform_timestamps]}
+        fingerprint = await asyncio.to_thread(video_fingerprint, video_path)
+        cache_key = _frame_cache_key(fingerprint, sampling_key, quality=FRAME_QUALITY, max_edge=max_edge)
+        frames = await asyncio.to_thread(FRAME_CACHE.get_frames, cache_key)
+        if frames:
+            _log(f"📦 命中帧缓存，跳过 ffmpeg: {len(frames)} 帧 ({FRAME_CACHE.stats()})")
+            for frame in frames:
+                yield frame
+            return
+
+    if sampling == 'scene':
+        boundaries = await detect_scene_changes_async(video_path)
+        timestamps = _scene_timestamps(duration, boundaries, num_frames)
+        _log(f"视频时长: {duration:.1f}秒，检测到 {len(boundaries)} 个镜头切换点，"
+              f"按镜头提取 {len(timestamps)} 帧 (预算 {num_frames})...")
+    else:
+        timestamps = uniform_timestamps
+        _log(f"视频时长: {duration:.1f}秒，提取 {num_frames} 帧...")
+
+    if mode == 'auto':
+        # 单次提取要从头解码到最后一个时间点，时间段靠后时同样用 seek
+        mode = 'seek' if window or duration >= LONG_VIDEO_SECONDS else 'single'
+    workers = FRAME_EXTRACT_WORKERS if workers is None else workers
+    workers = workers or os.cpu_count() or 1
 
     frames = []
-    temp_dir = tempfile.mkdtemp(prefix='video_frames_')
+    if mode == 'single':
+        async for frame in _iter_frames_single_pass(video_path, timestamps, max_edge=max_edge):
+            frames.append(frame)
+            yield frame
+        if len(frames) < len(timestamps):
+            _log("  单次提取未得到完整帧序列，剩余时间点改为逐帧提取")
+
+    if len(frames) < len(timestamps):
+        async for frame in _iter_frames_seek(video_path, timestamps[len(frames):], workers=workers,
+                                             max_edge=max_edge, start_index=len(frames)):
+            frames.append(frame)
+            yield frame
+
+    # 只缓存完整的帧集合，有时间点提取失败时下次重新提取，避免缓存期内一直使用缺帧的结果
+    if cache_key and frames and len(frames) == len(timestamps):
+        await asyncio.to_thread(FRAME_CACHE.put_frames, cache_key, frames)
+    elif cache_key and frames:
+        _log(f"  仅提取到 {len(frames)}/{len(timestamps)} 帧，不写入帧缓存")
+
+
+async def extract_frame_data_async(video_path: str, num_frames: int = MAX_FRAMES, mode: str = None,
+                                   sampling: str = None, use_cache: bool = None, duration: float = None,
+                                   workers: int = None, max_edge: int = None, window: tuple = None) -> list:
+    """
+    从视频中提取关键帧到内存（不落盘）
+
+    Args:
+        video_path: 视频文件路径
+        num_frames: 要提取的帧数 (scene 采样时为最多帧数)
+        mode: 提取模式，single 为单次 ffmpeg 调用提取全部帧，seek 为逐个时间点调用 ffmpeg，
+              auto 按视频时长自动选择；默认使用 FRAME_EXTRACT_MODE
+        sampling: 采样方式，uniform 均匀采样，scene 按镜头切换采样；
+                  默认使用 SAMPLING_MODE
+        use_cache: 是否使用帧缓存，默认使用 CACHE_ENABLED；命中时不再调用 ffmpeg
+        duration: 调用方已探测到的视频时长，默认调用 get_video_duration_async
+        workers: seek 模式的并行进程数，默认使用 FRAME_EXTRACT_WORKERS (默认 1，0 为 CPU 核数)
+        max_edge: 帧长边上限 (像素)，由 ffmpeg 缩放，默认使用 FRAME_MAX_EDGE，0 表示不缩放
+        window: (开始秒, 结束秒)，只在该时间段内均匀取帧 (忽略 scene 采样)，默认整段视频
+
+    Returns:
+        帧列表，每项为 {'index': 序号, 'timestamp': 时间点(秒), 'data': JPEG 字节}，
+        使用帧缓存时还包含缓存文件路径 'path'
+    """
+    return [frame async for frame in iter_frame_data_async(
+        video_path, num_frames, mode=mode, sampling=sampling, use_cache=use_cache, duration=duration,
+        workers=workers, max_edge=max_edge, window=window
+    )]
+
+
+def extract_frame_data(video_path: str, num_frames: int = MAX_FRAMES, mode: str = None,
+                       sampling: str = None, use_cache: bool = None, duration: float = None,
+                       workers: int = None, max_edge: int = None, window: tuple = None) -> list:
+    """从视频中提取关键帧到内存（extract_frame_data_async 的同步版本，参数相同）"""
+    return run_sync(extract_frame_data_async(video_path, num_frames, mode=mode, sampling=sampling,
+                                             use_cache=use_cache, duration=duration, workers=workers,
+                                             max_edge=max_edge, window=window))
+
 
-    print(f"视频时长: {duration:.1f}秒，提取 {num_frames} 帧...")
+def save_frames(frames: list, output_dir: str = None) -> list:
+    """
+    将内存中的帧写入磁盘 (frame_XXX.jpg)，并在每帧记录中补充 'path'
+
+    Args:
+        frames: extract_frame_data 返回的帧列表
+        output_dir: 输出目录，默认新建临时目录
 
-    for i in range(num_frames):
-        timestamp = interval * (i + 1)
-        output_path = os.path.join(temp_dir, f'frame_{i:03d}.jpg')
+    Returns:
+        帧图片路径列表
+    """
+    output_dir = output_dir or tempfile.mkdtemp(prefix='video_frames_')
+    paths = []
+    for frame in frames:
+        path = os.path.join(output_dir, f"frame_{frame['index']:03d}.jpg")
+        with open(path, 'wb') as f:
+            f.write(frame['data'])
+        frame['path'] = path
+        paths.append(path)
+    return paths
+
+
+def extract_frames(video_path: str, num_frames: int = MAX_FRAMES, mode: str = None,
+                   sampling: str = None, workers: int = None, max_edge: int = None,
+                   max_payload_bytes: int = None) -> list:
+    """
+    从视频中提取关键帧并保存为图片文件（新建临时目录，不使用帧缓存）
+
+    Args:
+        video_path: 视频文件路径
+        num_frames: 要提取的帧数
+        mode: 提取模式 (single/seek/auto)，默认使用 FRAME_EXTRACT_MODE
+        sampling: 采样方式 (uniform/scene)，默认使用 SAMPLING_MODE
+        workers: seek 模式的并行进程数，默认使用 FRAME_EXTRACT_WORKERS
+        max_edge: 帧长边上限 (像素)，默认使用 FRAME_MAX_EDGE，0 表示不缩放
+        max_payload_bytes: 全部帧 base64 总字节上限，默认使用 PAYLOAD_MAX_BYTES，0 表示不限制
+
+    Returns:
+        帧图片路径列表
+    """
+    frames = extract_frame_data(video_path, num_frames, mode=mode, sampling=sampling, use_cache=False,
+                                workers=workers, max_edge=max_edge)
+    if not frames:
+        return []
+    frames, _ = fit_frames_to_budget(frames, max_payload_bytes)
+    return save_frames(frames)
+
+
+def frame_dhash(image_data: bytes, hash_size: int = 8) -> int:
+    """
+    计算图片的差值感知哈希 (dHash)
 
+    将图片缩小为 (hash_size+1) x hash_size 灰度图，比较每行相邻像素的明暗，
+    得到 hash_size*hash_size 位的整数。画面相近的帧哈希的汉明距离很小。
+    """
+    with Image.open(io.BytesIO(image_data)) as img:
+        # JPEG 解码时直接按 DCT 缩放，避免解码全分辨率画面
+        img.draft('L', (hash_size * 8, hash_size * 8))
+        small = img.convert('L').resize((hash_size + 1, hash_size), Image.Resampling.LANCZOS)
+        pixels = small.tobytes()
+
+    value = 0
+    for row in range(hash_size):
+        offset = row * (hash_size + 1)
+        for col in range(hash_size):
+            value = (value << 1) | (pixels[offset + col] > pixels[offset + col + 1])
+    return value
+
+
+def dedup_frames(frames: list, max_distance: int = DEDUP_DISTANCE) -> tuple:
+    """
+    按感知哈希去除近似重复的帧
+
+    依次处理每帧，与已保留帧的哈希汉明距离不超过 max_distance 时丢弃。
+
+    Args:
+        frames: extract_frame_data 返回的帧列表
+        max_distance: 最大汉明距离 (0-64)，负数表示不去重
+
+    Returns:
+        (保留的帧列表, 统计信息字典 {'removed', 'saved_bytes', 'saved_base64_bytes'})
+    """
+    stats = {'removed': 0, 'saved_bytes': 0, 'saved_base64_bytes': 0}
+    if max_distance < 0 or len(frames) < 2:
+        return frames, stats
+
+    kept = []
+    kept_hashes = []
+    for frame in frames:
         try:
-            subprocess.run(
-                [
-                    'ffmpeg', '-y',
-                    '-ss', str(timestamp),
-                    '-i', video_path,
-                    '-vframes', '1',
-                    '-q:v', str(int((100 - FRAME_QUALITY) / 10) + 1),
-                    output_path
-                ],
-                capture_output=True,
-                check=True
-            )
+            frame_hash = frame['dhash'] if 'dhash' in frame else frame_dhash(frame['data'])
+        except Exception as e:
+            _log(f"  帧 {frame['index']+1} 计算哈希失败，保留该帧: {e}")
+            kept.append(frame)
+            continue
+
+        if any(bin(frame_hash ^ h).count('1') <= max_distance for h in kept_hashes):
+            stats['removed'] += 1
+            stats['saved_bytes'] += len(frame['data'])
+            stats['saved_base64_bytes'] += _base64_size(len(frame['data']))
+            continue
+
+        frame['dhash'] = frame_hash
+        kept.append(frame)
+        kept_hashes.append(frame_hash)
 
-            if os.path.exists(output_path):
-                frames.append(output_path)
-                print(f"  提取帧 {i+1}/{num_frames} @ {timestamp:.1f}s")
+    _log(f"🧹 帧去重: 去除 {stats['removed']} 张重复帧，节省 {stats['saved_bytes']/1024:.1f}KB "
+          f"(base64 {stats['saved_base64_bytes']/1024:.1f}KB)，保留 {len(kept)} 帧")
+    return kept, stats
 
-        except subprocess.CalledProcessError as e:
-            print(f"  帧 {i+1} 提取失败: {e}")
 
-    return frames
+def _base64_size(size: int) -> int:
+    """n 字节数据 base64 编码后的长度"""
+    return (size + 2) // 3 * 4
+
+
+def fit_frames_to_budget(frames: list, max_bytes: int = None) -> tuple:
+    """
+    将帧的 base64 总大小压缩到预算以内
+
+    超出预算时用 Pillow 按 10 递减的 JPEG 质量重新编码全部帧，直到满足预算；
+    质量降到 PAYLOAD_MIN_QUALITY 仍超出时，再按 0.75 倍逐步缩小分辨率。
+
+    Args:
+        frames: 帧列表
+        max_bytes: base64 总字节上限，默认使用 PAYLOAD_MAX_BYTES，0 表示不限制
+
+    Returns:
+        (帧列表, 统计信息字典 {'payload_bytes', 'quality', 'scale'})；
+        重新编码过的帧为新的记录 (不含 'path')，原帧不受影响
+    """
+    max_bytes = PAYLOAD_MAX_BYTES if max_bytes is None else max_bytes
+    payload = sum(_base64_size(len(frame['data'])) for frame in frames)
+    stats = {'payload_bytes': payload, 'quality': FRAME_QUALITY, 'scale': 1.0}
+
+    if max_bytes and payload > max_bytes:
+        images = [Image.open(io.BytesIO(frame['data'])).convert('RGB') for frame in frames]
+        quality, scale = FRAME_QUALITY, 1.0
+        while payload > max_bytes:
+            if quality - 10 >= PAYLOAD_MIN_QUALITY:
+                quality -= 10
+            elif scale > 0.25:
+                scale *= 0.75
+            else:
+                break  # 已压缩到下限，按现有结果发送
+
+            encoded = []
+            for image in images:
+                if scale < 1.0:
+                    size = (max(2, int(image.width * scale)), max(2, int(image.height * scale)))
+                    image = image.resize(size, Image.Resampling.LANCZOS)
+                buffer = io.BytesIO()
+                image.save(buffer, format='JPEG', quality=quality)
+                encoded.append(buffer.getvalue())
+            payload = sum(_base64_size(len(data)) for data in encoded)
+
+        frames = [{'index': frame['index'], 'timestamp': frame['timestamp'], 'data': data}
+                  for frame, data in zip(frames, encoded)]
+        stats.update(payload_bytes=payload, quality=quality, scale=scale)
+        _log(f"🗜️ 负载超出预算 {max_bytes/1024/1024:.1f}MB，重新编码: 质量 {quality}"
+              + (f"，缩放 {scale:.2f}x" if scale < 1.0 else ""))
+
+    _log(f"📤 请求负载: {len(frames)} 帧，base64 共 {payload/1024/1024:.2f}MB"
+          + (f" (预算 {max_bytes/1024/1024:.1f}MB)" if max_bytes else ""))
+    return frames, stats
 
 
 def image_to_base64(image_path: str) -> str:
     """将图片转换为 base64 编码"""
     with open(image_path, 'rb') as f:
         image_data = f.read()
+    return bytes_to_base64(image_data)
+
+
+def bytes_to_base64(image_data: bytes) -> str:
+    """将内存中的图片字节转换为 base64 编码"""
     return base64.b64encode(image_data).decode('utf-8')
 
 
-def analyze_video(video_path: str, prompt: str = None, stream: bool = True,
-                   num_frames: int = MAX_FRAMES, sora2_mode: bool = False, keep_frames: bool = False):
+# ========== 缓存 ==========
+
+def video_fingerprint(video_path: str, chunk_size: int = 1024 * 1024) -> str:
+    """
+    计算视频内容指纹（快速版）
+
+    只读取文件开头、中间、结尾各 chunk_size 字节并结合文件大小做 SHA-256，
+    与文件路径和修改时间无关，同一视频被不同人上传也能得到相同指纹。
+    """
+    size = os.path.getsize(video_path)
+    digest = hashlib.sha256(str(size).encode())
+    with open(video_path, 'rb') as f:
+        for offset in sorted({0, max(0, size // 2 - chunk_size // 2), max(0, size - chunk_size)}):
+            f.seek(offset)
+            digest.update(f.read(chunk_size))
+    return digest.hexdigest()
+
+
+class DiskCache:
+    """
+    有容量和时效上限的目录缓存
+
+    每个缓存项是目录下以 key 命名的文件或子目录，读取命中时刷新修改时间，
+    超出容量时按修改时间从旧到新淘汰 (LRU)，超过最长保留时间的缓存项直接删除。
+    总大小随写入和删除累计，只有超出容量或距上次清理超过 SWEEP_INTERVAL 时才扫描目录。
+    """
+
+    SWEEP_INTERVAL = 3600  # 清理过期缓存项的最长间隔 (秒)
+
+    def __init__(self, directory: str, max_mb: float, max_age_days: float):
+        self.directory = directory
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self.max_age = max_age_days * 86400
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._sizes = None  # 缓存项路径 -> 字节数，首次清理时扫描目录建立
+        self._total = 0
+        self._swept_at = 0.0
+
+    def path(self, key: str) -> str:
+        """缓存项路径"""
+        return os.path.join(self.directory, key)
+
+    def lookup(self, key: str) -> str:
+        """
+        查找缓存项并更新命中统计
+
+        Returns:
+            命中时返回缓存项路径，否则返回 None
+        """
+        path = self.path(key)
+        with self._lock:
+            try:
+                mtime = os.path.getmtime(path)
+            except OSError:
+                self.misses += 1
+                return None
+
+            if time.time() - mtime > self.max_age:
+                self._remove(path)
+                self._forget(path)
+                self.misses += 1
+                return None
+
+            os.utime(path)  # 刷新访问顺序
+            self.hits += 1
+            return path
+
+    def get_json(self, key: str):
+        """读取 JSON 缓存项，未命中返回 None"""
+        path = self.lookup(key)
+        if not path:
+            return None
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except Exception:
+            return None
+
+    def put_json(self, key: str, value) -> None:
+        """写入 JSON 缓存项（先写临时文件再原子替换）"""
+        os.makedirs(self.directory, exist_ok=True)
+        path = self.path(key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(value, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+        self._added(path)
+
+    def get_frames(self, key: str) -> list:
+        """
+        读取帧集合缓存项，未命中返回 None
+
+        Returns:
+            帧列表，'path' 指向缓存目录中的 frame_XXX.jpg；缓存项随时可能被淘汰，
+            需要长期保留的关键帧应先用 save_frames 复制到单独的目录
+        """
+        path = self.lookup(key)
+        if not path:
+            return None
+        try:
+            with open(os.path.join(path, 'meta.json'), 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+            frames = []
+            for item in meta['frames']:
+                frame_path = os.path.join(path, f"frame_{item['index']:03d}.jpg")
+                with open(frame_path, 'rb') as f:
+                    frames.append({'index': item['index'], 'timestamp': item['timestamp'],
+                                   'data': f.read(), 'path': frame_path})
+            return frames
+        except Exception:
+            # 读取过程中被淘汰或文件损坏，按未命中处理
+            return None
+
+    def put_frames(self, key: str, frames: list) -> None:
+        """
+        写入帧集合缓存项，并将每帧的 'path' 指向缓存文件
+
+        先写入临时目录再整体重命名，并发写入同一键时只保留先完成的一份。
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        path = self.path(key)
+        tmp_path = tempfile.mkdtemp(prefix=f'{key}.', suffix='.tmp', dir=self.directory)
+        meta = {'frames': [{'index': frame['index'], 'timestamp': frame['timestamp']} for frame in frames]}
+        for frame in frames:
+            with open(os.path.join(tmp_path, f"frame_{frame['index']:03d}.jpg"), 'wb') as f:
+                f.write(frame['data'])
+        with open(os.path.join(tmp_path, 'meta.json'), 'w', encoding='utf-8') as f:
+            json.dump(meta, f)
+
+        try:
+            os.rename(tmp_path, path)
+        except OSError:
+            self._remove(tmp_path)
+            if not os.path.isdir(path):
+                return
+
+        for frame in frames:
+            frame['path'] = os.path.join(path, f"frame_{frame['index']:03d}.jpg")
+        self._added(path)
+
+    def evict(self) -> None:
+        """删除过期缓存项，并在总大小超限时按 LRU 淘汰"""
+        with self._lock:
+            now = time.time()
+            if self._sizes is not None and self._total <= self.max_bytes and now - self._swept_at < self.SWEEP_INTERVAL:
+                return
+            try:
+                names = os.listdir(self.directory)
+            except OSError:
+                return
+
+            known = self._sizes or {}
+            sizes = {}
+            entries = []
+            for name in names:
+                path = os.path.join(self.directory, name)
+                try:
+                    mtime = os.path.getmtime(path)
+                except OSError:
+                    continue
+                if now - mtime > self.max_age:
+                    self._remove(path)
+                    continue
+                # 只有首次清理或其他进程写入的缓存项需要统计目录大小
+                sizes[path] = known[path] if path in known else self._entry_size(path)
+                entries.append((mtime, path))
+
+            total = sum(sizes.values())
+            for mtime, path in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                self._remove(path)
+                total -= sizes.pop(path)
+            self._sizes, self._total, self._swept_at = sizes, total, now
+
+    def _added(self, path: str) -> None:
+        """写入缓存项后累计总大小，超出容量时淘汰"""
+        with self._lock:
+            if self._sizes is not None:
+                size = self._entry_size(path)
+                self._total += size - self._sizes.get(path, 0)
+                self._sizes[path] = size
+        self.evict()
+
+    def _forget(self, path: str) -> None:
+        """缓存项已删除，从总大小中扣除（需持有 _lock）"""
+        if self._sizes is not None and path in self._sizes:
+            self._total -= self._sizes.pop(path)
+
+    def stats(self) -> str:
+        """命中统计描述"""
+        return f"命中 {self.hits} / 未命中 {self.misses}"
+
+    @staticmethod
+    def _entry_size(path: str) -> int:
+        if os.path.isdir(path):
+            return sum(f.stat().st_size for f in Path(path).rglob('*') if f.is_file())
+        return os.path.getsize(path)
+
+    @staticmethod
+    def _remove(path: str) -> None:
+        try:
+            if os.path.isdir(path):
+                shutil.rmtree(path)
+            else:
+                os.remove(path)
+        except OSError:
+            pass
+
+
+# 分析结果缓存: 同一视频 + 相同参数直接复用模型输出
+RESULT_CACHE = DiskCache(os.path.join(CACHE_DIR, 'results'), RESULT_CACHE_MAX_MB, RESULT_CACHE_MAX_AGE_DAYS)
+
+
+# 帧集合缓存: 同一视频 + 相同采样参数直接复用已提取的帧，跳过 ffmpeg
+FRAME_CACHE = DiskCache(os.path.join(CACHE_DIR, 'frames'), FRAME_CACHE_MAX_MB, FRAME_CACHE_MAX_AGE_DAYS)
+
+
+def _frame_cache_key(fingerprint: str, sampling_key: dict, **params) -> str:
+    """由视频指纹、采样参数（时间点）和画质参数生成帧缓存键"""
+    key_data = {'fingerprint': fingerprint, **sampling_key, **params}
+    return hashlib.sha256(json.dumps(key_data, sort_keys=True).encode()).hexdigest()
+
+
+def _result_cache_key(fingerprint: str, mode: str, prompt_text: str, num_frames: int, **params) -> str:
+    """由视频指纹、分析模式、帧数、模型和提示词等参数生成结果缓存键"""
+    key_data = {
+        'fingerprint': fingerprint,
+        'mode': mode,
+        'num_frames': num_frames,
+        'model': MODEL_ID,
+        'prompt': prompt_text,
+        **params
+    }
+    return hashlib.sha256(json.dumps(key_data, sort_keys=True, ensure_ascii=False).encode()).hexdigest() + '.json'
+
+
+def _encode_frame(frame: dict, with_hash: bool = True) -> dict:
+    """预先计算单帧的 base64 和感知哈希，写入帧记录的 'base64'、'dhash'"""
+    frame['base64'] = bytes_to_base64(frame['data'])
+    if with_hash and 'dhash' not in frame:
+        try:
+            frame['dhash'] = frame_dhash(frame['data'])
+        except Exception:
+            pass  # dedup_frames 会重新计算并输出失败原因
+    return frame
+
+
+def _emit(on_event, event_type: str, **data) -> None:
+    """向调用方的事件回调发送一个事件 {'type': event_type, ...}，未设置回调时忽略"""
+    if on_event:
+        on_event({'type': event_type, **data})
+
+
+def _frames_to_content(user_prompt: str, frames: list) -> list:
+    """构建多模态消息内容: 文本提示词 + 各帧 base64 图片"""
+    content = [{'type': 'text', 'text': user_prompt}]
+    for frame in frames:
+        # 流水线中已预先编码的帧直接复用
+        frame_base64 = frame.get('base64') or bytes_to_base64(frame['data'])
+        content.append({
+            'type': 'image_url',
+            'image_url': {
+                'url': f'data:image/jpeg;base64,{frame_base64}'
+            }
+        })
+    return content
+
+
+# ========== 模型客户端 ==========
+# 按 (base_url, api_key, 事件循环) 复用 AsyncOpenAI 客户端: 同步接口都运行在共享的后台事件循环上，
+# CLI、批量分析和 Gradio 共用同一个连接池，避免每次分析重新建立 TCP/TLS 连接
+_client_registry = {}
+_client_registry_lock = threading.Lock()
+_connect_stats = contextvars.ContextVar('qwen3vl_connect_stats', default=None)
+
+
+async def _trace_connection(event_name: str, info: dict) -> None:
+    """httpcore trace 回调: 累计当前请求建立连接 (TCP 连接 + TLS 握手) 的耗时"""
+    stats = _connect_stats.get()
+    phase, _, state = event_name.rpartition('.')
+    if stats is None or phase not in ('connection.connect_tcp', 'connection.start_tls'):
+        return
+    if state == 'started':
+        stats[phase] = time.perf_counter()
+    elif state == 'complete' and phase in stats:
+        stats['connect'] += time.perf_counter() - stats.pop(phase)
+        if phase == 'connection.connect_tcp':
+            stats['connections'] += 1
+
+
+async def _attach_trace(request: httpx.Request) -> None:
+    """请求事件钩子: 为每个请求挂上连接耗时统计回调"""
+    request.extensions['trace'] = _trace_connection
+
+
+def _get_client_entry(base_url: str = None, api_key: str = None) -> dict:
+    """获取注册表中当前事件循环的客户端记录，不存在时创建 (线程安全)"""
+    base_url = base_url or API_BASE_URL
+    api_key = api_key or API_KEY
+    loop = asyncio.get_running_loop()
+    key = (base_url, api_key, id(loop))
+
+    with _client_registry_lock:
+        # 客户端的连接绑定在创建它的事件循环上，循环关闭后不能再复用
+        for stale in [k for k, entry in _client_registry.items() if entry['loop'].is_closed()]:
+            del _client_registry[stale]
+
+        entry = _client_registry.get(key)
+        if entry is None:
+            http_client = DefaultAsyncHttpxClient(
+                limits=httpx.Limits(
+                    max_connections=HTTP_MAX_CONNECTIONS,
+                    max_keepalive_connections=HTTP_MAX_KEEPALIVE,
+                    keepalive_expiry=HTTP_KEEPALIVE_EXPIRY
+                ),
+                event_hooks={'request': [_attach_trace]}
+            )
+            entry = {
+                'client': AsyncOpenAI(base_url=base_url, api_key=api_key, http_client=http_client),
+                'loop': loop,
+                'requests': 0,
+                'connect_cost': 0.0  # 最近一次新建连接的耗时，用于估算复用节省的时间
+            }
+            _client_registry[key] = entry
+        entry['requests'] += 1
+    return entry
+
+
+def get_client(base_url: str = None, api_key: str = None) -> AsyncOpenAI:
     """
-    使用 Qwen3-VL 模型分析视频内容
+    获取可复用的 AsyncOpenAI 客户端（需在事件循环中调用，线程安全）
+
+    Args:
+        base_url: API 地址，默认使用 API_BASE_URL
+        api_key: API 密钥，默认使用 API_KEY
+
+    Returns:
+        按 base_url、api_key 和当前事件循环共享的客户端，连接池参数见 QWEN_HTTP_* 配置
+    """
+    return _get_client_entry(base_url, api_key)['client']
+
+
+async def _call_model(messages: list, stream: bool = True, semaphore: asyncio.Semaphore = None,
+                      timings: dict = None, on_token=None) -> str:
+    """
+    使用共享客户端调用模型，返回完整回复文本
+
+    信号量限制同时进行中的请求数，排队时间写入 timings['queue_wait']，不计入 timings['model']；
+    流式请求写入首 token 耗时 ttft，服务端返回用量时写入 prompt_tokens、completion_tokens、total_tokens；
+    同时写入连接复用统计 client_reused、connect、connect_saved。
+    on_token 为每段回复文本的回调 (非流式时整段回复只回调一次)。
+    """
+    timings = {} if timings is None else timings
+    semaphore = semaphore or _get_inflight_semaphore()
+    queue_start = time.time()
+    async with semaphore or contextlib.nullcontext():
+        stage_start = time.time()
+        timings['queue_wait'] = stage_start - queue_start
+        client_entry = _get_client_entry()
+        connect_stats = {'connect': 0.0, 'connections': 0}
+        token = _connect_stats.set(connect_stats)
+        try:
+            extra_options = {'stream_options': {'include_usage': True}} if stream and STREAM_USAGE else {}
+            response = await client_entry['client'].chat.completions.create(
+                model=MODEL_ID,
+                messages=messages,
+                stream=stream,
+                **extra_options
+            )
+
+            # 处理响应
+            result = ""
+            usage = None
+            if stream:
+                async for chunk in response:
+                    if chunk.usage:
+                        usage = chunk.usage  # include_usage 时最后一个 chunk 只包含用量
+                    if chunk.choices and chunk.choices[0].delta.content:
+                        chunk_content = chunk.choices[0].delta.content
+                        if not result:
+                            timings['ttft'] = time.time() - stage_start
+                        _log(chunk_content, end='', flush=True)
+                        result += chunk_content
+                        if on_token:
+                            on_token(chunk_content)
+                _log()  # 换行
+            else:
+                usage = response.usage
+                result = response.choices[0].message.content
+                _log(result)
+                if on_token and result:
+                    on_token(result)
+        finally:
+            _connect_stats.reset(token)
+        timings['model'] = time.time() - stage_start
+        if usage:
+            timings['prompt_tokens'] = usage.prompt_tokens
+            timings['completion_tokens'] = usage.completion_tokens
+            timings['total_tokens'] = usage.total_tokens
+
+    # 连接复用统计: 未新建连接时，以最近一次建连耗时估算节省的时间
+    timings['client_reused'] = client_entry['requests'] > 1
+    timings['connect'] = connect_stats['connect']
+    if connect_stats['connections']:
+        client_entry['connect_cost'] = connect_stats['connect']
+        timings['connect_saved'] = 0.0
+    else:
+        timings['connect_saved'] = client_entry['connect_cost']
+        _log(f"🔗 复用模型 API 长连接，节省建连 {client_entry['connect_cost'] * 1000:.0f}ms")
+
+    return result
+
+
+def format_metrics(timings: dict) -> str:
+    """
+    把分析指标格式化为一行摘要，用于日志输出
+
+    Args:
+        timings: analyze_video_async 写入的 timings 字典 (或 on_metrics 回调收到的字典)
+
+    Returns:
+        如 "探测 0.03s | 提取 1.20s (平均 0.15s/帧) | 8 帧 420KB | 首 token 1.31s | 模型 12.40s | ..."
+    """
+    parts = []
+    if timings.get('cache_hit'):
+        parts.append("命中缓存")
+    if 'probe' in timings:
+        parts.append(f"探测 {timings['probe']:.2f}s")
+    if 'extract' in timings:
+        text = f"提取 {timings['extract']:.2f}s"
+        frame_times = timings.get('frame_extract')
+        if frame_times:
+            text += f" (平均 {sum(frame_times) / len(frame_times):.2f}s/帧，最慢 {max(frame_times):.2f}s)"
+        parts.append(text)
+    if 'segments' in timings:
+        parts.append(f"分段 {timings.get('segment_count', 0)} 段 {timings['segments']:.2f}s")
+    if 'encode' in timings:
+        parts.append(f"编码 {timings['encode']:.2f}s")
+    if 'frames' in timings:
+        parts.append(f"{timings['frames']} 帧 {timings.get('payload_bytes', 0) / 1024:.0f}KB")
+    if timings.get('queue_wait', 0) >= 0.01:
+        parts.append(f"排队 {timings['queue_wait']:.2f}s")
+    if 'ttft' in timings:
+        parts.append(f"首 token {timings['ttft']:.2f}s")
+    if 'model' in timings:
+        parts.append(f"模型 {timings['model']:.2f}s")
+    if 'total_tokens' in timings:
+        parts.append(f"tokens {timings['prompt_tokens']}+{timings['completion_tokens']}")
+    if 'total' in timings:
+        parts.append(f"总计 {timings['total']:.2f}s")
+    if 'error' in timings:
+        parts.append(f"失败: {timings['error']}")
+    return ' | '.join(parts)
+
+
+@_with_metrics
+@_with_verbosity
+async def analyze_video_async(video_path: str, prompt: str = None, stream: bool = True,
+                              num_frames: int = MAX_FRAMES, sora2_mode: bool = False, keep_frames: bool = False,
+                              extract_mode: str = None, sampling: str = None, dedup_distance: int = None,
+                              use_cache: bool = None, extract_workers: int = None, timings: dict = None,
+                              semaphore: asyncio.Semaphore = None, max_edge: int = None,
+                              max_payload_bytes: int = None, segmented: bool = False,
+                              segment_seconds: float = None, on_event=None):
+    """
+    使用 Qwen3-VL 模型分析视频内容（异步版本）
+
+    ffmpeg/ffprobe 以 asyncio 子进程运行，模型请求使用 AsyncOpenAI，
+    可在同一事件循环中并发分析多个视频。
 
     Args:
         video_path: 视频文件路径
@@ -236,7 +1589,33 @@ def analyze_video(video_path: str, prompt: str = None, stream: bool = True,
         stream: 是否使用流式输出
         num_frames: 提取的帧数
         sora2_mode: 是否启用 SORA2 提示词生成模式
-        keep_frames: 是否保留提取的帧文件 (默认False，分析完即删)
+        keep_frames: 是否将提取的帧保存为文件 (默认False，帧只在内存中处理)
+        extract_mode: 帧提取模式 (single/seek/auto)，默认使用 FRAME_EXTRACT_MODE
+        sampling: 帧采样方式 (uniform/scene)，默认使用 SAMPLING_MODE
+        dedup_distance: 重复帧判定的感知哈希汉明距离，负数表示不去重，默认使用 DEDUP_DISTANCE
+        use_cache: 是否使用分析结果缓存和帧缓存，默认使用 CACHE_ENABLED
+        extract_workers: seek 模式并行提取的进程数，默认使用 FRAME_EXTRACT_WORKERS
+        timings: 传入字典时写入各阶段耗时 (秒): probe, extract, model, total，
+                 以及 frames (发送的帧数)、payload_bytes (帧 base64 总字节)、cache_hit (是否命中结果缓存)、
+                 frame_extract (各帧提取耗时列表，即相邻两帧到达的间隔)、
+                 encode (最后一帧提取后等待编码完成的耗时)、time_to_request (开始到发出模型请求的耗时)、
+                 queue_wait (等待模型请求并发名额的耗时)、ttft (流式请求的首 token 耗时)、
+                 prompt_tokens / completion_tokens / total_tokens (服务端返回用量时)、
+                 client_reused (是否复用已有客户端)、connect (本次新建连接耗时)、
+                 connect_saved (复用长连接节省的建连耗时)
+        semaphore: 限制同时进行中的模型请求数的信号量，默认使用全局 QWEN_MAX_INFLIGHT 限制
+        max_edge: 帧长边上限 (像素)，由 ffmpeg 缩放，默认使用 FRAME_MAX_EDGE，0 表示不缩放
+        max_payload_bytes: 全部帧 base64 总字节上限，超出时自动降低 JPEG 质量，
+                           默认使用 PAYLOAD_MAX_BYTES，0 表示不限制
+        segmented: 是否按时间段分段分析 (长视频)，见 analyze_video_segmented_async；
+                   分段模式固定生成 SORA2 提示词，忽略 prompt、num_frames 和 sampling
+        segment_seconds: 分段模式的每段时长，默认使用 SEGMENT_SECONDS
+        on_event: 过程事件回调 (在事件循环中同步调用)，事件为字典，'type' 取值：
+                  frame (每提取出一帧: frame, count)、frames (去重与压缩后实际发送的帧: frames, paths)、
+                  token (模型输出片段: text)；分段模式不产生事件
+        on_metrics: 分析结束 (成功或失败) 时以 timings 字典回调一次，失败时包含 error，
+                    可用 format_metrics 格式化
+        verbose: 是否输出过程日志和模型结果 (默认True)
 
     Returns:
         如果 keep_frames=True，返回 (result, frames) 元组
@@ -245,29 +1624,121 @@ def analyze_video(video_path: str, prompt: str = None, stream: bool = True,
     if not os.path.exists(video_path):
         raise FileNotFoundError(f"视频文件不存在: {video_path}")
 
-    file_size = os.path.getsize(video_path) / (1024 * 1024)
-    print(f"正在读取视频文件: {video_path} ({file_size:.1f}MB)")
+    if segmented:
+        return await analyze_video_segmented_async(
+            video_path, stream=stream, segment_seconds=segment_seconds, keep_frames=keep_frames,
+            extract_mode=extract_mode, dedup_distance=dedup_distance, use_cache=use_cache,
+            extract_workers=extract_workers, timings=timings, semaphore=semaphore,
+            max_edge=max_edge, max_payload_bytes=max_payload_bytes, verbose=not _quiet.get()
+        )
+
+    timings = {} if timings is None else timings
+    start_time = time.time()
 
-    # 提取视频帧
-    frames = extract_frames(video_path, num_frames)
+    file_size = os.path.getsize(video_path) / (1024 * 1024)
+    _log(f"正在读取视频文件: {video_path} ({file_size:.1f}MB)")
+
+    sampling = sampling or SAMPLING_MODE
+    dedup_distance = DEDUP_DISTANCE if dedup_distance is None else dedup_distance
+    use_cache = CACHE_ENABLED if use_cache is None else use_cache
+    max_edge = FRAME_MAX_EDGE if max_edge is None else max_edge
+    max_payload_bytes = PAYLOAD_MAX_BYTES if max_payload_bytes is None else max_payload_bytes
+
+    # 查询分析结果缓存
+    cache_key = None
+    cached = None
+    if use_cache:
+        if sora2_mode:
+            cache_mode, prompt_text = 'sora2', SORA2_SYSTEM_PROMPT + SORA2_USER_PROMPT_TEMPLATE
+        elif prompt:
+            cache_mode, prompt_text = 'custom', prompt
+        else:
+            cache_mode, prompt_text = 'default', DEFAULT_USER_PROMPT_TEMPLATE
+        fingerprint = await asyncio.to_thread(video_fingerprint, video_path)
+        cache_key = _result_cache_key(
+            fingerprint, cache_mode, prompt_text, num_frames,
+            sampling=sampling,
+            scene_threshold=SCENE_THRESHOLD if sampling == 'scene' else None,
+            dedup_distance=dedup_distance,
+            quality=FRAME_QUALITY,
+            max_edge=max_edge,
+            max_payload_bytes=max_payload_bytes
+        )
+        cached = await asyncio.to_thread(RESULT_CACHE.get_json, cache_key)
+        timings['cache_hit'] = bool(cached)
+        if cached:
+            _log(f"📦 命中分析结果缓存 ({RESULT_CACHE.stats()})")
+            if not keep_frames:
+                _log(cached['result'])
+                timings['total'] = time.time() - start_time
+                return cached['result']
+        else:
+            _log(f"📦 分析结果缓存未命中 ({RESULT_CACHE.stats()})")
+
+    # 一次探测获取时长等媒体信息，供取帧和 SORA2 提示词共用
+    stage_start = time.time()
+    duration = await get_video_duration_async(video_path)
+    timings['probe'] = time.time() - stage_start
+
+    # 提取与编码流水线: ffmpeg 每输出一帧，立即在线程中计算 base64 和感知哈希，
+    # 与剩余帧的提取重叠进行 (未启用缓存时帧只在内存中处理)
+    stage_start = time.time()
+    frames = []
+    encode_tasks = []
+    frame_times = timings['frame_extract'] = []
+    last_arrival = stage_start
+    async for frame in iter_frame_data_async(video_path, num_frames, mode=extract_mode, sampling=sampling,
+                                             use_cache=use_cache, duration=duration, workers=extract_workers,
+                                             max_edge=max_edge):
+        now = time.time()
+        frame_times.append(now - last_arrival)  # 第一帧包含采样时间点计算 (如镜头检测)
+        last_arrival = now
+        frames.append(frame)
+        encode_tasks.append(asyncio.ensure_future(asyncio.to_thread(_encode_frame, frame, dedup_distance >= 0)))
+        _emit(on_event, 'frame', frame=frame, count=len(frames))
+
+    encode_start = time.time()
+    await asyncio.gather(*encode_tasks)
+    timings['encode'] = time.time() - encode_start
 
     if not frames:
         raise RuntimeError("无法提取视频帧，请确保已安装 ffmpeg")
 
-    print(f"成功提取 {len(frames)} 帧")
+    _log(f"成功提取 {len(frames)} 帧")
+
+    # 去除近似重复帧，减少上传体积和视觉 token
+    frames, _ = await asyncio.to_thread(dedup_frames, frames, dedup_distance)
+    # 控制请求体大小，超出预算时降低 JPEG 质量
+    frames, payload_stats = await asyncio.to_thread(fit_frames_to_budget, frames, max_payload_bytes)
+    timings['extract'] = time.time() - stage_start
+    timings['frames'] = len(frames)
+    timings['payload_bytes'] = payload_stats['payload_bytes']
 
-    # 获取视频时长用于 SORA2 分析
-    duration = get_video_duration(video_path)
+    frame_paths = []
+    if keep_frames:
+        # 帧缓存中的文件随时可能被淘汰，返回给调用方的关键帧总是复制到本次调用的临时目录
+        frame_paths = await asyncio.to_thread(save_frames, frames)
+    _emit(on_event, 'frames', frames=frames, paths=frame_paths)
+
+    if cached:
+        # 命中缓存时仍需提取帧供调用方使用，但无需再次调用模型
+        _log(cached['result'])
+        timings['total'] = time.time() - start_time
+        return cached['result'], frame_paths
 
     # 根据模式选择提示词
     if sora2_mode:
-        print("\n🎬 SORA2 提示词生成模式已启用")
-        print(f"📊 视频时长: {duration:.1f}秒")
+        _log("\n🎬 SORA2 提示词生成模式已启用")
+        _log(f"📊 视频时长: {duration:.1f}秒")
 
         # 使用 SORA2 专业提示词
         user_prompt = SORA2_USER_PROMPT_TEMPLATE.format(num_frames=len(frames))
         if duration > 0:
             user_prompt += f"\n\n视频实际时长: {duration:.1f}秒，请根据此时长分配各场景时间。"
+        if sampling == 'scene':
+            # 按镜头采样时帧间隔不均匀，告知模型每帧的实际时间点
+            stamps = ', '.join(f"{frame['timestamp']:.1f}s" for frame in frames)
+            user_prompt += f"\n各帧按镜头切换选取（每个镜头 1-2 帧），对应时间点: {stamps}"
 
         messages = [
             {'role': 'system', 'content': SORA2_SYSTEM_PROMPT},
@@ -278,86 +1749,512 @@ def analyze_video(video_path: str, prompt: str = None, stream: bool = True,
         messages = [{'role': 'user', 'content': None}]
     else:
         # 默认提示词
-        user_prompt = f"""这是从一个视频中提取的 {len(frames)} 帧关键画面。
-请根据这些画面，详细描述这个视频的内容，包括：
-1. 视频中出现的人物或物体
-2. 发生的事件或动作
-3. 场景环境
-4. 视频的主题或表达的意思
-5. 视频的整体叙事或故事线"""
+        user_prompt = DEFAULT_USER_PROMPT_TEMPLATE.format(num_frames=len(frames))
         messages = [{'role': 'user', 'content': None}]
 
-    # 构建消息内容
-    content = [{'type': 'text', 'text': user_prompt}]
+    # 构建消息内容 (base64 编码放到线程中，不阻塞事件循环)
+    messages[-1]['content'] = await asyncio.to_thread(_frames_to_content, user_prompt, frames)
 
-    for frame_path in frames:
-        frame_base64 = image_to_base64(frame_path)
-        content.append({
-            'type': 'image_url',
-            'image_url': {
-                'url': f'data:image/jpeg;base64,{frame_base64}'
-            }
+    if sora2_mode:
+        _log("\n🔄 正在分析视频并生成 SORA2 提示词...")
+    else:
+        _log(f"正在分析视频...")
+    _log("-" * 50)
+
+    # 调用 API
+    timings['time_to_request'] = time.time() - start_time
+    result = await _call_model(messages, stream=stream, semaphore=semaphore, timings=timings,
+                               on_token=on_event and (lambda text: _emit(on_event, 'token', text=text)))
+
+    if cache_key and result:
+        await asyncio.to_thread(RESULT_CACHE.put_json, cache_key, {
+            'result': result,
+            'video': os.path.abspath(video_path),
+            'model': MODEL_ID,
+            'created_at': time.time()
         })
 
-    # 更新最后一条消息的内容
-    messages[-1]['content'] = content
+    if sora2_mode:
+        _log("\n" + "=" * 50)
+        _log("✅ SORA2 提示词生成完成！")
+        _log("💡 提示: 可直接复制上方 English Version 用于 SORA2")
+        _log("=" * 50)
 
-    # 创建 API 客户端
-    client = OpenAI(
-        base_url=API_BASE_URL,
-        api_key=API_KEY,
-    )
+    timings['total'] = time.time() - start_time
 
-    if sora2_mode:
-        print("\n🔄 正在分析视频并生成 SORA2 提示词...")
-    else:
-        print(f"正在分析视频...")
-    print("-" * 50)
+    if keep_frames:
+        return result, frame_paths
+    return result
 
-    # 调用 API
-    response = client.chat.completions.create(
-        model=MODEL_ID,
-        messages=messages,
-        stream=stream
-    )
 
-    # 处理响应
-    result = ""
-    if stream:
-        for chunk in response:
-            if chunk.choices and chunk.choices[0].delta.content:
-                chunk_content = chunk.choices[0].delta.content
-                print(chunk_content, end='', flush=True)
-                result += chunk_content
-        print()  # 换行
-    else:
-        result = response.choices[0].message.content
-        print(result)
+def analyze_video(*args, **kwargs):
+    """
+    使用 Qwen3-VL 模型分析视频内容（同步版本）
+
+    在共享的后台事件循环中运行 analyze_video_async 并等待结果，参数和返回值与其相同。
+    """
+    return run_sync(analyze_video_async(*args, **kwargs))
 
-    # 清理临时文件
-    if not keep_frames:
-        for frame_path in frames:
-            try:
-                os.remove(frame_path)
-            except Exception:
-                pass
 
+async def iter_analyze_video_async(video_path: str, **kwargs):
+    """
+    分析视频并逐个产出过程事件（异步生成器）
+
+    参数同 analyze_video_async (不含 on_event)。分析在独立任务中运行，
+    依次产出 frame / frames / token 事件 (见 analyze_video_async 的 on_event)，
+    最后产出 {'type': 'result', 'result': 结果文本, 'paths': 帧路径列表, 'timings': 各阶段耗时}。
+    分析出错时在迭代处抛出异常；提前停止迭代会取消分析。
+    """
+    events = asyncio.Queue()
+    timings = kwargs.pop('timings', None)
+    timings = {} if timings is None else timings
+    done = object()
+
+    async def run():
         try:
-            os.rmdir(os.path.dirname(frames[0]))
-        except Exception:
-            pass
+            output = await analyze_video_async(video_path, timings=timings, on_event=events.put_nowait, **kwargs)
+            result, paths = output if isinstance(output, tuple) else (output, [])
+            events.put_nowait({'type': 'result', 'result': result, 'paths': paths, 'timings': timings})
+        finally:
+            events.put_nowait(done)
 
-    if sora2_mode:
-        print("\n" + "=" * 50)
-        print("✅ SORA2 提示词生成完成！")
-        print("💡 提示: 可直接复制上方 English Version 用于 SORA2")
-        print("=" * 50)
+    task = asyncio.ensure_future(run())
+    try:
+        while True:
+            event = await events.get()
+            if event is done:
+                break
+            yield event
+        await task  # 抛出分析中的异常
+    finally:
+        task.cancel()
+
+
+def iter_analyze_video(video_path: str, **kwargs):
+    """
+    iter_analyze_video_async 的同步版本（普通生成器），供 Gradio 等同步回调逐个消费事件
+
+    分析运行在共享的后台事件循环中，事件通过线程安全队列传给调用线程。
+    """
+    events = queue.Queue()
+    done = object()
+
+    async def pump():
+        try:
+            async for event in iter_analyze_video_async(video_path, **kwargs):
+                events.put(event)
+        except Exception as e:
+            events.put(e)  # 交给调用线程抛出
+        finally:
+            events.put(done)
+
+    future = asyncio.run_coroutine_threadsafe(pump(), _get_loop())
+    try:
+        while True:
+            event = events.get()
+            if event is done:
+                break
+            if isinstance(event, BaseException):
+                raise event
+            yield event
+    finally:
+        future.cancel()
+
+
+# ========== 分段分析 ==========
+
+def _format_timestamp(seconds: float) -> str:
+    """秒数格式化为 SORA2 时间戳样式 (如 1:05s)"""
+    return f"{int(seconds // 60)}:{int(seconds % 60):02d}s"
+
+
+def _segment_windows(duration: float, segment_seconds: float) -> list:
+    """把视频按时长切分为等长的连续时间段 [(开始秒, 结束秒), ...]，段数不超过 MAX_SEGMENTS"""
+    count = min(MAX_SEGMENTS, max(1, math.ceil(duration / segment_seconds)))
+    length = duration / count
+    return [(i * length, (i + 1) * length) for i in range(count)]
+
+
+async def _analyze_segment(video_path: str, index: int, windows: list, duration: float,
+                           frames_per_segment: int, summarize: bool = True, **options) -> dict:
+    """
+    提取并分析一个时间段
+
+    Args:
+        index: 段序号 (从 0 开始)
+        windows: 全部时间段，用于提示词中的 "第 i/N 段"
+        summarize: 是否调用模型生成该段摘要 (命中结果缓存时只需提取帧)
+        options: extract_mode, dedup_distance, use_cache, workers, max_edge, max_payload_bytes, semaphore
+
+    Returns:
+        {'index', 'window', 'frames', 'summary', 'timings'}
+    """
+    window = windows[index]
+    timings = {}
+    start_time = time.time()
+
+    # 各段并发执行，段内的逐帧日志会相互交错，只输出每段的完成情况
+    token = _quiet.set(True)
+    try:
+        stage_start = time.time()
+        frames = await extract_frame_data_async(
+            video_path, frames_per_segment, mode=options['extract_mode'], use_cache=options['use_cache'],
+            duration=duration, workers=options['workers'], max_edge=options['max_edge'], window=window
+        )
+        if not frames:
+            raise RuntimeError("无法提取视频帧")
+        frames, _ = await asyncio.to_thread(dedup_frames, frames, options['dedup_distance'])
+        frames, payload_stats = await asyncio.to_thread(fit_frames_to_budget, frames, options['max_payload_bytes'])
+        timings['extract'] = time.time() - stage_start
+        timings['frames'] = len(frames)
+        timings['payload_bytes'] = payload_stats['payload_bytes']
+
+        summary = None
+        if summarize:
+            user_prompt = SEGMENT_USER_PROMPT_TEMPLATE.format(
+                index=index + 1, total=len(windows),
+                start=_format_timestamp(window[0]), end=_format_timestamp(window[1]),
+                num_frames=len(frames),
+                stamps=', '.join(_format_timestamp(frame['timestamp']) for frame in frames)
+            )
+            content = await asyncio.to_thread(_frames_to_content, user_prompt, frames)
+            summary = await _call_model([{'role': 'user', 'content': content}], stream=False,
+                                        semaphore=options['semaphore'], timings=timings)
+    finally:
+        _quiet.reset(token)
+
+    timings['total'] = time.time() - start_time
+    _log(f"  [片段 {index+1}/{len(windows)}] {_format_timestamp(window[0])} - {_format_timestamp(window[1])} "
+          f"✅ {len(frames)} 帧，耗时 {timings['total']:.1f}s")
+    return {'index': index, 'window': window, 'frames': frames, 'summary': summary, 'timings': timings}
+
+
+@_with_metrics
+@_with_verbosity
+async def analyze_video_segmented_async(video_path: str, stream: bool = True, segment_seconds: float = None,
+                                        frames_per_segment: int = None, concurrency: int = None,
+                                        keep_frames: bool = False, extract_mode: str = None,
+                                        dedup_distance: int = None, use_cache: bool = None,
+                                        extract_workers: int = None, timings: dict = None,
+                                        semaphore: asyncio.Semaphore = None, max_edge: int = None,
+                                        max_payload_bytes: int = None):
+    """
+    分段 (map-reduce) 分析长视频并生成 SORA2 提示词
+
+    把视频切分为若干时间段，各段用自己的帧并发调用模型生成画面摘要，
+    再用一次合并调用根据各段摘要生成带时间戳的完整 SORA2 提示词。
+    总耗时取决于同时分析的段数，而不是视频长度。
+
+    Args:
+        video_path: 视频文件路径
+        stream: 合并调用是否使用流式输出
+        segment_seconds: 每段时长 (秒)，默认使用 SEGMENT_SECONDS；视频不超过一段时按普通 SORA2 模式分析
+        frames_per_segment: 每段提取的帧数，默认使用 SEGMENT_FRAMES
+        concurrency: 同时分析的段数，默认使用 SEGMENT_CONCURRENCY
+        keep_frames: 是否返回全部片段的帧文件路径
+        extract_mode / dedup_distance / use_cache / extract_workers / semaphore / max_edge / max_payload_bytes:
+            同 analyze_video_async；extract_workers 为所有段共享的进程总数
+        timings: 传入字典时写入 probe, segments (各段并发阶段耗时), model (合并调用耗时), total，
+                 以及 segment_count, frames, payload_bytes、cache_hit、
+                 segment_model (各段模型调用耗时合计)、prompt_tokens / completion_tokens / total_tokens
+                 (各段与合并调用合计，服务端返回用量时)、ttft / queue_wait (合并调用)
+        on_metrics: 分析结束 (成功或失败) 时以 timings 字典回调一次，同 analyze_video_async
+        verbose: 是否输出过程日志和模型结果 (默认True)
+
+    Returns:
+        如果 keep_frames=True，返回 (result, frames) 元组
+        否则返回 result 字符串
+    """
+    if not os.path.exists(video_path):
+        raise FileNotFoundError(f"视频文件不存在: {video_path}")
+
+    timings = {} if timings is None else timings
+    start_time = time.time()
+
+    segment_seconds = segment_seconds or SEGMENT_SECONDS
+    frames_per_segment = frames_per_segment or SEGMENT_FRAMES
+    concurrency = max(1, concurrency or SEGMENT_CONCURRENCY)
+    dedup_distance = DEDUP_DISTANCE if dedup_distance is None else dedup_distance
+    use_cache = CACHE_ENABLED if use_cache is None else use_cache
+    max_edge = FRAME_MAX_EDGE if max_edge is None else max_edge
+    max_payload_bytes = PAYLOAD_MAX_BYTES if max_payload_bytes is None else max_payload_bytes
+
+    stage_start = time.time()
+    duration = await get_video_duration_async(video_path)
+    timings['probe'] = time.time() - stage_start
+
+    if duration <= segment_seconds:
+        _log(f"视频时长 {duration:.1f}秒 不超过单段时长 {segment_seconds:.0f}秒，按普通 SORA2 模式分析")
+        return await analyze_video_async(
+            video_path, stream=stream, sora2_mode=True, keep_frames=keep_frames, extract_mode=extract_mode,
+            dedup_distance=dedup_distance, use_cache=use_cache, extract_workers=extract_workers,
+            timings=timings, semaphore=semaphore, max_edge=max_edge, max_payload_bytes=max_payload_bytes,
+            verbose=not _quiet.get()
+        )
+
+    # 查询分析结果缓存
+    cache_key = None
+    cached = None
+    if use_cache:
+        fingerprint = await asyncio.to_thread(video_fingerprint, video_path)
+        cache_key = _result_cache_key(
+            fingerprint, 'sora2-segmented',
+            SORA2_SYSTEM_PROMPT + SEGMENT_USER_PROMPT_TEMPLATE + SEGMENT_MERGE_PROMPT_TEMPLATE,
+            frames_per_segment,
+            segment_seconds=segment_seconds,
+            dedup_distance=dedup_distance,
+            quality=FRAME_QUALITY,
+            max_edge=max_edge,
+            max_payload_bytes=max_payload_bytes
+        )
+        cached = await asyncio.to_thread(RESULT_CACHE.get_json, cache_key)
+        timings['cache_hit'] = bool(cached)
+        if cached:
+            _log(f"📦 命中分析结果缓存 ({RESULT_CACHE.stats()})")
+            if not keep_frames:
+                _log(cached['result'])
+                timings['total'] = time.time() - start_time
+                return cached['result']
+        else:
+            _log(f"📦 分析结果缓存未命中 ({RESULT_CACHE.stats()})")
+
+    windows = _segment_windows(duration, segment_seconds)
+    concurrency = min(concurrency, len(windows))
+    # seek 提取进程数在同时进行的各段之间平分
+    workers = FRAME_EXTRACT_WORKERS if extract_workers is None else extract_workers
+    workers = max(1, (workers or os.cpu_count() or 1) // concurrency)
+
+    _log(f"\n🎞️ 分段分析: 视频时长 {duration:.1f}秒，分为 {len(windows)} 段 "
+          f"(每段约 {duration / len(windows):.0f}秒，{frames_per_segment} 帧)，同时分析 {concurrency} 段")
+
+    limit = asyncio.Semaphore(concurrency)
+
+    async def run_segment(index):
+        async with limit:
+            return await _analyze_segment(
+                video_path, index, windows, duration, frames_per_segment, summarize=not cached,
+                extract_mode=extract_mode, dedup_distance=dedup_distance, use_cache=use_cache,
+                workers=workers, max_edge=max_edge, max_payload_bytes=max_payload_bytes, semaphore=semaphore
+            )
+
+    stage_start = time.time()
+    outcomes = await asyncio.gather(*(run_segment(i) for i in range(len(windows))), return_exceptions=True)
+    timings['segments'] = time.time() - stage_start
+
+    # 个别片段失败时用其余片段继续合并
+    segments = []
+    for index, outcome in enumerate(outcomes):
+        if isinstance(outcome, Exception):
+            _log(f"  [片段 {index+1}/{len(windows)}] ❌ 分析失败: {type(outcome).__name__}: {outcome}")
+        elif isinstance(outcome, BaseException):
+            raise outcome
+        else:
+            segments.append(outcome)
+    if not segments:
+        raise RuntimeError("所有片段分析均失败")
+
+    all_frames = [frame for segment in segments for frame in segment['frames']]
+    timings['segment_count'] = len(segments)
+    timings['frames'] = len(all_frames)
+    timings['payload_bytes'] = sum(segment['timings']['payload_bytes'] for segment in segments)
+
+    frame_paths = []
+    if keep_frames:
+        # 帧缓存中的文件随时可能被淘汰，统一复制到本次调用的临时目录；各段的帧序号都从 0 开始，写文件前重新编号
+        frame_paths = await asyncio.to_thread(
+            save_frames, [{'index': i, 'timestamp': frame['timestamp'], 'data': frame['data']}
+                          for i, frame in enumerate(all_frames)]
+        )
+
+    if cached:
+        _log(cached['result'])
+        timings['total'] = time.time() - start_time
+        return cached['result'], frame_paths
+
+    # 合并各段摘要，生成完整 SORA2 提示词
+    summaries = '\n\n'.join(
+        f"### 片段 {segment['index']+1}（{_format_timestamp(segment['window'][0])} - "
+        f"{_format_timestamp(segment['window'][1])}）\n{(segment['summary'] or '').strip()}"
+        for segment in segments
+    )
+    messages = [
+        {'role': 'system', 'content': SORA2_SYSTEM_PROMPT},
+        {'role': 'user', 'content': SEGMENT_MERGE_PROMPT_TEMPLATE.format(
+            duration=duration, total=len(windows), summaries=summaries)}
+    ]
+
+    _log("\n🔄 正在合并各片段摘要并生成 SORA2 提示词...")
+    _log("-" * 50)
+    result = await _call_model(messages, stream=stream, semaphore=semaphore, timings=timings)
+
+    # 合计各段模型调用的耗时和 token 用量
+    timings['segment_model'] = sum(segment['timings'].get('model', 0) for segment in segments)
+    for key in ('prompt_tokens', 'completion_tokens', 'total_tokens'):
+        if key in timings:
+            timings[key] += sum(segment['timings'].get(key, 0) for segment in segments)
+
+    if cache_key and result:
+        await asyncio.to_thread(RESULT_CACHE.put_json, cache_key, {
+            'result': result,
+            'video': os.path.abspath(video_path),
+            'model': MODEL_ID,
+            'created_at': time.time()
+        })
+
+    _log("\n" + "=" * 50)
+    _log("✅ SORA2 提示词生成完成！")
+    _log("💡 提示: 可直接复制上方 English Version 用于 SORA2")
+    _log("=" * 50)
+
+    timings['total'] = time.time() - start_time
 
     if keep_frames:
-        return result, frames
+        return result, frame_paths
     return result
 
 
+def analyze_video_segmented(*args, **kwargs):
+    """分段分析长视频并生成 SORA2 提示词（同步版本，参数和返回值与 analyze_video_segmented_async 相同）"""
+    return run_sync(analyze_video_segmented_async(*args, **kwargs))
+
+
+# ========== 批量分析 ==========
+
+class RateLimiter:
+    """线程安全的限速器: 保证相邻两次 acquire 至少间隔 60/per_minute 秒"""
+
+    def __init__(self, per_minute: float):
+        self.interval = 60.0 / per_minute if per_minute > 0 else 0.0
+        self._next_time = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        """阻塞直到允许发起下一次请求"""
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next_time)
+            self._next_time = start + self.interval
+        if start > now:
+            time.sleep(start - now)
+
+
+def _load_batch_done(output_path: str) -> set:
+    """读取已有的 JSONL 结果，返回已成功分析的视频路径集合"""
+    done = set()
+    if not os.path.exists(output_path):
+        return done
+    with open(output_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue  # 上次中断时可能留下不完整的行
+            if record.get('status') == 'ok':
+                done.add(record.get('video'))
+    return done
+
+
+def _aggregate_timings(all_timings: list) -> dict:
+    """汇总多个视频的分析指标: 各阶段耗时取中位数，token 用量求和"""
+    aggregate = {}
+    for key in ('probe', 'extract', 'encode', 'queue_wait', 'ttft', 'model', 'total'):
+        values = [t[key] for t in all_timings if isinstance(t.get(key), (int, float))]
+        if values:
+            aggregate[key] = statistics.median(values)
+    for key in ('prompt_tokens', 'completion_tokens', 'total_tokens'):
+        if any(key in t for t in all_timings):
+            aggregate[key] = sum(t.get(key, 0) for t in all_timings)
+    return aggregate
+
+
+def _round_timings(timings: dict) -> dict:
+    """指标中的浮点数 (含列表中的) 保留 3 位小数，便于写入 JSONL"""
+    def round_value(value):
+        if isinstance(value, float):
+            return round(value, 3)
+        if isinstance(value, list):
+            return [round_value(v) for v in value]
+        return value
+    return {k: round_value(v) for k, v in timings.items()}
+
+
+def run_batch(directory: str, output_path: str = None, workers: int = BATCH_WORKERS,
+              rate_limit: float = BATCH_RPM, **analyze_kwargs) -> dict:
+    """
+    批量分析目录下的所有 MP4 视频
+
+    多个视频并发分析（受 workers 和 rate_limit 限制），每个视频完成后向 JSONL 文件
+    追加一条记录；重新运行时跳过已成功的视频，失败的视频会被重试。
+
+    Args:
+        directory: 视频目录
+        output_path: JSONL 结果文件，默认为 <directory>/qwen3vl_batch.jsonl
+        workers: 并发分析的视频数
+        rate_limit: 每分钟最多开始分析的视频数，0 表示不限制
+        **analyze_kwargs: 透传给 analyze_video 的参数 (prompt, sora2_mode, num_frames 等)
+
+    Returns:
+        汇总字典 {'total', 'skipped', 'ok', 'failed', 'elapsed', 'metrics'}，
+        metrics 为成功视频各阶段耗时的中位数和 token 用量合计
+    """
+    output_path = output_path or os.path.join(directory, 'qwen3vl_batch.jsonl')
+    videos = sorted(os.path.abspath(v) for v in get_video_files(directory))
+    done = _load_batch_done(output_path)
+    pending = [v for v in videos if v not in done]
+
+    summary = {'total': len(videos), 'skipped': len(videos) - len(pending), 'ok': 0, 'failed': 0}
+    print(f"[批量] 共 {len(videos)} 个视频，已完成 {summary['skipped']} 个，待分析 {len(pending)} 个")
+    print(f"[批量] 并发: {workers}，限速: {rate_limit or '不限'} 个/分钟，结果: {output_path}")
+    if not pending:
+        summary['elapsed'] = 0.0
+        summary['metrics'] = {}
+        return summary
+
+    limiter = RateLimiter(rate_limit)
+    write_lock = threading.Lock()
+    ok_timings = []
+    batch_start = time.time()
+
+    def process(video_path):
+        limiter.acquire()
+        timings = {}
+        video_start = time.time()
+        record = {'video': video_path, 'status': 'ok', 'result': None, 'error': None}
+        try:
+            record['result'] = analyze_video(video_path, stream=False, verbose=False, timings=timings,
+                                             **analyze_kwargs)
+        except Exception as e:
+            record['status'] = 'error'
+            record['error'] = f"{type(e).__name__}: {e}"
+        timings.setdefault('total', time.time() - video_start)
+        record['timings'] = _round_timings(timings)
+        record['finished_at'] = time.strftime('%Y-%m-%d %H:%M:%S')
+
+        with write_lock:
+            with open(output_path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(record, ensure_ascii=False) + '\n')
+            summary['ok' if record['status'] == 'ok' else 'failed'] += 1
+            if record['status'] == 'ok':
+                ok_timings.append(timings)
+            finished = summary['ok'] + summary['failed']
+            elapsed = time.time() - batch_start
+            status = '✅' if record['status'] == 'ok' else f"❌ {record['error']}"
+            print(f"[批量] ({finished}/{len(pending)}) {status} {os.path.basename(video_path)} "
+                  f"[{timings.get('total', 0):.1f}s] 成功 {summary['ok']} 失败 {summary['failed']}，"
+                  f"已用 {elapsed:.0f}s")
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        list(executor.map(process, pending))
+
+    summary['elapsed'] = time.time() - batch_start
+    summary['metrics'] = _aggregate_timings(ok_timings)
+    print(f"[批量] 完成: 成功 {summary['ok']}，失败 {summary['failed']}，跳过 {summary['skipped']}，"
+          f"总耗时 {summary['elapsed']:.1f}s")
+    if summary['metrics']:
+        print(f"[批量] 各阶段耗时中位数: {format_metrics(summary['metrics'])}")
+    return summary
+
+
 def list_videos():
     """列出项目中所有可用的视频文件"""
     video_files = get_video_files()
@@ -373,15 +2270,22 @@ def list_videos():
     for i, video_file in enumerate(video_files, 1):
         file_size = os.path.getsize(video_file) / (1024 * 1024)
         file_name = os.path.basename(video_file)
-        duration = get_video_duration(video_file)
+        info = probe_video(video_file)
+        duration = info.get('duration', 0)
         duration_str = f"{duration:.1f}s" if duration > 0 else "未知"
-        print(f"{i}. [{file_size:.1f}MB, {duration_str}] {file_name}")
+        resolution_str = f", {info['width']}x{info['height']}" if info.get('width') else ""
+        print(f"{i}. [{file_size:.1f}MB, {duration_str}{resolution_str}] {file_name}")
         print(f"   路径: {video_file}")
 
     print("=" * 60)
     return video_files
 
 
+def _print_metrics(timings: dict) -> None:
+    """命令行模式下输出本次分析的各阶段耗时摘要"""
+    print(f"\n⏱️ {format_metrics(timings)}")
+
+
 def interactive_mode(sora2_mode: bool = False):
     """交互式模式，让用户选择视频进行分析"""
     video_files = list_videos()
@@ -415,7 +2319,8 @@ def interactive_mode(sora2_mode: bool = False):
                 analyze_video(
                     video_path,
                     custom_prompt if custom_prompt else None,
-                    sora2_mode=sora2_mode
+                    sora2_mode=sora2_mode,
+                    on_metrics=_print_metrics
                 )
                 print("=" * 60)
 
@@ -453,9 +2358,18 @@ def main():
   # 使用更多帧数生成更精确的 SORA2 提示词
   python qwen3vl.py --video video.mp4 --sora2 --frames 12
 
+  # 按镜头切换选取关键帧 (快切广告 / 静态口播视频更省帧)
+  python qwen3vl.py --video video.mp4 --sora2 --sampling scene --frames 12
+
+  # 长视频分段分析 (每 60 秒一段并发分析，再合并为带时间戳的 SORA2 提示词)
+  python qwen3vl.py --video long.mp4 --segmented --segment-seconds 60
+
   # 使用自定义提示词分析
   python qwen3vl.py --video video.mp4 --prompt "这个视频讲的是什么故事？"
 
+  # 批量分析目录下所有视频 (可中断后续跑)
+  python qwen3vl.py --batch downloads/ --sora2 --workers 4 --output results.jsonl
+
   # 交互式 SORA2 模式
   python qwen3vl.py --interactive --sora2
         """
@@ -487,6 +2401,96 @@ def main():
         help=f'要提取的视频帧数 (默认: {MAX_FRAMES}，SORA2 模式建议 8-12)'
     )
 
+    parser.add_argument(
+        '--extract-mode',
+        choices=['single', 'seek', 'auto'],
+        default=None,
+        help=f'帧提取模式: single 单次 ffmpeg 调用提取全部帧，seek 逐帧调用 (可并行)，'
+             f'auto 按时长自动选择 (默认: {FRAME_EXTRACT_MODE})'
+    )
+
+    parser.add_argument(
+        '--extract-workers',
+        type=int,
+        default=None,
+        help='seek 模式并行提取帧的进程数 (默认: CPU 核数)'
+    )
+
+    parser.add_argument(
+        '--sampling',
+        choices=['uniform', 'scene'],
+        default=None,
+        help=f'帧采样方式: uniform 均匀采样，scene 按镜头切换选取代表帧，--frames 为帧数上限 (默认: {SAMPLING_MODE})'
+    )
+
+    parser.add_argument(
+        '--dedup-distance',
+        type=int,
+        default=None,
+        help=f'重复帧判定的感知哈希汉明距离 (0-64，负数关闭去重，默认: {DEDUP_DISTANCE})'
+    )
+
+    parser.add_argument(
+        '--segmented',
+        action='store_true',
+        help='长视频分段分析: 各时间段并发分析后合并为一个 SORA2 提示词 (自动启用 SORA2 模式)'
+    )
+
+    parser.add_argument(
+        '--segment-seconds',
+        type=float,
+        default=None,
+        help=f'分段分析的每段时长，单位秒 (默认: {SEGMENT_SECONDS:.0f})'
+    )
+
+    parser.add_argument(
+        '--max-edge',
+        type=int,
+        default=None,
+        help=f'帧长边上限，单位像素 (0 保持原始分辨率，默认: {FRAME_MAX_EDGE})'
+    )
+
+    parser.add_argument(
+        '--payload-budget',
+        type=int,
+        default=None,
+        help=f'全部帧 base64 总字节上限，超出时自动降低画质 (0 不限制，默认: {PAYLOAD_MAX_BYTES})'
+    )
+
+    parser.add_argument(
+        '--no-cache',
+        action='store_true',
+        help='不使用分析结果缓存和帧缓存，强制重新提取帧并调用模型'
+    )
+
+    parser.add_argument(
+        '--batch',
+        type=str,
+        metavar='DIR',
+        help='批量分析目录下的所有 MP4 视频，结果逐条写入 JSONL，重新运行时跳过已完成的视频'
+    )
+
+    parser.add_argument(
+        '--workers',
+        type=int,
+        default=BATCH_WORKERS,
+        help=f'批量模式并发分析的视频数 (默认: {BATCH_WORKERS})'
+    )
+
+    parser.add_argument(
+        '--rate-limit',
+        type=float,
+        default=BATCH_RPM,
+        help=f'批量模式每分钟最多开始分析的视频数，0 表示不限制 (默认: {BATCH_RPM:g})'
+    )
+
+    parser.add_argument(
+        '--output', '-o',
+        type=str,
+        default=None,
+        help='批量模式 JSONL 结果文件 (默认: <DIR>/qwen3vl_batch.jsonl)'
+    )
+
     parser.add_argument(
         '--list', '-l',
         action='store_true',
@@ -520,6 +2524,25 @@ def main():
         list_videos()
     elif args.interactive:
         interactive_mode(sora2_mode=args.sora2)
+    elif args.batch:
+        run_batch(
+            args.batch,
+            output_path=args.output,
+            workers=args.workers,
+            rate_limit=args.rate_limit,
+            prompt=None if args.sora2 else args.prompt,
+            num_frames=args.frames,
+            sora2_mode=args.sora2,
+            extract_mode=args.extract_mode,
+            sampling=args.sampling,
+            dedup_distance=args.dedup_distance,
+            use_cache=False if args.no_cache else None,
+            extract_workers=args.extract_workers,
+            max_edge=args.max_edge,
+            max_payload_bytes=args.payload_budget,
+            segmented=args.segmented,
+            segment_seconds=args.segment_seconds
+        )
     elif args.video:
         # SORA2 模式下忽略自定义 prompt
         prompt = None if args.sora2 else args.prompt
@@ -528,7 +2551,17 @@ def main():
             prompt=prompt,
             stream=not args.no_stream,
             num_frames=args.frames,
-            sora2_mode=args.sora2
+            sora2_mode=args.sora2,
+            extract_mode=args.extract_mode,
+            sampling=args.sampling,
+            dedup_distance=args.dedup_distance,
+            use_cache=False if args.no_cache else None,
+            extract_workers=args.extract_workers,
+            max_edge=args.max_edge,
+            max_payload_bytes=args.payload_budget,
+            segmented=args.segmented,
+            segment_seconds=args.segment_seconds,
+            on_metrics=_print_metrics
         )
     else:
         parser.print_help()
@@ -0,0 +1,94 @@
+"""
+extract_frames 性能对比：单次 ffmpeg 调用 (single) vs 逐时间点调用 (seek)，以及 seek 模式的并行进程数
+
+用法:
+  python test/bench_extract_frames.py
+  python test/bench_extract_frames.py --video downloads/long.mp4 --frames 12 --runs 5
+  python test/bench_extract_frames.py --synthetic-seconds 3600 --frames 12 --workers 1,2,4,8
+"""
+
+import os
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+import statistics
+import subprocess
+from contextlib import redirect_stdout
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import qwen3vl
+
+SAMPLE_VIDEO = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'sample', 'video.mp4')
+
+
+def make_synthetic_video(seconds: int, output_dir: str) -> str:
+    """用 ffmpeg testsrc2 生成指定时长的 720p 测试视频 (关键帧间隔 2 秒)"""
+    output_path = os.path.join(output_dir, f'synthetic_{seconds}s.mp4')
+    if not os.path.exists(output_path):
+        print(f"正在生成 {seconds} 秒测试视频: {output_path}")
+        subprocess.run(
+            [
+                'ffmpeg', '-y',
+                '-f', 'lavfi', '-i', f'testsrc2=size=1280x720:rate=30:duration={seconds}',
+                '-c:v', 'libx264', '-preset', 'ultrafast', '-g', '60',
+                output_path
+            ],
+            capture_output=True,
+            check=True
+        )
+    return output_path
+
+
+def bench(video_path: str, num_frames: int, mode: str, runs: int, workers: int = None) -> list:
+    """运行指定模式若干次，返回每次耗时（秒）"""
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        with open(os.devnull, 'w') as devnull, redirect_stdout(devnull):
+            frames = qwen3vl.extract_frames(video_path, num_frames, mode=mode, workers=workers)
+        times.append(time.perf_counter() - start)
+
+        if len(frames) != num_frames:
+            print(f"⚠️ {mode} 模式仅提取到 {len(frames)}/{num_frames} 帧")
+        if frames:
+            shutil.rmtree(os.path.dirname(frames[0]), ignore_errors=True)
+    return times
+
+
+def report(label: str, times: list) -> None:
+    print(f"{label:>12}: 中位数 {statistics.median(times):.3f}s  "
+          f"最快 {min(times):.3f}s  最慢 {max(times):.3f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='extract_frames 提取模式性能对比')
+    parser.add_argument('--video', default=SAMPLE_VIDEO, help='测试视频路径 (默认 sample/video.mp4)')
+    parser.add_argument('--synthetic-seconds', type=int, default=0,
+                        help='生成指定时长的合成测试视频代替 --video (如 3600)')
+    parser.add_argument('--frames', type=int, default=12, help='提取帧数 (默认 12)')
+    parser.add_argument('--runs', type=int, default=5, help='每种模式运行次数 (默认 5)')
+    parser.add_argument('--workers', default='1,2,4,8', help='seek 模式要对比的并行进程数 (默认 1,2,4,8)')
+    parser.add_argument('--skip-single', action='store_true', help='跳过 single 模式 (长视频时很慢)')
+    args = parser.parse_args()
+
+    video_path = args.video
+    if args.synthetic_seconds:
+        video_path = make_synthetic_video(args.synthetic_seconds, tempfile.gettempdir())
+
+    duration = qwen3vl.get_video_duration(video_path)
+    print(f"视频: {video_path} ({duration:.1f}秒)，帧数: {args.frames}，运行 {args.runs} 次，"
+          f"CPU 核数: {os.cpu_count()}")
+    print("-" * 60)
+
+    for workers in [int(w) for w in args.workers.split(',') if w.strip()]:
+        report(f"seek x{workers}", bench(video_path, args.frames, 'seek', args.runs, workers=workers))
+
+    if not args.skip_single:
+        report("single", bench(video_path, args.frames, 'single', args.runs))
+
+
+if __name__ == '__main__':
+    main()
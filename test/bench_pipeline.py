@@ -0,0 +1,213 @@
+"""
+视频分析流水线性能测试: get_video_duration / extract_frames / image_to_base64 / analyze_video 端到端
+
+模型请求发往本地假 VLM 服务 (test/fake_vlm_server.py)，结果写入 JSON，并与保存的基准对比。
+基准需先在参考机器上用 --save-baseline 生成，之后的运行与之对比，中位数变慢超过 --max-regression 时返回非 0；
+未找到基准时同样返回非 0，只测量不对比时加 --no-compare。
+
+用法:
+  python test/bench_pipeline.py
+  python test/bench_pipeline.py --synthetic-seconds 600 --runs 5 --save-baseline
+  python test/bench_pipeline.py --synthetic-seconds 600 --ttft 0.5 --token-delay 0.02 --max-regression 0.2
+  python test/bench_pipeline.py --no-compare
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import tempfile
+import statistics
+import subprocess
+from contextlib import redirect_stdout
+
+TEST_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(TEST_DIR, '..'))
+
+from fake_vlm_server import FakeVLMServer
+
+SAMPLE_VIDEO = os.path.join(TEST_DIR, '..', 'sample', 'video.mp4')
+DEFAULT_OUTPUT = os.path.join(TEST_DIR, 'bench_results.json')
+DEFAULT_BASELINE = os.path.join(TEST_DIR, 'bench_baseline.json')
+
+
+def timed(func, runs: int) -> tuple:
+    """运行 func 若干次 (屏蔽输出)，返回 (每次耗时列表, 最后一次返回值)"""
+    times = []
+    result = None
+    for _ in range(runs):
+        start = time.perf_counter()
+        with open(os.devnull, 'w') as devnull, redirect_stdout(devnull):
+            result = func()
+        times.append(time.perf_counter() - start)
+    return times, result
+
+
+def summarize(times: list, **extra) -> dict:
+    return {'runs': [round(t, 4) for t in times], 'median': round(statistics.median(times), 4),
+            'min': round(min(times), 4), 'max': round(max(times), 4), **extra}
+
+
+def bench_video(qwen3vl, label: str, video_path: str, args) -> dict:
+    """对一个视频运行全部测试项，返回 {测试项名: 统计结果}"""
+    results = {}
+
+    def probe_cold():
+        qwen3vl._probe_cache = {}  # 清空媒体信息缓存，测量实际 ffprobe 耗时
+        return qwen3vl.get_video_duration(video_path)
+
+    times, duration = timed(probe_cold, args.runs)
+    results[f'{label}/get_video_duration'] = summarize(times)
+    times, _ = timed(lambda: qwen3vl.get_video_duration(video_path), args.runs)
+    results[f'{label}/get_video_duration_cached'] = summarize(times)
+
+    modes = ['seek'] if args.skip_single else ['single', 'seek']
+    frame_paths = []
+    for mode in modes:
+        times, paths = timed(lambda: qwen3vl.extract_frames(video_path, args.frames, mode=mode), args.runs)
+        results[f'{label}/extract_frames_{mode}'] = summarize(times, frames=len(paths))
+        if frame_paths:
+            shutil.rmtree(os.path.dirname(frame_paths[0]), ignore_errors=True)
+        frame_paths = paths
+
+    if frame_paths:
+        times, _ = timed(lambda: [qwen3vl.image_to_base64(path) for path in frame_paths], args.runs)
+        results[f'{label}/image_to_base64'] = summarize(times, frames=len(frame_paths))
+        shutil.rmtree(os.path.dirname(frame_paths[0]), ignore_errors=True)
+
+    # 端到端: 关闭缓存，流式请求假 VLM 服务
+    stage_times = []
+
+    def analyze():
+        timings = {}
+        qwen3vl.analyze_video(video_path, sora2_mode=True, num_frames=args.frames, use_cache=False,
+                              verbose=False, timings=timings)
+        stage_times.append(timings)
+
+    times, _ = timed(analyze, args.runs)
+    stages = {
+        key: round(statistics.median(t[key] for t in stage_times), 4)
+        for key in ('probe', 'extract', 'encode', 'time_to_request', 'ttft', 'model')
+        if all(key in t for t in stage_times)
+    }
+    results[f'{label}/analyze_video'] = summarize(times, stages=stages)
+
+    print(f"[{label}] 时长 {duration:.1f}s")
+    for name, stats in results.items():
+        if name.startswith(f'{label}/'):
+            print(f"  {name.split('/', 1)[1]:>28}: 中位数 {stats['median']:.3f}s  "
+                  f"最快 {stats['min']:.3f}s  最慢 {stats['max']:.3f}s")
+    return results
+
+
+def compare(results: dict, baseline: dict, max_regression: float, min_delta: float) -> list:
+    """与基准对比中位数，打印对比表，返回超出阈值的测试项列表 (绝对差值小于 min_delta 秒的视为抖动)"""
+    regressions = []
+    print("\n与基准对比 (中位数):")
+    for name, stats in results.items():
+        base = baseline.get(name)
+        if not base:
+            print(f"  {name:>40}: 基准中无此项")
+            continue
+        ratio = stats['median'] / base['median'] if base['median'] else float('inf')
+        flag = ''
+        if ratio > 1 + max_regression and stats['median'] - base['median'] >= min_delta:
+            flag = '  ⚠️ 变慢'
+            regressions.append(name)
+        print(f"  {name:>40}: {base['median']:.3f}s -> {stats['median']:.3f}s ({ratio:.2f}x){flag}")
+    return regressions
+
+
+def ffmpeg_version() -> str:
+    try:
+        output = subprocess.run(['ffmpeg', '-version'], capture_output=True, text=True).stdout
+        return output.splitlines()[0] if output else ''
+    except OSError:
+        return ''
+
+
+def main():
+    parser = argparse.ArgumentParser(description='视频分析流水线性能测试')
+    parser.add_argument('--video', default=SAMPLE_VIDEO, help='测试视频路径 (默认 sample/video.mp4)')
+    parser.add_argument('--synthetic-seconds', default='',
+                        help='额外生成的合成长视频时长，逗号分隔 (如 600,3600)')
+    parser.add_argument('--frames', type=int, default=8, help='提取帧数 (默认 8)')
+    parser.add_argument('--runs', type=int, default=3, help='每项运行次数 (默认 3)')
+    parser.add_argument('--skip-single', action='store_true', help='跳过 single 提取模式 (长视频时很慢)')
+    parser.add_argument('--ttft', type=float, default=0.3, help='假 VLM 服务首 token 延迟，秒 (默认 0.3)')
+    parser.add_argument('--token-delay', type=float, default=0.01, help='假 VLM 服务流式输出间隔，秒 (默认 0.01)')
+    parser.add_argument('--output', default=DEFAULT_OUTPUT, help='结果 JSON 路径 (默认 test/bench_results.json)')
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE, help='基准 JSON 路径 (默认 test/bench_baseline.json)')
+    parser.add_argument('--save-baseline', action='store_true', help='将本次结果保存为基准')
+    parser.add_argument('--no-compare', action='store_true', help='只测量并写入结果，不与基准对比')
+    parser.add_argument('--max-regression', type=float, default=0.2,
+                        help='中位数相对基准允许变慢的比例 (默认 0.2，即 20%%)')
+    parser.add_argument('--min-delta', type=float, default=0.05,
+                        help='变慢的绝对值小于该秒数时不算退化，避免毫秒级测试项的抖动 (默认 0.05)')
+    args = parser.parse_args()
+
+    server = FakeVLMServer(ttft=args.ttft, token_delay=args.token_delay).start()
+    cache_dir = tempfile.mkdtemp(prefix='qwen3vl_bench_cache_')
+    # qwen3vl 在导入时读取配置，需先指向假服务和独立的缓存目录
+    os.environ['QWEN_API_BASE_URL'] = server.base_url
+    os.environ['QWEN_API_KEY'] = 'bench'
+    os.environ['QWEN_CACHE_DIR'] = cache_dir
+    import qwen3vl
+    from bench_extract_frames import make_synthetic_video
+
+    videos = [('sample', args.video)]
+    for seconds in [int(s) for s in args.synthetic_seconds.split(',') if s.strip()]:
+        videos.append((f'synthetic_{seconds}s', make_synthetic_video(seconds, tempfile.gettempdir())))
+
+    print(f"帧数: {args.frames}，运行 {args.runs} 次，CPU 核数: {os.cpu_count()}，"
+          f"假 VLM 服务: {server.base_url} (首 token {args.ttft}s)")
+    print("-" * 60)
+
+    results = {}
+    try:
+        for label, video_path in videos:
+            results.update(bench_video(qwen3vl, label, video_path, args))
+    finally:
+        server.stop()
+        shutil.rmtree(cache_dir, ignore_errors=True)
+
+    report = {
+        'created_at': time.strftime('%Y-%m-%d %H:%M:%S'),
+        'machine': {'python': platform.python_version(), 'platform': platform.platform(),
+                    'cpu_count': os.cpu_count(), 'ffmpeg': ffmpeg_version()},
+        'config': {'frames': args.frames, 'runs': args.runs, 'ttft': args.ttft, 'token_delay': args.token_delay,
+                   'videos': {label: path for label, path in videos}},
+        'results': results
+    }
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"\n结果已写入: {args.output}")
+
+    if args.save_baseline:
+        shutil.copyfile(args.output, args.baseline)
+        print(f"已保存为基准: {args.baseline}")
+        return
+
+    if args.no_compare:
+        return
+    if not os.path.exists(args.baseline):
+        print(f"❌ 未找到基准 {args.baseline}，无法检查性能退化 (先在参考机器上用 --save-baseline 生成，"
+              f"只测量时加 --no-compare)")
+        sys.exit(1)
+
+    with open(args.baseline, 'r', encoding='utf-8') as f:
+        baseline = json.load(f)
+    if baseline.get('machine', {}).get('cpu_count') != os.cpu_count():
+        print("⚠️ 基准在不同 CPU 核数的机器上生成，对比结果仅供参考")
+    regressions = compare(results, baseline.get('results', {}), args.max_regression, args.min_delta)
+    if regressions:
+        print(f"\n❌ {len(regressions)} 项超出允许的变慢比例 {args.max_regression:.0%}")
+        sys.exit(1)
+    print("\n✅ 未发现性能退化")
+
+
+if __name__ == '__main__':
+    main()
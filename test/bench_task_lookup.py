@@ -0,0 +1,105 @@
+"""
+Seedance 任务ID查找性能对比：原线性部分匹配扫描 vs 列表索引 (build_seedance_video_index)
+
+模拟共享轮询器的一次分发：对同一个视频列表查找多个等待中的任务ID。
+同时检查 ID 互为子串时 (如 t1 / t10)，以及任务尚未出现在列表中时，两种方式是否返回正确的视频。
+
+用法:
+  python test/bench_task_lookup.py
+  python test/bench_task_lookup.py --entries 10000 --lookups 50 --runs 10
+"""
+
+import os
+import sys
+import time
+import random
+import argparse
+import statistics
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import app
+
+
+def legacy_match(videos: list, task_id: str) -> dict:
+    """原实现：逐条检查精确、核心ID和双向子串匹配"""
+    core_task_id = task_id.split("::")[0] if "::" in task_id else task_id
+    for video in videos:
+        vid_task_id = video.get("taskId") or video.get("task_id") or ""
+        vid_id = str(video.get("id", ""))
+        if task_id == vid_task_id or task_id == vid_id:
+            return video
+        if core_task_id == vid_task_id or core_task_id == vid_id:
+            return video
+        if vid_task_id and core_task_id in vid_task_id:
+            return video
+        if core_task_id and vid_task_id and vid_task_id in core_task_id:
+            return video
+    return None
+
+
+def make_videos(entries: int) -> list:
+    """生成视频列表，taskId / task_id / id 三种字段格式轮流出现，部分带 ::model 后缀"""
+    videos = []
+    for i in range(entries):
+        task_id = f"cgt-{i:012d}"
+        key = ("taskId", "task_id", "id")[i % 3]
+        videos.append({key: task_id + ("::seedance" if i % 2 else ""), "status": "processing"})
+    return videos
+
+
+def bench(func, runs: int) -> list:
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return times
+
+
+def report(label: str, times: list) -> None:
+    print(f"{label:>12}: 中位数 {statistics.median(times) * 1000:.3f}ms  "
+          f"最快 {min(times) * 1000:.3f}ms  最慢 {max(times) * 1000:.3f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Seedance 任务ID查找性能对比')
+    parser.add_argument('--entries', type=int, default=10000, help='视频列表条数 (默认 10000)')
+    parser.add_argument('--lookups', type=int, default=20, help='每次轮询查找的任务数 (默认 20)')
+    parser.add_argument('--runs', type=int, default=10, help='运行次数 (默认 10)')
+    args = parser.parse_args()
+
+    videos = make_videos(args.entries)
+    # 等待中的任务多为最近创建，位于列表后部，线性扫描接近最坏情况
+    rng = random.Random(0)
+    task_ids = [f"cgt-{i:012d}::seedance" for i in rng.sample(range(args.entries // 2, args.entries), args.lookups)]
+
+    def run_legacy():
+        return [legacy_match(videos, task_id) for task_id in task_ids]
+
+    def run_indexed():
+        index = app.build_seedance_video_index(videos)
+        return [app._match_seedance_video(videos, task_id, index) for task_id in task_ids]
+
+    assert run_legacy() == run_indexed(), "两种方式的查找结果不一致"
+
+    print(f"列表 {args.entries} 条，每次查找 {args.lookups} 个任务，运行 {args.runs} 次")
+    print("-" * 60)
+    report("线性扫描", bench(run_legacy, args.runs))
+    report("索引", bench(run_indexed, args.runs))
+
+    # ID 互为子串时的正确性
+    trap = [{"taskId": "t10", "status": "completed"}, {"taskId": "t1", "status": "processing"}]
+    legacy = legacy_match(trap, "t1::seedance")["taskId"]
+    indexed = app._match_seedance_video(trap, "t1::seedance")["taskId"]
+    print(f"\n查找 t1 (列表中 t10 在前): 线性扫描 -> {legacy}，索引 -> {indexed}")
+
+    # 任务刚创建、尚未出现在列表中时不应匹配到其他视频 (SEEDANCE_FUZZY_MATCH 默认关闭)
+    missing = [{"taskId": "t10", "status": "completed"}]
+    legacy = (legacy_match(missing, "t1::seedance") or {}).get("taskId")
+    indexed = (app._match_seedance_video(missing, "t1::seedance") or {}).get("taskId")
+    print(f"查找 t1 (列表中只有 t10): 线性扫描 -> {legacy}，索引 -> {indexed}")
+
+
+if __name__ == '__main__':
+    main()
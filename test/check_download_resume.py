@@ -0,0 +1,119 @@
+"""
+视频下载检查: download_video_to_local 流式写盘、断点续传与原子重命名
+
+启动本地 Range 文件服务 (test/range_file_server.py)，依次检查:
+  1. 连接两次中断后通过 Range 请求续传，文件内容完整，无 .part 残留
+  2. 服务端不支持 Range 时从头重新下载
+  3. 服务端支持 gzip 压缩时请求未编码的原始字节，中断续传后文件内容完整
+  4. 下载大文件时 Python 内存峰值远小于文件大小
+任一项失败时返回非 0。
+
+用法:
+  python test/check_download_resume.py
+  python test/check_download_resume.py --size-mb 128
+"""
+
+import os
+import sys
+import glob
+import hashlib
+import argparse
+import tempfile
+import tracemalloc
+from contextlib import redirect_stdout
+
+TEST_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(TEST_DIR, '..'))
+
+from range_file_server import RangeFileServer
+
+MB = 1024 * 1024
+
+
+def download(app, server) -> str:
+    with open(os.devnull, 'w') as devnull, redirect_stdout(devnull):
+        return app.download_video_to_local(server.url, use_seedance_proxy=False)
+
+
+def check(name: str, ok: bool, detail: str = '') -> bool:
+    print(f"{'✅' if ok else '❌'} {name}{f': {detail}' if detail else ''}")
+    return ok
+
+
+def check_resume(app) -> bool:
+    server = RangeFileServer(size=8 * MB, drop_after=3 * MB, drops=2).start()
+    try:
+        path = download(app, server)
+    finally:
+        server.stop()
+    ok = bool(path) and open(path, 'rb').read() == server.data and not os.path.exists(f'{path}.part')
+    expected = ['', f'bytes={3 * MB}-', f'bytes={6 * MB}-']
+    ok = check('中断后断点续传', ok and server.requests == expected, f"请求 Range: {server.requests}")
+    if path:
+        os.remove(path)
+    return ok
+
+
+def check_no_range(app) -> bool:
+    server = RangeFileServer(size=4 * MB, drop_after=1 * MB, drops=1, support_range=False).start()
+    try:
+        path = download(app, server)
+    finally:
+        server.stop()
+    ok = bool(path) and open(path, 'rb').read() == server.data
+    ok = check('不支持 Range 时重新下载', ok and len(server.requests) == 2, f"请求 Range: {server.requests}")
+    if path:
+        os.remove(path)
+    return ok
+
+
+def check_encoding(app) -> bool:
+    server = RangeFileServer(size=4 * MB, drop_after=1 * MB, drops=1, gzip_encoding=True).start()
+    try:
+        path = download(app, server)
+    finally:
+        server.stop()
+    ok = bool(path) and open(path, 'rb').read() == server.data
+    ok = check('按原始字节续传 (不使用 gzip 压缩)', ok and not any('gzip' in e for e in server.accept_encodings),
+               f"请求 Range: {server.requests}，Accept-Encoding: {server.accept_encodings}")
+    if path:
+        os.remove(path)
+    return ok
+
+
+def check_memory(app, size_mb: int) -> bool:
+    server = RangeFileServer(size=size_mb * MB).start()
+    digest = hashlib.sha256(server.data).hexdigest()
+    try:
+        tracemalloc.start()
+        path = download(app, server)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    finally:
+        server.stop()
+    with open(path, 'rb') as f:
+        ok = hashlib.sha256(f.read()).hexdigest() == digest
+    os.remove(path)
+    return check('流式写盘内存占用', ok and peak < size_mb * MB / 4,
+                 f"文件 {size_mb} MB，内存峰值 {peak / MB:.1f} MB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='视频下载流式写盘与断点续传检查')
+    parser.add_argument('--size-mb', type=int, default=64, help='内存检查使用的文件大小 MB (默认 64)')
+    args = parser.parse_args()
+
+    os.environ.setdefault('JOB_DB_PATH', os.path.join(tempfile.mkdtemp(prefix='ai_video_check_'), 'jobs.db'))
+    import app
+
+    before = set(glob.glob(os.path.join(tempfile.gettempdir(), '*.part')))
+    results = [check_resume(app), check_no_range(app), check_encoding(app), check_memory(app, args.size_mb)]
+    leftover = set(glob.glob(os.path.join(tempfile.gettempdir(), '*.part'))) - before
+    results.append(check('无 .part 残留文件', not leftover, ', '.join(leftover)))
+
+    if not all(results):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+"""
+单次提取帧流检查
+
+1. _pop_jpeg_frames 在管道读取任意切分位置下都能完整切出每一帧：用 ffmpeg image2pipe 从样例视频提取若干帧，
+   把连续的 JPEG 字节流在每一帧的 SOI/EOI 标记处 (包括把两字节标记从中间切开) 以及按固定块大小切分后
+   逐块送入 _pop_jpeg_frames，检查切出的帧数和内容。
+2. 两个时间点相距不到一帧 (落在同一帧间隔内) 时，单次提取的每一帧的序号、时间点和内容与逐帧提取一致。
+任一项失败时返回非 0。
+
+用法:
+  python test/check_jpeg_stream.py
+  python test/check_jpeg_stream.py --video downloads/long.mp4 --frames 12
+"""
+
+import os
+import sys
+import argparse
+import subprocess
+from contextlib import redirect_stdout
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import qwen3vl
+
+SAMPLE_VIDEO = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'sample', 'video.mp4')
+
+
+def extract_stream(video_path: str, num_frames: int) -> bytes:
+    """用 ffmpeg 输出 num_frames 帧的连续 JPEG 字节流"""
+    return subprocess.run(
+        ['ffmpeg', '-i', video_path, '-frames:v', str(num_frames), '-q:v', qwen3vl._frame_qscale(),
+         '-f', 'image2pipe', '-vcodec', 'mjpeg', 'pipe:1'],
+        capture_output=True, check=True
+    ).stdout
+
+
+def feed(stream: bytes, cuts: list) -> list:
+    """在 cuts 位置切分字节流，逐块送入 _pop_jpeg_frames，返回切出的全部帧"""
+    frames = []
+    buffer = b''
+    bounds = [0] + sorted(set(cuts)) + [len(stream)]
+    for start, end in zip(bounds, bounds[1:]):
+        images, buffer = qwen3vl._pop_jpeg_frames(buffer + stream[start:end])
+        frames.extend(images)
+    return frames
+
+
+def check_close_timestamps(video_path: str) -> bool:
+    """两个时间点落在同一帧间隔内时，单次提取与逐帧提取的结果应一致"""
+    frame_interval = 1 / (qwen3vl.probe_video(video_path).get('fps') or 30)
+    timestamps = [1.0 + frame_interval * 0.15, 1.0 + frame_interval * 0.6, 5.0]
+
+    async def collect(frames):
+        return [(frame['index'], frame['timestamp'], frame['data']) async for frame in frames]
+
+    with open(os.devnull, 'w') as devnull, redirect_stdout(devnull):
+        single = qwen3vl.run_sync(collect(qwen3vl._iter_frames_single_pass(video_path, timestamps)))
+        seek = qwen3vl.run_sync(collect(qwen3vl._iter_frames_seek(video_path, timestamps)))
+    ok = single == seek and len(single) == len(timestamps)
+    labels = [f"#{index} @{timestamp:.3f}s" for index, timestamp, _ in single]
+    print(f"{'✅' if ok else '❌'} 时间点相距 {frame_interval * 0.45:.3f}s (小于一帧) 时单次提取与逐帧提取一致: "
+          f"{', '.join(labels)}")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description='JPEG 帧流切分检查')
+    parser.add_argument('--video', default=SAMPLE_VIDEO, help='测试视频路径 (默认 sample/video.mp4)')
+    parser.add_argument('--frames', type=int, default=3, help='提取帧数 (默认 3)')
+    args = parser.parse_args()
+
+    stream = extract_stream(args.video, args.frames)
+    expected = qwen3vl._split_jpeg_stream(stream)
+    print(f"视频: {args.video}，{len(expected)} 帧，共 {len(stream)} 字节")
+
+    # 每个 SOI / EOI 标记的前、中、后三个切分位置
+    markers = [i for i in range(len(stream) - 1) if stream[i:i + 2] in (b'\xff\xd8', b'\xff\xd9')]
+    cases = {f'标记处切分 @{pos}': [pos] for marker in markers for pos in (marker, marker + 1, marker + 2)}
+    for size in (4095, 4096, 65536):
+        cases[f'按 {size} 字节分块'] = list(range(size, len(stream), size))
+
+    failed = [name for name, cuts in cases.items() if feed(stream, cuts) != expected]
+    for name in failed:
+        print(f"❌ {name}")
+    print(f"{'✅' if not failed else '❌'} {len(cases) - len(failed)}/{len(cases)} 种切分方式切出的帧完整")
+
+    close_ok = check_close_timestamps(args.video)
+    if len(expected) != args.frames or failed or not close_ok:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,164 @@
+"""
+本地 OpenAI 兼容的假 VLM 服务 (用于性能测试，不调用真实模型)
+
+支持 /v1/chat/completions 的流式 (SSE) 与非流式响应，可配置首 token 延迟和逐段输出间隔；
+请求 stream_options.include_usage 时在流末尾返回 token 用量。
+
+用法:
+  python test/fake_vlm_server.py --port 18080 --ttft 0.5 --token-delay 0.02
+  QWEN_API_BASE_URL=http://127.0.0.1:18080/v1 python qwen3vl.py --video sample/video.mp4 --sora2
+
+也可在脚本中启动:
+  server = FakeVLMServer(ttft=0.2).start()
+  ... 使用 server.base_url ...
+  server.stop()
+"""
+
+import json
+import time
+import argparse
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+DEFAULT_RESPONSE = """## SORA2 Prompt (English)
+```
+Style: cinematic, natural light, shallow depth of field.
+Cinematography: slow dolly-in, 35mm lens, warm color grade.
+Scene Breakdown:
+0:00s - 0:05s: A cat walks across a sunlit wooden floor, tail drifting.
+0:05s - 0:10s: The cat pauses and turns toward the camera.
+```
+
+## SORA2 提示词 (中文)
+```
+风格: 电影感，自然光，浅景深。
+镜头: 缓慢推近，35mm 镜头，暖色调。
+分镜:
+0:00s - 0:05s: 一只猫走过洒满阳光的木地板，尾巴轻摆。
+0:05s - 0:10s: 猫停下脚步，转向镜头。
+```"""
+
+
+class FakeVLMServer:
+    """在后台线程中运行的假 VLM 服务"""
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 0, ttft: float = 0.3,
+                 token_delay: float = 0.01, chunk_chars: int = 8, response: str = DEFAULT_RESPONSE):
+        """
+        Args:
+            host: 监听地址
+            port: 监听端口，0 表示随机端口
+            ttft: 收到请求到输出第一段内容的延迟 (秒)
+            token_delay: 流式输出相邻两段之间的间隔 (秒)
+            chunk_chars: 每段输出的字符数
+            response: 固定返回的内容
+        """
+        self.ttft = ttft
+        self.token_delay = token_delay
+        self.chunk_chars = chunk_chars
+        self.response = response
+        self.requests = []  # 每个请求的 {'stream', 'images', 'bytes'}
+        self._server = ThreadingHTTPServer((host, port), self._handler_class())
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f'http://{host}:{port}/v1'
+
+    def start(self) -> 'FakeVLMServer':
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _chunks(self) -> list:
+        text = self.response
+        return [text[i:i + self.chunk_chars] for i in range(0, len(text), self.chunk_chars)]
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, format, *args):
+                pass
+
+            def do_POST(self):
+                length = int(self.headers.get('Content-Length', 0))
+                body = json.loads(self.rfile.read(length) or b'{}')
+                images = sum(
+                    1 for message in body.get('messages', []) if isinstance(message.get('content'), list)
+                    for part in message['content'] if part.get('type') == 'image_url'
+                )
+                server.requests.append({'stream': bool(body.get('stream')), 'images': images, 'bytes': length})
+
+                chunks = server._chunks()
+                usage = {'prompt_tokens': 256 * max(images, 1), 'completion_tokens': len(chunks),
+                         'total_tokens': 256 * max(images, 1) + len(chunks)}
+                time.sleep(server.ttft)
+
+                if body.get('stream'):
+                    self.send_response(200)
+                    self.send_header('Content-Type', 'text/event-stream')
+                    self.send_header('Transfer-Encoding', 'chunked')
+                    self.end_headers()
+                    for i, chunk in enumerate(chunks):
+                        if i:
+                            time.sleep(server.token_delay)
+                        self._send_event({'id': 'fake', 'object': 'chat.completion.chunk', 'created': 0,
+                                          'model': body.get('model'),
+                                          'choices': [{'index': 0, 'delta': {'content': chunk},
+                                                       'finish_reason': None}]})
+                    if (body.get('stream_options') or {}).get('include_usage'):
+                        self._send_event({'id': 'fake', 'object': 'chat.completion.chunk', 'created': 0,
+                                          'model': body.get('model'), 'choices': [], 'usage': usage})
+                    self._send_event('[DONE]')
+                    self.wfile.write(b'0\r\n\r\n')
+                    self.wfile.flush()
+                else:
+                    time.sleep(server.token_delay * max(len(chunks) - 1, 0))
+                    data = json.dumps({
+                        'id': 'fake', 'object': 'chat.completion', 'created': 0, 'model': body.get('model'),
+                        'choices': [{'index': 0, 'message': {'role': 'assistant', 'content': server.response},
+                                     'finish_reason': 'stop'}],
+                        'usage': usage
+                    }).encode()
+                    self.send_response(200)
+                    self.send_header('Content-Type', 'application/json')
+                    self.send_header('Content-Length', str(len(data)))
+                    self.end_headers()
+                    self.wfile.write(data)
+
+            def _send_event(self, payload):
+                data = payload if isinstance(payload, str) else json.dumps(payload, ensure_ascii=False)
+                event = f'data: {data}\n\n'.encode()
+                self.wfile.write(b'%x\r\n%s\r\n' % (len(event), event))
+                self.wfile.flush()
+
+        return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description='本地假 VLM 服务 (OpenAI 兼容)')
+    parser.add_argument('--port', type=int, default=18080, help='监听端口 (默认 18080)')
+    parser.add_argument('--ttft', type=float, default=0.3, help='首 token 延迟，秒 (默认 0.3)')
+    parser.add_argument('--token-delay', type=float, default=0.01, help='流式输出间隔，秒 (默认 0.01)')
+    parser.add_argument('--chunk-chars', type=int, default=8, help='每段输出字符数 (默认 8)')
+    args = parser.parse_args()
+
+    server = FakeVLMServer(port=args.port, ttft=args.ttft, token_delay=args.token_delay,
+                           chunk_chars=args.chunk_chars)
+    print(f"假 VLM 服务已启动: {server.base_url} (首 token {args.ttft}s，间隔 {args.token_delay}s)")
+    try:
+        server._server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,136 @@
+"""
+本地支持 HTTP Range 的文件服务 (用于测试视频流式下载与断点续传)
+
+GET 任意路径均返回同一段随机数据 (video/mp4)，支持 "Range: bytes=起始-[结束]" 返回 206；
+可模拟前若干次响应在发送部分数据后断开连接、不支持 Range 的服务端，以及客户端接受 gzip 时压缩响应的服务端。
+
+用法:
+  python test/range_file_server.py --port 18090 --size-mb 64 --drop-after-mb 16 --drops 2
+  curl -r 0-99 http://127.0.0.1:18090/video.mp4 -o /dev/null -v
+
+也可在脚本中启动:
+  server = RangeFileServer(size=8 * 1024 * 1024, drop_after=3 * 1024 * 1024, drops=2).start()
+  ... 使用 server.url ...
+  server.stop()
+"""
+
+import os
+import re
+import gzip
+import argparse
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+
+class RangeFileServer:
+    """在后台线程中运行的 Range 文件服务"""
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 0, size: int = 8 * 1024 * 1024,
+                 drop_after: int = 0, drops: int = 0, support_range: bool = True, gzip_encoding: bool = False):
+        """
+        Args:
+            host: 监听地址
+            port: 监听端口，0 表示随机端口
+            size: 文件大小 (字节)
+            drop_after: 每次响应发送多少字节后断开连接，0 表示不断开
+            drops: 前多少次响应模拟断开
+            support_range: 是否支持 Range 请求，否则总是返回完整文件 (200)
+            gzip_encoding: 请求头 Accept-Encoding 包含 gzip 时以 Content-Encoding: gzip 压缩响应
+        """
+        self.data = os.urandom(size)
+        self.drop_after = drop_after
+        self.drops = drops
+        self.support_range = support_range
+        self.gzip_encoding = gzip_encoding
+        self.requests = []  # 每个请求的 Range 头 (无则为空字符串)
+        self.accept_encodings = []  # 每个请求的 Accept-Encoding 头
+        self._server = ThreadingHTTPServer((host, port), self._handler_class())
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f'http://{host}:{port}/video.mp4'
+
+    def start(self) -> 'RangeFileServer':
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, format, *args):
+                pass
+
+            def do_GET(self):
+                range_header = self.headers.get('Range', '')
+                server.requests.append(range_header)
+                accept_encoding = self.headers.get('Accept-Encoding', '')
+                server.accept_encodings.append(accept_encoding)
+                size = len(server.data)
+                start, end = 0, size - 1
+
+                match = re.fullmatch(r'bytes=(\d+)-(\d*)', range_header.strip())
+                if server.support_range and match:
+                    start = int(match.group(1))
+                    end = min(int(match.group(2)), size - 1) if match.group(2) else size - 1
+                    if start >= size:
+                        self.send_response(416)
+                        self.send_header('Content-Range', f'bytes */{size}')
+                        self.send_header('Content-Length', '0')
+                        self.end_headers()
+                        return
+                    self.send_response(206)
+                    self.send_header('Content-Range', f'bytes {start}-{end}/{size}')
+                else:
+                    self.send_response(200)
+                body = server.data[start:end + 1]
+                self.send_header('Content-Type', 'video/mp4')
+                self.send_header('Accept-Ranges', 'bytes' if server.support_range else 'none')
+                if server.gzip_encoding and 'gzip' in accept_encoding:
+                    body = gzip.compress(body)
+                    self.send_header('Content-Encoding', 'gzip')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+
+                if server.drop_after and len(server.requests) <= server.drops:
+                    # 只发送部分数据后断开，模拟网络中断
+                    self.wfile.write(body[:server.drop_after])
+                    self.wfile.flush()
+                    self.close_connection = True
+                    return
+                self.wfile.write(body)
+
+        return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description='本地 Range 文件服务')
+    parser.add_argument('--port', type=int, default=18090, help='监听端口 (默认 18090)')
+    parser.add_argument('--size-mb', type=float, default=64, help='文件大小 MB (默认 64)')
+    parser.add_argument('--drop-after-mb', type=float, default=0, help='每次响应发送多少 MB 后断开 (默认不断开)')
+    parser.add_argument('--drops', type=int, default=0, help='前多少次响应模拟断开 (默认 0)')
+    parser.add_argument('--no-range', action='store_true', help='不支持 Range 请求')
+    parser.add_argument('--gzip', action='store_true', help='客户端接受 gzip 时压缩响应')
+    args = parser.parse_args()
+
+    server = RangeFileServer(port=args.port, size=int(args.size_mb * 1024 * 1024),
+                             drop_after=int(args.drop_after_mb * 1024 * 1024), drops=args.drops,
+                             support_range=not args.no_range, gzip_encoding=args.gzip)
+    print(f"Range 文件服务已启动: {server.url} ({args.size_mb} MB)")
+    try:
+        server._server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()